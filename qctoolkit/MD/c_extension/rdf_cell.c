@@ -0,0 +1,259 @@
+// C routine for radial distribution histogram by cell lists
+//
+// positions are binned into a grid of cells in fractional
+// coordinates, each cell at least r_max wide perpendicular to
+// its faces. Pairs within r_max are then found in neighbouring
+// cells only, O(N) per frame for general triclinic lattice.
+// Periodic images are taken explicitly by shifting the
+// neighbouring cells across the lattice boundary, such that
+// r_max larger than half the cell width is also valid.
+// Each OpenMP thread accumulates its own histogram, summed
+// over threads after the last frame.
+
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include <math.h>
+#include <stdlib.h>
+#include <omp.h>
+
+#define MAX_CELLS 128
+
+static void inverse3(double a[9], double inv[9]){
+  double det;
+  inv[0] = a[4]*a[8] - a[5]*a[7];
+  inv[1] = a[2]*a[7] - a[1]*a[8];
+  inv[2] = a[1]*a[5] - a[2]*a[4];
+  inv[3] = a[5]*a[6] - a[3]*a[8];
+  inv[4] = a[0]*a[8] - a[2]*a[6];
+  inv[5] = a[2]*a[3] - a[0]*a[5];
+  inv[6] = a[3]*a[7] - a[4]*a[6];
+  inv[7] = a[1]*a[6] - a[0]*a[7];
+  inv[8] = a[0]*a[4] - a[1]*a[3];
+  det = a[0]*inv[0] + a[1]*inv[3] + a[2]*inv[6];
+  for(int i=0;i<9;i++) inv[i] /= det;
+}
+
+// wrapped cartesian position x and cell index of position r
+static int wrap(double *r, double lattice[9], double inv[9],
+                int nc[3], double *x){
+  int k, c[3];
+  double s[3];
+  for(k=0;k<3;k++){
+    s[k] = r[0]*inv[k] + r[1]*inv[3+k] + r[2]*inv[6+k];
+    s[k] -= floor(s[k]);
+    c[k] = (int)(s[k] * nc[k]);
+    if(c[k] >= nc[k]) c[k] = nc[k] - 1;
+  }
+  for(k=0;k<3;k++)
+    x[k] = s[0]*lattice[k] + s[1]*lattice[3+k] + s[2]*lattice[6+k];
+  return (c[0]*nc[1] + c[1])*nc[2] + c[2];
+}
+
+// histogram of ordered pairs (list1, list2) within r_max,
+// summed over frames
+static void rdf_count(double *R, int nt, int N,
+                      int *list1, int len1, int *list2, int len2,
+                      double lattice[9], double dr, double r_max,
+                      int size, double *g){
+  int i, j, k, t, c, n_cell, n_threads;
+  int nc[3], m[3];
+  double inv[9], width;
+  int *start, *cell1, *cell2;
+  double *x1, *x2, *x2_sorted, *g_thread;
+
+  inverse3(lattice, inv);
+  for(k=0;k<3;k++){
+    // perpendicular width of cell is 1/|b_k|, b_k column of inv
+    width = 1.0 / sqrt(inv[k]*inv[k] + inv[3+k]*inv[3+k]
+                       + inv[6+k]*inv[6+k]);
+    nc[k] = (int)(width / r_max);
+    if(nc[k] < 1) nc[k] = 1;
+    if(nc[k] > MAX_CELLS) nc[k] = MAX_CELLS;
+    // neighbouring cells to reach r_max
+    m[k] = (int)ceil(r_max * nc[k] / width - 1E-12);
+    if(m[k] < 1) m[k] = 1;
+  }
+  n_cell = nc[0] * nc[1] * nc[2];
+
+  start = (int*) malloc((n_cell + 1) * sizeof(int));
+  cell1 = (int*) malloc(len1 * sizeof(int));
+  cell2 = (int*) malloc(len2 * sizeof(int));
+  x1 = (double*) malloc(len1 * 3 * sizeof(double));
+  x2 = (double*) malloc(len2 * 3 * sizeof(double));
+  x2_sorted = (double*) malloc(len2 * 3 * sizeof(double));
+  n_threads = omp_get_max_threads();
+  g_thread = (double*) calloc(n_threads * size, sizeof(double));
+
+  for(t=0;t<nt;t++){
+    // list2 atoms sorted by cell, such that atoms of cell c
+    // are contiguous from start[c] to start[c+1]
+    for(c=0;c<=n_cell;c++) start[c] = 0;
+    for(j=0;j<len2;j++){
+      cell2[j] = wrap(&R[(t*N + list2[j])*3], lattice, inv, nc,
+                      &x2[3*j]);
+      start[cell2[j] + 1]++;
+    }
+    for(c=0;c<n_cell;c++) start[c+1] += start[c];
+    for(j=0;j<len2;j++){
+      c = start[cell2[j]]++;
+      for(k=0;k<3;k++) x2_sorted[3*c+k] = x2[3*j+k];
+    }
+    for(c=n_cell;c>0;c--) start[c] = start[c-1];
+    start[0] = 0;
+    for(i=0;i<len1;i++)
+      cell1[i] = wrap(&R[(t*N + list1[i])*3], lattice, inv, nc,
+                      &x1[3*i]);
+
+#pragma omp parallel private(i, j, k)
+{
+    double *g_local = &g_thread[omp_get_thread_num() * size];
+    double d[3], shift[3], d2, r;
+    double r2_max = r_max * r_max;
+    int a, b, o[3], n[3], w[3], ci[3], cn;
+
+    #pragma omp for schedule(dynamic, 64)
+    for(i=0;i<len1;i++){
+      ci[0] = cell1[i] / (nc[1] * nc[2]);
+      ci[1] = (cell1[i] / nc[2]) % nc[1];
+      ci[2] = cell1[i] % nc[2];
+      for(o[0]=-m[0];o[0]<=m[0];o[0]++){
+      for(o[1]=-m[1];o[1]<=m[1];o[1]++){
+      for(o[2]=-m[2];o[2]<=m[2];o[2]++){
+        // unwrapped neighbour cell: wrapped cell w and image n
+        for(k=0;k<3;k++){
+          a = ci[k] + o[k];
+          b = a % nc[k];
+          if(b < 0) b += nc[k];
+          w[k] = b;
+          n[k] = (a - b) / nc[k];
+        }
+        for(k=0;k<3;k++)
+          shift[k] = n[0]*lattice[k] + n[1]*lattice[3+k]
+                     + n[2]*lattice[6+k];
+        cn = (w[0]*nc[1] + w[1])*nc[2] + w[2];
+        for(j=start[cn];j<start[cn+1];j++){
+          d2 = 0;
+          for(k=0;k<3;k++){
+            d[k] = x2_sorted[3*j+k] + shift[k] - x1[3*i+k];
+            d2 += d[k] * d[k];
+          }
+          if(d2 < r2_max){
+            r = sqrt(d2);
+            if(r > 1E-5 && (int)(r/dr) < size) g_local[(int)(r/dr)] += 1;
+          }
+        }
+      }}}
+    }
+}
+  }
+
+  for(i=0;i<size;i++){
+    g[i] = 0;
+    for(t=0;t<n_threads;t++) g[i] += g_thread[t*size + i];
+  }
+
+  free(start);
+  free(cell1);
+  free(cell2);
+  free(x1);
+  free(x2);
+  free(x2_sorted);
+  free(g_thread);
+}
+
+/*  python interface */
+static PyObject* rdf_cell(PyObject* self, PyObject* args){
+
+  PyObject *R_inp, *l1_inp, *l2_inp, *lattice_inp;
+  PyArrayObject *R_arr=NULL, *l1_arr=NULL, *l2_arr=NULL;
+  PyArrayObject *lattice_arr=NULL, *g_arr;
+  double dr, r_max;
+  double lattice[9];
+  int nt, N, len1, len2, size, i;
+  npy_intp dims[1];
+
+  if (!PyArg_ParseTuple(args, "OOOOdd",
+                        &R_inp,       // positions, (nt, N, 3)
+                        &l1_inp,      // atom indices
+                        &l2_inp,      // atom indices
+                        &lattice_inp, // lattice vectors as rows
+                        &dr,
+                        &r_max
+                       )) return NULL;
+
+  /* numpy arrays are used in place when contiguous double */
+  R_arr = (PyArrayObject*) PyArray_FROMANY(R_inp, NPY_DOUBLE, 3, 3,
+            NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  l1_arr = (PyArrayObject*) PyArray_FROMANY(l1_inp, NPY_INT, 1, 1,
+            NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  l2_arr = (PyArrayObject*) PyArray_FROMANY(l2_inp, NPY_INT, 1, 1,
+            NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  lattice_arr = (PyArrayObject*) PyArray_FROMANY(lattice_inp,
+                  NPY_DOUBLE, 2, 2,
+                  NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  if(!R_arr || !l1_arr || !l2_arr || !lattice_arr) goto fail;
+  if(PyArray_DIM(R_arr, 2) != 3 || PyArray_SIZE(lattice_arr) != 9){
+    PyErr_SetString(PyExc_ValueError,
+      "expect positions (nt, N, 3) and lattice (3, 3)");
+    goto fail;
+  }
+  if(dr <= 0 || r_max <= 0){
+    PyErr_SetString(PyExc_ValueError, "dr and r_max must be positive");
+    goto fail;
+  }
+
+  nt = PyArray_DIM(R_arr, 0);
+  N = PyArray_DIM(R_arr, 1);
+  len1 = PyArray_SIZE(l1_arr);
+  len2 = PyArray_SIZE(l2_arr);
+  for(i=0;i<len1;i++){
+    int I = ((int*)PyArray_DATA(l1_arr))[i];
+    if(I < 0 || I >= N) goto index_error;
+  }
+  for(i=0;i<len2;i++){
+    int J = ((int*)PyArray_DATA(l2_arr))[i];
+    if(J < 0 || J >= N) goto index_error;
+  }
+  for(i=0;i<9;i++) lattice[i] = ((double*)PyArray_DATA(lattice_arr))[i];
+
+  size = (int)ceil(r_max / dr);
+  dims[0] = size;
+  g_arr = (PyArrayObject*) PyArray_SimpleNew(1, dims, NPY_DOUBLE);
+  if(!g_arr) goto fail;
+
+  Py_BEGIN_ALLOW_THREADS
+  rdf_count((double*)PyArray_DATA(R_arr), nt, N,
+            (int*)PyArray_DATA(l1_arr), len1,
+            (int*)PyArray_DATA(l2_arr), len2,
+            lattice, dr, r_max, size, (double*)PyArray_DATA(g_arr));
+  Py_END_ALLOW_THREADS
+
+  Py_DECREF(R_arr);
+  Py_DECREF(l1_arr);
+  Py_DECREF(l2_arr);
+  Py_DECREF(lattice_arr);
+  return PyArray_Return(g_arr);
+
+  index_error:
+    PyErr_SetString(PyExc_IndexError, "atom index out of range");
+  fail:
+    Py_XDECREF(R_arr);
+    Py_XDECREF(l1_arr);
+    Py_XDECREF(l2_arr);
+    Py_XDECREF(lattice_arr);
+    return NULL;
+}
+
+/*  define functions in module */
+static PyMethodDef RDFCell[] ={
+  {"rdf_cell", rdf_cell, METH_VARARGS,
+      "histogram of periodic pair distances within r_max by cell lists"},
+  {NULL, NULL, 0, NULL}
+};
+
+/* module initialization */
+PyMODINIT_FUNC initrdf_cell(void){
+  (void) Py_InitModule("rdf_cell", RDFCell);
+  /* IMPORTANT: this must be called */
+  import_array();
+}
@@ -1,7 +1,5 @@
 import qctoolkit as qtk
 import numpy as np
-from dlist_2 import dlist_2 as dl2
-from dlist_1 import dlist_1 as dl1
 from vacf import vacf as vacf_c
 
 class GenericMDInput(object):
@@ -66,29 +64,25 @@ class GenericMDOutput(object):
     3)
     If two atom types specified: calculate distances between
     two specified atom types
+
+    Pairs up to r_max, default half of the smallest cell width,
+    are found by cell lists for orthorhombic and triclinic cells
     """
 
     if 'dr' not in kwargs:
       kwargs['dr'] = 0.005;
 
-    if np.sum(abs(
-      self.cell - np.diag(np.diag(self.cell)))) != 0:
-      qtk.exit("radial distribution is only implemented "+\
-               "for orthorhmbic cell")
-
     if 't_start' not in kwargs:
       kwargs['t_start'] = 0
 
+    if 'r_max' not in kwargs:
+      kwargs['r_max'] = None
+
     def distance_list(list1, list2):
       traj = self.position[kwargs['t_start']:]
-      size_t, size_n, _ = traj.shape
-      size = size_t * size_n * 3
-      flatTraj = list(traj.reshape([size]))
-      cell = list(np.diag(self.cell))
-      if list1 == list2:
-        return dl1(flatTraj, size_t, size_n, list1, list2, cell, kwargs['dr'])
-      else:
-        return dl2(flatTraj, size_t, size_n, list1, list2, cell, kwargs['dr'])
+      return qtk.radialDistribution(traj, self.cell, list1, list2,
+                                    dr=kwargs['dr'],
+                                    r_max=kwargs['r_max'])
         
     # the case for two atom types specifed
     if type2:
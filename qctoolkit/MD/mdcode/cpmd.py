@@ -6,6 +6,15 @@ from qctoolkit.MD.aimd_io import AIMDOut
 from qctoolkit.MD.trajectory import xyz as xyz
 
 class out(AIMDOut):
+  """
+  CPMD MD output of out_dir, position and velocity are read from
+  TRAJECTORY. Selected frames are read by seeking through the frame
+  index of TRAJECTORY (see qtk.frameIndex)
+
+  kwargs:
+    start, stop, step(int), range of frames as for slicing
+    frames(list), indices of frames
+  """
   def __init__(self, out_dir, **kwargs):
     AIMDOut.__init__(self, out_dir, **kwargs)
     outpath = glob.glob(os.path.join(out_dir, '*.out'))[-1]
@@ -17,17 +26,21 @@ class out(AIMDOut):
     pattern = re.compile('^[0-9 ]{5} {6}[A-Z][a-z ]* *[0-9-.]')
     coord_str = filter(pattern.match, out)
     cell_str = filter(lambda x: 'LATTICE VECTOR' in x, out)
-    trjfile = open(trjpath, 'r')
-    trjout = trjfile.readlines()
-    trjfile.close()
-    trj_str = filter(lambda x: 'NEW' not in x, trjout)
-
-    data = np.array(
-      [[float(r) for r in s.split( )] for s in trj_str]
-    )
-
     self.type_list = [s.split( )[1] for s in coord_str]
     self.N = len(self.type_list)
+
+    selection = ['frames', 'start', 'stop', 'step']
+    if any([key in kwargs for key in selection]):
+      trj_str = self._readFrames(trjpath, **kwargs)
+    else:
+      trjfile = open(trjpath, 'r')
+      trjout = trjfile.readlines()
+      trjfile.close()
+      trj_str = filter(lambda x: 'NEW' not in x, trjout)
+
+    data = np.array(''.join(trj_str).split(), dtype=float)
+    data = data.reshape([len(trj_str), -1])
+
     self.time = data[np.arange(0, len(trj_str), self.N), 0]
     self.position = data[:, 1:4].\
       reshape([len(self.time), self.N, 3])*0.529177
@@ -37,3 +50,22 @@ class out(AIMDOut):
       [[float(c) for c in re.sub('.*:','',s).split( )]\
         for s in cell_str]
     )*0.529177 # from Bohr to Angstrom
+
+  def _readFrames(self, trjpath, **kwargs):
+    """TRAJECTORY lines of selected frames"""
+    offsets = qtk.frameIndex(trjpath, kind='trajectory')
+    if 'frames' in kwargs:
+      frames = kwargs['frames']
+    else:
+      start, stop, step = [kwargs[key] if key in kwargs else None
+                           for key in ['start', 'stop', 'step']]
+      frames = range(*slice(start, stop, step).indices(len(offsets)))
+    trj_str = []
+    trjfile = qtk.openXYZ(trjpath)
+    try:
+      for i in frames:
+        trjfile.seek(offsets[i])
+        trj_str.extend([trjfile.readline() for _ in range(self.N)])
+    finally:
+      trjfile.close()
+    return trj_str
@@ -58,30 +58,20 @@ def coulomb_matrix(mol, n = -1, size = None, periodic_image=False,
   if size < mol.N:
     qtk.exit("matrix size too small")
 
-  img_list = []
-  if periodic_image:
-    N = mol.N
-    mol_ext = mol.copy()
-    mol_ext.extend([3,3,3], normalize=True)
-    mol = mol.copy()
-    mol.R = mol_ext.R[13*N:14*N]
-    for itr in range(27):
-      img_list.append(mol_ext.R[itr*N:(itr+1)*N])
-
   positions = mol.R
+  if periodic_image:
+    # all 27 images of neighboring cells
+    lattice = qtk.celldm2lattice(mol.celldm)
+    images, _ = qtk.periodicImages(positions, lattice)
 
   if nuclear_charges:
     charges = np.array(mol.Z)
   else:
     charges = np.ones(mol.N)
-  if img_list:
-    diff_list = []
-    for img in img_list:
-      diff = positions[:, np.newaxis, :] - img[np.newaxis, :, :]
-      diff_list.append(diff)
-    diff_list = np.stack(diff_list)
+  if periodic_image:
+    diff_list = positions[np.newaxis, :, np.newaxis, :] \
+              - images[:, np.newaxis, :, :]
     diff_list = np.sqrt((diff_list ** 2).sum(axis=-1))
-    
     distances = diff_list.min(axis=0)
   else:
     differences = positions[:, np.newaxis, :] \
@@ -0,0 +1,132 @@
+// benchmark of nuclear attraction and electron repulsion kernels
+//
+// gcc -O2 -fopenmp -o bench_integrals bench_integrals.c boys.c
+//     gaussian.c -Wl,--wrap=malloc -lgsl -lgslcblas -lm
+// ./bench_integrals [n_atoms] [max_threads]
+//
+// A chain of n_atoms atoms (default 4) carries s, s, p and d
+// contracted cartesian Gaussians. veint and eeint loops are timed
+// for 1, 2, ... max_threads OpenMP threads (default number of
+// processors). malloc is wrapped by the linker to count heap
+// allocations made inside the timed integral loops, which stay
+// constant in the number of integrals: one workspace per thread.
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
+#include <omp.h>
+#include "gaussian.h"
+
+static long n_malloc = 0;
+
+void* __real_malloc(size_t);
+
+void* __wrap_malloc(size_t size){
+  #pragma omp atomic
+  n_malloc++;
+  return __real_malloc(size);
+}
+
+// s, s, px, py, pz, dxx, dxy, dxz, dyy, dyz, dzz on each atom
+static const int ao_lm[11][3] = {
+  {0,0,0}, {0,0,0}, {1,0,0}, {0,1,0}, {0,0,1},
+  {2,0,0}, {1,1,0}, {1,0,1}, {0,2,0}, {0,1,1}, {0,0,2}
+};
+static const double ao_exp[3] = {5.0, 1.2, 0.3};
+static const double ao_cef[3] = {0.2, 0.5, 0.6};
+
+int main(int argc, char **argv){
+  int n_atoms = 4, max_threads = omp_get_num_procs();
+  int Nao, Ngo, n_pair, i, j, k, a, g, threads, L;
+  int *ng, *lm_xyz;
+  long ij, kl, n_before;
+  double *center, *exp, *cef, *R, *Z, t0, t_ve, t_ee, t_ref = 0;
+  double sum_ve = 0, sum_ee = 0;
+  AOPair *pairs;
+
+  if(argc > 1) n_atoms = atoi(argv[1]);
+  if(argc > 2) max_threads = atoi(argv[2]);
+
+  Nao = 11 * n_atoms;
+  Ngo = 3 * Nao;
+  n_pair = Nao * (Nao + 1) / 2;
+  ng = (int*) malloc(Nao * sizeof(int));
+  lm_xyz = (int*) malloc(3 * Nao * sizeof(int));
+  center = (double*) malloc(3 * Nao * sizeof(double));
+  exp = (double*) malloc(Ngo * sizeof(double));
+  cef = (double*) malloc(Ngo * sizeof(double));
+  R = (double*) malloc(3 * n_atoms * sizeof(double));
+  Z = (double*) malloc(n_atoms * sizeof(double));
+  for(a=0;a<n_atoms;a++){
+    R[3*a] = 2.0 * a;
+    R[3*a+1] = 0.3 * (a % 2);
+    R[3*a+2] = 0.2 * a;
+    Z[a] = 6;
+    for(i=0;i<11;i++){
+      j = 11*a + i;
+      ng[j] = 3;
+      for(k=0;k<3;k++){
+        lm_xyz[3*j+k] = ao_lm[i][k];
+        center[3*j+k] = R[3*a+k];
+      }
+      for(g=0;g<3;g++){
+        // second s function more diffuse
+        exp[3*j+g] = ao_exp[g] * ((i == 1) ? 0.3 : 1.0);
+        cef[3*j+g] = ao_cef[g];
+      }
+    }
+  }
+
+  boysInit();
+  renormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+  L = maxAngular(pairs, n_pair);
+
+  printf("%d orbitals, %d pairs, %ld quartets\n",
+         Nao, n_pair, (long) n_pair * (n_pair + 1) / 2);
+  printf("threads  veint(s)  eeint(s)  speedup  mallocs\n");
+  for(threads=1;threads<=max_threads;threads++){
+    omp_set_num_threads(threads);
+    n_before = n_malloc;
+
+    t0 = omp_get_wtime();
+    sum_ve = 0;
+#pragma omp parallel private(ij) reduction(+:sum_ve)
+{
+    Workspace *work = newWorkspace(L);
+    #pragma omp for schedule(dynamic)
+    for(ij=0;ij<n_pair;ij++)
+      sum_ve += veMatrix(&pairs[ij], R, Z, n_atoms, work);
+    freeWorkspace(work);
+}
+    t_ve = omp_get_wtime() - t0;
+
+    t0 = omp_get_wtime();
+    sum_ee = 0;
+#pragma omp parallel private(ij, kl) reduction(+:sum_ee)
+{
+    Workspace *work = newWorkspace(2 * L);
+    #pragma omp for schedule(dynamic)
+    for(ij=0;ij<n_pair;ij++)
+      for(kl=ij;kl<n_pair;kl++)
+        sum_ee += eeMatrix(&pairs[ij], &pairs[kl], work);
+    freeWorkspace(work);
+}
+    t_ee = omp_get_wtime() - t0;
+
+    if(threads == 1) t_ref = t_ee;
+    printf("%7d  %8.3f  %8.3f  %7.2f  %7ld\n", threads, t_ve, t_ee,
+           t_ref / t_ee, n_malloc - n_before);
+  }
+  printf("checksum %.12e %.12e\n", sum_ve, sum_ee);
+
+  freeAOPairs(pairs);
+  free(ng);
+  free(lm_xyz);
+  free(center);
+  free(exp);
+  free(cef);
+  free(R);
+  free(Z);
+  return 0;
+}
@@ -0,0 +1,80 @@
+#include <math.h>
+#include "gaussian.h"
+
+/* tabulated Boys function */
+// F_m(x) on grid x_i = i * BOYS_STEP for x <= BOYS_X_MAX,
+// m = 0, ..., BOYS_M_MAX + BOYS_ORDER - 1. The highest requested
+// order is interpolated by Taylor expansion around the nearest
+// grid point, d^k F_m / dx^k = (-1)^k F_{m+k}, lower orders follow
+// from the stable downward recursion
+//   F_m(x) = (2x F_{m+1}(x) + exp(-x)) / (2m + 1).
+// For x >= BOYS_X_MAX, F_0 is taken from its asymptotic form
+// sqrt(pi/x)/2, exact to machine precision, and higher orders
+// from the upward recursion, stable for x > m.
+
+#define BOYS_GRID_DENSITY 10
+#define BOYS_STEP (1.0 / BOYS_GRID_DENSITY)
+#define BOYS_ORDER 8
+#define BOYS_N_GRID (BOYS_X_MAX * BOYS_GRID_DENSITY + 1)
+#define BOYS_N_M (BOYS_M_MAX + BOYS_ORDER)
+
+static double boys_table[BOYS_N_GRID][BOYS_N_M];
+static int boys_ready = 0;
+
+// F_m(x) by series exp(-x) sum_k (2x)^k / (2m+1)(2m+3)...(2m+2k+1)
+// all terms positive, used to construct the table
+static double boysSeries(int m, double x){
+  double term = 1.0 / (2*m + 1), sum = term;
+  int k = 1;
+  while(term > 1E-17 * sum){
+    term *= 2*x / (2*m + 2*k + 1);
+    sum += term;
+    k++;
+  }
+  return exp(-x) * sum;
+}
+
+// construct table, must be called before the integral kernels
+// are used, e.g. at module initialization
+void boysInit(void){
+  int i, m;
+  double x, expx;
+  if(boys_ready) return;
+  for(i=0;i<BOYS_N_GRID;i++){
+    x = i * BOYS_STEP;
+    expx = exp(-x);
+    boys_table[i][BOYS_N_M-1] = boysSeries(BOYS_N_M-1, x);
+    for(m=BOYS_N_M-2;m>=0;m--)
+      boys_table[i][m] = (2*x*boys_table[i][m+1] + expx) / (2*m + 1);
+  }
+  boys_ready = 1;
+}
+
+// Fm[m] = F_m(x) for m = 0, ..., m_max
+void boys(int m_max, double x, double *Fm){
+  int i, k, m;
+  double dx, dxk, expx = exp(-x);
+
+  if(x >= BOYS_X_MAX && m_max <= BOYS_M_MAX){
+    Fm[0] = 0.5 * sqrt(M_PI / x);
+    for(m=0;m<m_max;m++)
+      Fm[m+1] = ((2*m + 1)*Fm[m] - expx) / (2*x);
+    return;
+  }
+
+  if(m_max > BOYS_M_MAX){
+    // beyond tabulated orders
+    Fm[m_max] = F(m_max, x);
+  }else{
+    i = (int)(x * BOYS_GRID_DENSITY + 0.5);
+    dx = i * BOYS_STEP - x;
+    dxk = 1;
+    Fm[m_max] = 0;
+    for(k=0;k<BOYS_ORDER;k++){
+      Fm[m_max] += boys_table[i][m_max+k] * dxk;
+      dxk *= dx / (k + 1);
+    }
+  }
+  for(m=m_max-1;m>=0;m--)
+    Fm[m] = (2*x*Fm[m+1] + expx) / (2*m + 1);
+}
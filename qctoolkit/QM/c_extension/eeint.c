@@ -12,6 +12,11 @@ double* pyvector_to_Carrayptrs(PyArrayObject *arrayin){
   return (double*) arrayin->data;
 }
 
+// position of quartet (ij|kl) in packed storage, pair ij <= kl
+static inline long packedIndex(long ij, long kl, long n_pair){
+  return ij*n_pair - ij*(ij-1)/2 + kl - ij;
+}
+
 /*********************
 *  python interface  *
 *********************/
@@ -33,26 +38,38 @@ static PyObject* eeint(PyObject* self, PyObject* args){
   int N, itr;
   /* basis function variables */
   double **in_ptr; // address to numpy pointer
-  double *center;  // gaussian center
-  double *cef;     // contraction coefficients
-  int *ng;         // number of gaussians per AO
-  double *exp;     // gaussian exponents
-  int *lm_xyz;     // angular momentum
+  double *center = NULL; // gaussian center
+  double *cef = NULL;    // contraction coefficients
+  int *ng = NULL;        // number of gaussians per AO
+  double *exp = NULL;    // gaussian exponents
+  AOPair *pairs;   // primitive pairs of orbitals
+  int L;           // highest angular momentum of Hermite-Coulomb
+  int *lm_xyz = NULL; // angular momentum
+
+  /* Schwarz screening */
+  double tolerance = 0;       // skip quartets of bound below
+  PyObject *dm_inp = Py_None; // optional density matrix
+  PyArrayObject *dm_array = NULL;
+  double *dm = NULL;
+  double *schwarz;            // sqrt((ij|ij))
+  long n_quartet = 0, n_skip = 0;
+  int n_pair, *pair_i, *pair_j;
+  long ij, kl;
 
   /* python output variables */
-  PyObject *py_out;
+  PyObject *py_out = NULL;
   PyObject *py_out2;
   double *data, *overlap;
-  double element;
   int i, j, k, l;
-  int s, t, u, v, w;
-  int mat_dim[4];
+  npy_intp mat_dim[1];
 
   /*  parse numpy array and two integers as argument */
-  if (!PyArg_ParseTuple(args, "OO!O!",
+  if (!PyArg_ParseTuple(args, "OO!O!|dO",
                         &in_dict, 
                         &PyArray_Type, &in_array1,
-                        &PyArray_Type, &in_array2
+                        &PyArray_Type, &in_array2,
+                        &tolerance,
+                        &dm_inp
                        )) return NULL;
   if(in_array1 == NULL) return NULL;
 
@@ -134,6 +151,19 @@ static PyObject* eeint(PyObject* self, PyObject* args){
   } while(in_iternext(in_iter));
   NpyIter_Deallocate(in_iter);
 
+  /* density matrix for density-weighted screening */
+  if(dm_inp != Py_None){
+    dm_array = (PyArrayObject*) PyArray_FROMANY(dm_inp, NPY_DOUBLE,
+                 2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+    if(dm_array == NULL) goto fail;
+    if(PyArray_SIZE(dm_array) != Nao * Nao){
+      PyErr_SetString(PyExc_ValueError,
+                      "density matrix must be Nao x Nao");
+      goto fail;
+    }
+    dm = (double*) PyArray_DATA(dm_array);
+  }
+
   /*** end of numpy input data ***/
 
   /***** end of input data construction *****/
@@ -142,13 +172,26 @@ static PyObject* eeint(PyObject* self, PyObject* args){
   /*******************
   * construct output *
   *******************/
-  for(i=0;i<4;i++) mat_dim[i] = Nao;
-  py_out = (PyArrayObject*) 
-           PyArray_FromDims(4, mat_dim, NPY_DOUBLE);
+  // unique quartets (ij|kl) of orbital pairs i <= j, k <= l and
+  // pair ij <= kl packed in 1D, skipped quartets are left as zero
+  n_pair = Nao * (Nao + 1) / 2;
+  mat_dim[0] = (npy_intp) n_pair * (n_pair + 1) / 2;
+  py_out = (PyArrayObject*) PyArray_ZEROS(1, mat_dim, NPY_DOUBLE, 0);
+  if(py_out == NULL) goto fail;
   data = pyvector_to_Carrayptrs(py_out);
 
   /* renormalization */
   renormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+  L = 2 * maxAngular(pairs, n_pair);
+  pair_i = (int*) malloc(n_pair * sizeof(int));
+  pair_j = (int*) malloc(n_pair * sizeof(int));
+  for(i=0;i<Nao;i++){
+    for(j=i;j<Nao;j++){
+      pair_i[pairIndex(i, j, Nao)] = i;
+      pair_j[pairIndex(i, j, Nao)] = j;
+    }
+  }
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -157,67 +200,215 @@ static PyObject* eeint(PyObject* self, PyObject* args){
   //overlap = pyvector_to_Carrayptrs(py_out2);
   //orthogonalize(overlap, center, exp, cef, ng, lm_xyz, Nao);
 
-#pragma omp parallel private(i, j, k, l, s, t, u, v, w)\
-shared(data)
+  /* Cauchy-Schwarz bound table, |(ij|kl)| <= Q_ij * Q_kl */
+  schwarz = (double*) malloc(n_pair * sizeof(double));
+#pragma omp parallel private(ij)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
-  for(i=0;i<Nao;i++){
-    for(j=i;j<Nao;j++){
-      for(k=0;k<Nao;k++){
-        for(l=k;l<Nao;l++){
-          if(l+k >= i+j){
-            s = l + k*Nao + j*Nao*Nao + i*Nao*Nao*Nao;
-            element = eeMatrix(center, exp, cef, ng, lm_xyz,
-                                Nao, i, j, k, l);
-            data[s] = element;
-
-            // symmetry for (ij|kl)=(ij|lk)=(ji|kl)=(ji|lk)
-            t = k + l*Nao + j*Nao*Nao + i*Nao*Nao*Nao; //(ij|lk)
-            u = l + k*Nao + i*Nao*Nao + j*Nao*Nao*Nao; //(ji|kl)
-            v = k + l*Nao + i*Nao*Nao + j*Nao*Nao*Nao; //(ji|lk)
-            data[t] = data[s];
-            data[u] = data[s];
-            data[v] = data[s];
-    
-            // symmetry for (ij|kl)=(kl|ij)=(kl|ji)=(lk|ij)=(lk|ji)
-            t = j + i*Nao + l*Nao*Nao + k*Nao*Nao*Nao; //(kl|ij)
-            u = i + j*Nao + l*Nao*Nao + k*Nao*Nao*Nao; //(kl|ji)
-            v = j + i*Nao + k*Nao*Nao + l*Nao*Nao*Nao; //(lk|ij)
-            w = i + j*Nao + k*Nao*Nao + l*Nao*Nao*Nao; //(lk|ji)
-            data[t] = data[s];
-            data[u] = data[s];
-            data[v] = data[s];
-            data[w] = data[s];
-          }
-        }
+  for(ij=0;ij<n_pair;ij++)
+    schwarz[ij] = sqrt(fabs(eeMatrix(&pairs[ij], &pairs[ij], work)));
+  freeWorkspace(work);
+}
+
+#pragma omp parallel private(ij, kl, i, j, k, l)
+{
+  double bound, d_max;
+  Workspace *work = newWorkspace(L);
+  #pragma omp for schedule(dynamic) reduction(+:n_quartet, n_skip)
+  for(ij=0;ij<n_pair;ij++){
+    i = pair_i[ij];
+    j = pair_j[ij];
+    for(kl=ij;kl<n_pair;kl++){
+      n_quartet++;
+      bound = schwarz[ij] * schwarz[kl];
+      if(dm != NULL){
+        // largest density matrix element coupled to quartet
+        // in Coulomb and exchange contractions
+        k = pair_i[kl];
+        l = pair_j[kl];
+        d_max = fabs(dm[j+i*Nao]);
+        d_max = fmax(d_max, fabs(dm[l+k*Nao]));
+        d_max = fmax(d_max, fabs(dm[k+i*Nao]));
+        d_max = fmax(d_max, fabs(dm[l+i*Nao]));
+        d_max = fmax(d_max, fabs(dm[k+j*Nao]));
+        d_max = fmax(d_max, fabs(dm[l+j*Nao]));
+        bound *= d_max;
+      }
+      if(bound < tolerance){
+        n_skip++;
+      }else{
+        data[packedIndex(ij, kl, n_pair)] = 
+          eeMatrix(&pairs[ij], &pairs[kl], work);
       }
     }
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
   free(center);
   free(lm_xyz);
+  free(schwarz);
+  free(pair_i);
+  free(pair_j);
+  Py_XDECREF(dm_array);
   //free(overlap);
 
-  Py_INCREF(py_out);
-  return Py_BuildValue("O", py_out);
+  return Py_BuildValue("Nll", py_out, n_quartet, n_skip);
 
   /*  in case bad things happen */
   fail:
+    free(exp);
+    free(cef);
+    free(ng);
+    free(center);
+    free(lm_xyz);
+    Py_XDECREF(dm_array);
     Py_XDECREF(py_out);
     return NULL;
 } // end of eeint function
 
+/* Coulomb and exchange matrices of symmetric density matrix D */
+// J_ij = sum_kl (ij|kl) D_kl, K_ik = sum_jl (ij|kl) D_jl
+// from packed unique quartets. Each quartet is scaled by its
+// permutational degeneracy and contributes through four of its
+// eight permutations, the other four are recovered by symmetrizing
+// the accumulated matrices. Each OpenMP thread accumulates its own
+// copy of J and K, summed after the loop.
+static void jk_contract(double *eri, double *D, int Nao,
+                        double *J, double *K){
+  int n_pair = Nao * (Nao + 1) / 2;
+  int n_threads = omp_get_max_threads();
+  int *pair_i, *pair_j;
+  int i, j, t;
+  long ij, kl, NN = (long) Nao * Nao;
+  double *buffer;
+
+  pair_i = (int*) malloc(n_pair * sizeof(int));
+  pair_j = (int*) malloc(n_pair * sizeof(int));
+  for(i=0;i<Nao;i++){
+    for(j=i;j<Nao;j++){
+      pair_i[pairIndex(i, j, Nao)] = i;
+      pair_j[pairIndex(i, j, Nao)] = j;
+    }
+  }
+  buffer = (double*) calloc(2 * NN * n_threads, sizeof(double));
+
+#pragma omp parallel private(ij, kl)
+{
+  double *J_local = &buffer[2 * NN * omp_get_thread_num()];
+  double *K_local = &J_local[NN];
+  double *row, v;
+  int i, j, k, l;
+  #pragma omp for schedule(dynamic)
+  for(ij=0;ij<n_pair;ij++){
+    i = pair_i[ij];
+    j = pair_j[ij];
+    row = &eri[packedIndex(ij, 0, n_pair)];
+    for(kl=ij;kl<n_pair;kl++){
+      v = row[kl];
+      if(v == 0) continue;
+      k = pair_i[kl];
+      l = pair_j[kl];
+      if(i == j) v *= 0.5;
+      if(k == l) v *= 0.5;
+      if(ij == kl) v *= 0.5;
+      J_local[j+i*Nao] += 2 * v * D[l+k*Nao];
+      J_local[l+k*Nao] += 2 * v * D[j+i*Nao];
+      K_local[k+i*Nao] += v * D[l+j*Nao];
+      K_local[k+j*Nao] += v * D[l+i*Nao];
+      K_local[l+i*Nao] += v * D[k+j*Nao];
+      K_local[l+j*Nao] += v * D[k+i*Nao];
+    }
+  }
+} // end of omp loop
+
+  for(ij=0;ij<NN;ij++){
+    J[ij] = 0;
+    K[ij] = 0;
+    for(t=0;t<n_threads;t++){
+      J[ij] += buffer[2 * NN * t + ij];
+      K[ij] += buffer[2 * NN * t + NN + ij];
+    }
+  }
+  for(i=0;i<Nao;i++){
+    for(j=i;j<Nao;j++){
+      J[j+i*Nao] += J[i+j*Nao];
+      J[i+j*Nao] = J[j+i*Nao];
+      K[j+i*Nao] += K[i+j*Nao];
+      K[i+j*Nao] = K[j+i*Nao];
+    }
+  }
+  free(pair_i);
+  free(pair_j);
+  free(buffer);
+}
+
+static PyObject* eejk(PyObject* self, PyObject* args){
+  PyObject *eri_inp, *dm_inp;
+  PyArrayObject *eri_array = NULL, *dm_array = NULL;
+  PyArrayObject *J_array = NULL, *K_array = NULL;
+  npy_intp mat_dim[2];
+  long n_pair;
+  int Nao;
+
+  if (!PyArg_ParseTuple(args, "OO",
+                        &eri_inp, // packed integrals
+                        &dm_inp   // density matrix, Nao x Nao
+                       )) return NULL;
+
+  eri_array = (PyArrayObject*) PyArray_FROMANY(eri_inp, NPY_DOUBLE,
+                1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  dm_array = (PyArrayObject*) PyArray_FROMANY(dm_inp, NPY_DOUBLE,
+               2, 2, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  if(eri_array == NULL || dm_array == NULL) goto fail;
+  Nao = PyArray_DIM(dm_array, 0);
+  n_pair = (long) Nao * (Nao + 1) / 2;
+  if(PyArray_DIM(dm_array, 1) != Nao
+     || PyArray_SIZE(eri_array) != n_pair * (n_pair + 1) / 2){
+    PyErr_SetString(PyExc_ValueError,
+                    "packed integrals do not match density matrix");
+    goto fail;
+  }
+
+  mat_dim[0] = Nao;
+  mat_dim[1] = Nao;
+  J_array = (PyArrayObject*) PyArray_SimpleNew(2, mat_dim, NPY_DOUBLE);
+  K_array = (PyArrayObject*) PyArray_SimpleNew(2, mat_dim, NPY_DOUBLE);
+  if(J_array == NULL || K_array == NULL) goto fail;
+
+  Py_BEGIN_ALLOW_THREADS
+  jk_contract((double*) PyArray_DATA(eri_array),
+              (double*) PyArray_DATA(dm_array), Nao,
+              (double*) PyArray_DATA(J_array),
+              (double*) PyArray_DATA(K_array));
+  Py_END_ALLOW_THREADS
+
+  Py_DECREF(eri_array);
+  Py_DECREF(dm_array);
+  return Py_BuildValue("NN", J_array, K_array);
+
+  fail:
+    Py_XDECREF(eri_array);
+    Py_XDECREF(dm_array);
+    Py_XDECREF(J_array);
+    Py_XDECREF(K_array);
+    return NULL;
+} // end of eejk function
+
 /*  define functions in module */
 static PyMethodDef EEInt[] ={
   {"eeint", eeint, METH_VARARGS,
       "analytic two-center Gaussian-Coulomb integral"},
+  {"eejk", eejk, METH_VARARGS,
+      "Coulomb and exchange matrices from packed integrals"},
   {NULL, NULL, 0, NULL}
 };
 
@@ -226,4 +417,6 @@ PyMODINIT_FUNC initeeint(void){
   (void) Py_InitModule("eeint", EEInt);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
@@ -42,6 +42,8 @@ static PyObject* eekernel(PyObject* self, PyObject* args){
   double *cef;     // contraction coefficients
   int *ng;         // number of gaussians per AO
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // primitive pairs of orbitals
+  int L;           // highest angular momentum of Hermite-Coulomb
   int *lm_xyz;     // angular momentum
 
   /* python output variables */
@@ -184,6 +186,8 @@ static PyObject* eekernel(PyObject* self, PyObject* args){
 
   /* renormalization */
   renormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+  L = maxAngular(pairs, Nao*(Nao+1)/2);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -194,22 +198,25 @@ static PyObject* eekernel(PyObject* self, PyObject* args){
 
 #pragma omp parallel private(i, j, k) shared(data)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
   for(i=0;i<Nao;i++){
     for(j=i;j<Nao;j++){
-      eeKernel(R, Z, center, exp, cef, &data[Nao*N*i + N*j],
-      ng, lm_xyz, Nao, N, i, j);
+      eeKernel(&pairs[pairIndex(i, j, Nao)], R, Z, N,
+               &data[Nao*N*i + N*j], work);
       if(j!=i){
         for(k=0;k<N;k++)
           data[i*N+j*Nao*N + k] = data[j*N+i*Nao*N + k];
       }
     }
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
@@ -239,4 +246,6 @@ PyMODINIT_FUNC initeekernel(void){
   (void) Py_InitModule("eekernel", EEKernel);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
@@ -145,26 +145,73 @@ double F(int n, double x){
 //  return Fn;
 }
 
-/* Hermite-Coulomb integral coefficient */
-double HCcef(int t, int u, int v, int n, 
-             double* PI, double p2, double x){
-  double cef = 0;
-  if((t==0)&&(u==0)&&(v==0)){
-    cef += F(n, x) * pow(-p2, n);
-  }else if(((t>=u)||(t>=v))&&(t>0)){
-    // annihilate x-direction (t)
-    cef += HCcef(t-1,u,v,n+1,PI,p2,x) * PI[0];
-    cef += HCcef(t-2,u,v,n+1,PI,p2,x) * (t-1);
-  }else if((u>=v)&&(u>0)){
-    // annihilate y-direction (u)
-    cef += HCcef(t,u-1,v,n+1,PI,p2,x) * PI[1];
-    cef += HCcef(t,u-2,v,n+1,PI,p2,x) * (u-1);
-  }else if(v>0){
-    // annihilate z-direction (v)
-    cef += HCcef(t,u,v-1,n+1,PI,p2,x) * PI[2];
-    cef += HCcef(t,u,v-2,n+1,PI,p2,x) * (v-1);
+/* per-thread workspace of the Coulomb kernels */
+// newWorkspace(L) for Hermite-Coulomb integrals R_tuv with
+// t+u+v <= L, allocated once per thread before the integral loops
+Workspace* newWorkspace(int L){
+  int S = L + 1;
+  Workspace *work = (Workspace*) malloc(sizeof(Workspace));
+  work->L = L;
+  work->Rn = (double*) malloc(S * sizeof(double));
+  work->R = (double*) malloc(S*S*S*S * sizeof(double));
+  return work;
+}
+
+void freeWorkspace(Workspace *work){
+  free(work->Rn);
+  free(work->R);
+  free(work);
+}
+
+// highest total angular momentum of n pairs
+int maxAngular(AOPair *pairs, int n){
+  int i, L = 0;
+  for(i=0;i<n;i++)
+    if(pairs[i].lm[0] + pairs[i].lm[1] + pairs[i].lm[2] > L)
+      L = pairs[i].lm[0] + pairs[i].lm[1] + pairs[i].lm[2];
+  return L;
+}
+
+/* Hermite-Coulomb integral coefficients */
+// R^n_tuv for t+u+v <= L - n into work->R by the recursion
+//   R^n_000 = (-p2)^n F_n(x)
+//   R^n_{t+1,u,v} = t R^{n+1}_{t-1,u,v} + PI_x R^{n+1}_{t,u,v}
+// and likewise for u and v, from n = L down to 0.
+// R_tuv = R^0_tuv is read by HCcef(work, t, u, v)
+void hermiteCoulomb(int L, double *PI, double p2, double x,
+                    Workspace *work){
+  int n, t, u, v, S = work->L + 1;
+  double *R = work->R, *Rn = work->Rn, *R1, scale = 1;
+
+  boys(L, x, Rn);
+  for(n=0;n<=L;n++){
+    Rn[n] *= scale;
+    scale *= -p2;
+  }
+  for(n=L;n>=0;n--){
+    R1 = &R[(n+1)*S*S*S];
+    for(t=0;t<=L-n;t++){
+      for(u=0;u<=L-n-t;u++){
+        for(v=0;v<=L-n-t-u;v++){
+          if(t>0){
+            // annihilate x-direction (t)
+            R[((n*S + t)*S + u)*S + v] = PI[0] * R1[((t-1)*S + u)*S + v]
+              + ((t>1) ? (t-1) * R1[((t-2)*S + u)*S + v] : 0);
+          }else if(u>0){
+            // annihilate y-direction (u)
+            R[(n*S*S + u)*S + v] = PI[1] * R1[(u-1)*S + v]
+              + ((u>1) ? (u-1) * R1[(u-2)*S + v] : 0);
+          }else if(v>0){
+            // annihilate z-direction (v)
+            R[n*S*S*S + v] = PI[2] * R1[v-1]
+              + ((v>1) ? (v-1) * R1[v-2] : 0);
+          }else{
+            R[n*S*S*S] = Rn[n];
+          }
+        }
+      }
+    }
   }
-  return cef;
 }
 
 /********************************************
@@ -187,13 +234,13 @@ double aoOverlap(double *center, double *exp, double *cef,
   double *expi, *expj, *cefi, *cefj;
   double factor;
 
-  expi = (double*) malloc(ngi * sizeof(double));
-  expj = (double*) malloc(ngj * sizeof(double));
-  cefi = (double*) malloc(ngi * sizeof(double));
-  cefj = (double*) malloc(ngj * sizeof(double));
-
 	for(i=0;i<aoi;i++) i0 += ng[i];
   for(j=0;j<aoj;j++) j0 += ng[j];
+  // primitives of aoi and aoj, read in place
+  expi = &exp[i0];
+  expj = &exp[j0];
+  cefi = &cef[i0];
+  cefj = &cef[j0];
   for(k=0;k<3;k++){
     lmi[k] = lm_xyz[k + aoi * 3];
     lmj[k] = lm_xyz[k + aoj * 3];
@@ -203,11 +250,7 @@ double aoOverlap(double *center, double *exp, double *cef,
   }
 
   for(i = 0; i < ngi; i++){
-    expi[i] = exp[i0 + i];
-    cefi[i] = cef[i0 + i];
     for(j = 0; j < ngj; j++){
-      expj[j] = exp[j0 + j];
-      cefj[j] = cef[j0 + j];
       cef_out = cefi[i] * cefj[j];
       norm = Norm(expi[i], lmi) * Norm(expj[j], lmj);
       p = expi[i] + expj[j];
@@ -241,11 +284,6 @@ double aoOverlap(double *center, double *exp, double *cef,
     }
   }
 
-  free(expi);
-  free(expj);
-  free(cefi);
-  free(cefj);
-
   return overlap;
 }
 
@@ -280,15 +318,12 @@ double densityIntegral(double *center, double *exp, double *cef,
   double Hx, Hy, Hz, nint = 0;
   double *expi, *cefi;
 
-  expi = (double*) malloc(ng[ao] * sizeof(double));
-  cefi = (double*) malloc(ng[ao] * sizeof(double));
-
 	for(i=0;i<ao;i++) i0 += ng[i];
+  expi = &exp[i0];
+  cefi = &cef[i0];
   for(s=0;s<3;s++) lm[s] = lm_xyz[s+ao*3];
 
   for(i=0;i<ng[ao];i++){
-    expi[i] = exp[i0+i];
-    cefi[i] = cef[i0+i];
     cef_out = cefi[i];
     norm = Norm(expi[i], lm);
     p = expi[i];
@@ -300,9 +335,6 @@ double densityIntegral(double *center, double *exp, double *cef,
     nint += cef_out * norm * Hx*Hy*Hz * pow(M_PI/p, 1.5);
   }
 
-  free(expi);
-  free(cefi);
-
   return nint;
 }
 
@@ -374,281 +406,254 @@ void densityRenormalize(double *center, double *exp, double *cef,
 //  free(work);
 //}
 
-/************************************************
-*  main function for Gaussian-Coulomb integral  *
-************************************************/
-//veMatrix(R, Z, center, exp, cef, ng, 
-//         lm_xyz, Nao, N, i, j);
-double veMatrix(double *R,      //all the rest are input
-                double *Z, 
-                double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                int N,
-                int aoi,
-                int aoj 
-             ){  
-
-  /* input related variables */
-  int i, j, k, i0 = 0, j0 = 0, I;
-  double ci[3], cj[3];
-  int lmi[3], lmj[3];
-  int ngi = ng[aoi], ngj = ng[aoj];
-  double *expi, *expj, *cefi, *cefj;
-  expi = (double*) malloc(ngi * sizeof(double));
-  expj = (double*) malloc(ngj * sizeof(double));
-  cefi = (double*) malloc(ngi * sizeof(double));
-  cefj = (double*) malloc(ngj * sizeof(double));
+/*****************************
+*  primitive pair data layer *
+*****************************/
+// Gaussian product exponents, centers, normalized coefficients
+// and Hermite expansion coefficients of each pair of atomic
+// orbitals are computed once per basis/geometry by aoPairs.
+// All integral kernels below only loop over the stored
+// primitive pairs and do the contraction work.
+// A single atomic orbital, e.g. density basis function, is
+// stored by aoSingles as pair with an s-function of exponent 0
+
+// allocate pair list with n_pair pairs of n_prim primitive
+// pairs and n_E Hermite coefficients in one block
+static AOPair* pairAlloc(int n_pair, int n_prim, int n_E){
+  AOPair *pairs = (AOPair*) malloc(n_pair * sizeof(AOPair));
+  double *block = (double*) malloc((n_prim*11 + n_E) * sizeof(double));
+  pairs[0].p = block;
+  return pairs;
+}
 
-  /* gaussian integral variables */
-  double cI[3], cij[3], P[3], Pi[3], Pj[3], PI[3], PI2;
-  int lmij[3];
-  int t, u, v;
-  double p, p2, mu, ZI, x, HC_cef, Ni, Nj, Nij;
-  double Hx, Hy, Hz, num, element_ij = 0;
+// fill primitive pair data of orbitals i and j into pair,
+// memory taken from *block. j < 0 for single orbital i
+static void pairSetup(AOPair *pair, double **block,
+                      double *center, double *exp, double *cef,
+                      int *ng, int *lm_xyz, int *ng0, int aoi, int aoj){
+  int a, b, k, s, t, n, lmi[3], lmj[3];
+  int ngj = (aoj < 0) ? 1 : ng[aoj];
+  double ai, bj, p, mu, ci[3], cj[3], cij[3], P[3], Pi[3], Pj[3];
+  double d2[3], E0[3][3];
+  double Ni, Nj;
 
-  for(i=0;i<aoi;i++) i0 += ng[i];
-  for(j=0;j<aoj;j++) j0 += ng[j];
   for(k=0;k<3;k++){
     lmi[k] = lm_xyz[k + 3*aoi];
-    lmj[k] = lm_xyz[k + 3*aoj];
-    lmij[k] = lmi[k] + lmj[k];
+    lmj[k] = (aoj < 0) ? 0 : lm_xyz[k + 3*aoj];
     ci[k] = center[k + 3*aoi];
-    cj[k] = center[k + 3*aoj];
+    cj[k] = (aoj < 0) ? ci[k] : center[k + 3*aoj];
     cij[k] = ci[k] - cj[k];
+    pair->lm[k] = lmi[k] + lmj[k];
   }
-  for(i=0;i<ngi;i++){
-    expi[i] = exp[i0+i];
-    cefi[i] = cef[i0+i];
-    for(j=0;j<ngj;j++){
-      expj[j] = exp[j0+j];
-      cefj[j] = cef[j0+j];
-      p = expi[i] + expj[j];
-      p2 = 2*p;
-      mu = expi[i] * expj[j] / p;
-      Ni = cefi[i] * Norm(expi[i], lmi);
-      Nj = cefj[j] * Norm(expj[j], lmj);
-      Nij = Ni * Nj;
+  pair->n = ng[aoi] * ngj;
+  pair->n_E = pair->lm[0] + pair->lm[1] + pair->lm[2] + 3;
+  pair->p = *block;
+  pair->P = pair->p + pair->n;
+  pair->N = pair->P + 3*pair->n;
+  pair->S = pair->N + pair->n;
+  pair->T = pair->S + 3*pair->n;
+  pair->E = pair->T + 3*pair->n;
+  *block = pair->E + pair->n * pair->n_E;
+
+  n = 0;
+  for(a=0;a<ng[aoi];a++){
+    ai = exp[ng0[aoi] + a];
+    Ni = cef[ng0[aoi] + a] * Norm(ai, lmi);
+    for(b=0;b<ngj;b++){
+      if(aoj < 0){
+        bj = 0;
+        Nj = 1;
+        p = ai;
+        mu = p;
+      }else{
+        bj = exp[ng0[aoj] + b];
+        Nj = cef[ng0[aoj] + b] * Norm(bj, lmj);
+        p = ai + bj;
+        mu = ai * bj / p;
+      }
+      pair->p[n] = p;
+      pair->N[n] = Ni * Nj;
       for(k=0;k<3;k++){
-        P[k] = (expi[i]*ci[k] + expj[j]*cj[k])/p;
+        P[k] = (ai*ci[k] + bj*cj[k]) / p;
         Pi[k] = P[k] - ci[k];
         Pj[k] = P[k] - cj[k];
+        pair->P[3*n + k] = P[k];
       }
-      for(I=0;I<N;I++){
-        PI2 = 0;
-        for(k=0;k<3;k++){
-          cI[k] = R[k+3*I];
-          PI[k] = P[k] - cI[k];
-          PI2 += PI[k] * PI[k];
+      // Hermite coefficients E^ij_t, x, y and z in sequence
+      s = n * pair->n_E;
+      for(k=0;k<3;k++){
+        for(t=0;t<=pair->lm[k];t++){
+          pair->E[s++] = Hermite(lmi[k], lmj[k], t, 2*p, mu,
+                                 cij[k], Pi[k], Pj[k]);
         }
-        ZI = Z[I];
-        x = p*PI2;
-
-        for(t=0;t<lmij[0]+1;t++){
-          Hx = Hermite(lmi[0], lmj[0], t, p2, mu,
-                       cij[0], Pi[0], Pj[0]);
-          for(u=0;u<lmij[1]+1;u++){
-            Hy = Hermite(lmi[1], lmj[1], u, p2, mu,
-                         cij[1], Pi[1], Pj[1]);
-            for(v=0;v<lmij[2]+1;v++){
-              Hz = Hermite(lmi[2], lmj[2], v, p2, mu,
-                           cij[2], Pi[2], Pj[2]);
-              HC_cef = HCcef(t, u, v, 0, PI, p2, x);
-              num = ZI*(Nij*Hx*Hy*Hz*HC_cef);
-              element_ij -= num*(2*M_PI/p);
-            }
-          }
+      }
+      // 1D overlap and kinetic factors, from overlaps with
+      // angular momentum of j shifted by -2, 0, 2
+      for(k=0;k<3;k++){
+        for(t=0;t<3;t++){
+          E0[k][t] = Hermite(lmi[k], lmj[k] + 2*t - 2, 0, 2*p, mu,
+                             cij[k], Pi[k], Pj[k]);
         }
+        setD2Cef(-2, lmj[k], bj, &d2[0]);
+        setD2Cef(0, lmj[k], bj, &d2[1]);
+        setD2Cef(2, lmj[k], bj, &d2[2]);
+        pair->S[3*n + k] = E0[k][1];
+        pair->T[3*n + k] = d2[0]*E0[k][0] + d2[1]*E0[k][1]
+                           + d2[2]*E0[k][2];
       }
+      n++;
     }
   }
-
-  free(expi);
-  free(expj);
-  free(cefi);
-  free(cefj);
-  return element_ij;
 }
-/************************************************
-*  main function for Gaussian-Coulomb integral  *
-************************************************/
-//eeKernel(R, Z, center, exp, cef, ng, 
-//         lm_xyz, Nao, N, i, j);
-void eeKernel(double *R,      //all the rest are input
-              double *Z, 
-              double *center,
-              double *exp,
-              double *cef,
-              double *element_ij,
-              int *ng,
-              int *lm_xyz,
-              int Nao,
-              int N,
-              int aoi,
-              int aoj 
-             ){  
 
-  /* input related variables */
-  int i, j, k, i0 = 0, j0 = 0, I;
-  double ci[3], cj[3];
-  int lmi[3], lmj[3];
-  int ngi = ng[aoi], ngj = ng[aoj];
-  double *expi, *expj, *cefi, *cefj;
-  expi = (double*) malloc(ngi * sizeof(double));
-  expj = (double*) malloc(ngj * sizeof(double));
-  cefi = (double*) malloc(ngi * sizeof(double));
-  cefj = (double*) malloc(ngj * sizeof(double));
+// first gaussian index of each orbital
+static int* firstGaussian(int *ng, int Nao){
+  int i, *ng0 = (int*) malloc(Nao * sizeof(int));
+  ng0[0] = 0;
+  for(i=1;i<Nao;i++) ng0[i] = ng0[i-1] + ng[i-1];
+  return ng0;
+}
 
-  /* gaussian integral variables */
-  double cI[3], cij[3], P[3], Pi[3], Pj[3], PI[3], PI2;
-  int lmij[3];
-  int t, u, v;
-  double p, p2, mu, ZI, x, HC_cef, Ni, Nj, Nij;
-  double Hx, Hy, Hz, num, element_ijI;
+// pairs of orbitals i <= j at pairIndex(i, j, Nao)
+AOPair* aoPairs(double *center, double *exp, double *cef,
+                int *ng, int *lm_xyz, int Nao){
+  int i, j, k, n_prim = 0, n_E = 0, lm;
+  int *ng0 = firstGaussian(ng, Nao);
+  AOPair *pairs;
+  double *block;
+
+  for(i=0;i<Nao;i++){
+    for(j=i;j<Nao;j++){
+      lm = 3;
+      for(k=0;k<3;k++) lm += lm_xyz[k+3*i] + lm_xyz[k+3*j];
+      n_prim += ng[i] * ng[j];
+      n_E += ng[i] * ng[j] * lm;
+    }
+  }
+  pairs = pairAlloc(Nao*(Nao+1)/2, n_prim, n_E);
+  block = pairs[0].p;
+  for(i=0;i<Nao;i++){
+    for(j=i;j<Nao;j++){
+      pairSetup(&pairs[pairIndex(i, j, Nao)], &block,
+                center, exp, cef, ng, lm_xyz, ng0, i, j);
+    }
+  }
+  free(ng0);
+  return pairs;
+}
 
-  for(i=0;i<aoi;i++) i0 += ng[i];
-  for(j=0;j<aoj;j++) j0 += ng[j];
-  for(k=0;k<3;k++){
-    lmi[k] = lm_xyz[k + 3*aoi];
-    lmj[k] = lm_xyz[k + 3*aoj];
-    lmij[k] = lmi[k] + lmj[k];
-    ci[k] = center[k + 3*aoi];
-    cj[k] = center[k + 3*aoj];
-    cij[k] = ci[k] - cj[k];
+// single orbitals, e.g. density basis functions
+AOPair* aoSingles(double *center, double *exp, double *cef,
+                  int *ng, int *lm_xyz, int Nao){
+  int i, n_prim = 0, n_E = 0;
+  int *ng0 = firstGaussian(ng, Nao);
+  AOPair *pairs;
+  double *block;
+
+  for(i=0;i<Nao;i++){
+    n_prim += ng[i];
+    n_E += ng[i] * (lm_xyz[3*i] + lm_xyz[3*i+1] + lm_xyz[3*i+2] + 3);
   }
-  for(I=0;I<N;I++){
-    for(i=0;i<ngi;i++){
-      expi[i] = exp[i0+i];
-      cefi[i] = cef[i0+i];
-      for(j=0;j<ngj;j++){
-        expj[j] = exp[j0+j];
-        cefj[j] = cef[j0+j];
-        p = expi[i] + expj[j];
-        p2 = 2*p;
-        mu = expi[i] * expj[j] / p;
-        Ni = cefi[i] * Norm(expi[i], lmi);
-        Nj = cefj[j] * Norm(expj[j], lmj);
-        Nij = Ni * Nj;
-        for(k=0;k<3;k++){
-          P[k] = (expi[i]*ci[k] + expj[j]*cj[k])/p;
-          Pi[k] = P[k] - ci[k];
-          Pj[k] = P[k] - cj[k];
-        }
-        PI2 = 0;
-        for(k=0;k<3;k++){
-          cI[k] = R[k+3*I];
-          PI[k] = P[k] - cI[k];
-          PI2 += PI[k] * PI[k];
-        }
-        ZI = Z[I];
-        x = p*PI2;
+  pairs = pairAlloc(Nao, n_prim, n_E);
+  block = pairs[0].p;
+  for(i=0;i<Nao;i++){
+    pairSetup(&pairs[i], &block, center, exp, cef, ng, lm_xyz,
+              ng0, i, -1);
+  }
+  free(ng0);
+  return pairs;
+}
 
-        for(t=0;t<lmij[0]+1;t++){
-          Hx = Hermite(lmi[0], lmj[0], t, p2, mu,
-                       cij[0], Pi[0], Pj[0]);
-          for(u=0;u<lmij[1]+1;u++){
-            Hy = Hermite(lmi[1], lmj[1], u, p2, mu,
-                         cij[1], Pi[1], Pj[1]);
-            for(v=0;v<lmij[2]+1;v++){
-              Hz = Hermite(lmi[2], lmj[2], v, p2, mu,
-                           cij[2], Pi[2], Pj[2]);
-              HC_cef = HCcef(t, u, v, 0, PI, p2, x);
-              num = ZI*(Nij*Hx*Hy*Hz*HC_cef);
-              element_ij[I] += num*(2*M_PI/p);
-            }
+void freeAOPairs(AOPair *pairs){
+  free(pairs[0].p);
+  free(pairs);
+}
+
+/************************************************
+*  main function for Gaussian-Coulomb integral  *
+************************************************/
+// nuclear attraction integral of orbital pair
+// veMatrix(pair, R, Z, N, work);
+double veMatrix(AOPair *pair, double *R, double *Z, int N,
+                Workspace *work){
+  int n, k, I, t, u, v;
+  double p, PI[3], PI2, x, HC_cef, num, element_ij = 0;
+  double *Ex, *Ey, *Ez;
+  int L = pair->lm[0] + pair->lm[1] + pair->lm[2];
+
+  for(n=0;n<pair->n;n++){
+    p = pair->p[n];
+    Ex = &pair->E[n * pair->n_E];
+    Ey = Ex + pair->lm[0] + 1;
+    Ez = Ey + pair->lm[1] + 1;
+    for(I=0;I<N;I++){
+      PI2 = 0;
+      for(k=0;k<3;k++){
+        PI[k] = pair->P[3*n + k] - R[k+3*I];
+        PI2 += PI[k] * PI[k];
+      }
+      x = p*PI2;
+      hermiteCoulomb(L, PI, 2*p, x, work);
+      for(t=0;t<pair->lm[0]+1;t++){
+        for(u=0;u<pair->lm[1]+1;u++){
+          for(v=0;v<pair->lm[2]+1;v++){
+            HC_cef = HCcef(work, t, u, v);
+            num = Z[I]*(pair->N[n]*Ex[t]*Ey[u]*Ez[v]*HC_cef);
+            element_ij -= num*(2*M_PI/p);
           }
         }
       }
     }
   }
-
-  free(expi);
-  free(expj);
-  free(cefi);
-  free(cefj);
+  return element_ij;
 }
 
 /************************************************
 *  main function for Gaussian-Coulomb integral  *
 ************************************************/
-//vnMatrix(R, Z, center, exp, cef, ng, 
-//         lm_xyz, Nao, N, i, j);
-double vnMatrix(double *R,      //all the rest are input
-                double *Z, 
-                double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                int N,
-                int ana
-             ){  
-
-  /* input related variables */
-  int s, a, a0 = 0, I;
-  double ca[3];
-  int lma[3];
-  int nga = ng[ana];
-  double *expa, *cefa;
-  expa = (double*) malloc(nga * sizeof(double));
-  cefa = (double*) malloc(nga * sizeof(double));
+// Coulomb potential of orbital pair at each point R
+// eeKernel(pair, R, Z, N, element_ij, work);
+void eeKernel(AOPair *pair, double *R, double *Z, int N,
+              double *element_ij, Workspace *work){
+  int n, k, I, t, u, v;
+  double p, PI[3], PI2, x, HC_cef, num;
+  double *Ex, *Ey, *Ez;
+  int L = pair->lm[0] + pair->lm[1] + pair->lm[2];
 
-  /* gaussian integral variables */
-  double cI[3], P[3], PI[3], PI2;
-  int t, u, v;
-  double p, p2, mu, ZI, x, HC_cef, Na;
-  double Hx, Hy, Hz, num, element_a = 0;
-
-  for(s=0;s<ana;s++) a0 += ng[s];
-  for(s=0;s<3;s++){
-    lma[s] = lm_xyz[s + 3*ana];
-    ca[s] = center[s + 3*ana];
-  }
-  for(a=0;a<nga;a++){
-    expa[a] = exp[a0+a];
-    cefa[a] = cef[a0+a];
-    p = expa[a];
-    p2 = 2*p;
-    mu = p;
-    Na = cefa[a] * Norm(expa[a], lma);
-    for(s=0;s<3;s++){
-      P[s] = ca[s];
-    }
-    for(I=0;I<N;I++){
+  for(I=0;I<N;I++){
+    for(n=0;n<pair->n;n++){
+      p = pair->p[n];
+      Ex = &pair->E[n * pair->n_E];
+      Ey = Ex + pair->lm[0] + 1;
+      Ez = Ey + pair->lm[1] + 1;
       PI2 = 0;
-      for(s=0;s<3;s++){
-        cI[s] = R[s + 3*I];
-        PI[s] = P[s] - cI[s];
-        PI2 += PI[s] * PI[s];
+      for(k=0;k<3;k++){
+        PI[k] = pair->P[3*n + k] - R[k+3*I];
+        PI2 += PI[k] * PI[k];
       }
-      ZI = Z[I];
       x = p*PI2;
-
-      for(t=0;t<lma[0]+1;t++){
-        Hx = Hermite(lma[0], 0, t, p2, mu,
-                     0, 0, 0);
-        for(u=0;u<lma[1]+1;u++){
-          Hy = Hermite(lma[1], 0, u, p2, mu,
-                       0, 0, 0);
-          for(v=0;v<lma[2]+1;v++){
-            Hz = Hermite(lma[2], 0, v, p2, mu,
-                         0, 0, 0);
-            HC_cef = HCcef(t, u, v, 0, PI, p2, x);
-            num = ZI*(Na*Hx*Hy*Hz*HC_cef);
-            element_a -= num*(2*M_PI/p);
+      hermiteCoulomb(L, PI, 2*p, x, work);
+      for(t=0;t<pair->lm[0]+1;t++){
+        for(u=0;u<pair->lm[1]+1;u++){
+          for(v=0;v<pair->lm[2]+1;v++){
+            HC_cef = HCcef(work, t, u, v);
+            num = Z[I]*(pair->N[n]*Ex[t]*Ey[u]*Ez[v]*HC_cef);
+            element_ij[I] += num*(2*M_PI/p);
           }
         }
       }
     }
   }
+}
 
-  free(expa);
-  free(cefa);
-  return element_a;
+/************************************************
+*  main function for Gaussian-Coulomb integral  *
+************************************************/
+// nuclear attraction integral of single density function
+// vnMatrix(single, R, Z, N, work);
+double vnMatrix(AOPair *single, double *R, double *Z, int N,
+                Workspace *work){
+  return veMatrix(single, R, Z, N, work);
 }
 
 /************************************************
@@ -658,150 +663,53 @@ double vnMatrix(double *R,      //all the rest are input
 // electron-electron repulsion matrix from atomic Gaussian orbitals
 // NOTE: Exchange interaction need to be considered 
 //       to compute two-electron energy
-// eeMatrix(center, exp, cef, ng, 
-//          lm_xyz, Nao, N, i, j, k, l);
-double eeMatrix(double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                int aoi,
-                int aoj,
-                int aok,
-                int aol
-              ){
-
-  /* input related variables */
-  int s, i, j, k, l, i0 = 0, j0 = 0, k0 = 0, l0 = 0;
-  double ci[3], cj[3], ck[3], cl[3];
-  int lmi[3], lmj[3], lmk[3], lml[3];
-  int ngi = ng[aoi], ngj = ng[aoj], ngk = ng[aok], ngl = ng[aol];
-  double *expi, *expj, *expk, *expl;
-  double *cefi, *cefj, *cefk, *cefl;
-  expi = (double*) malloc(ngi * sizeof(double));
-  expj = (double*) malloc(ngj * sizeof(double));
-  expk = (double*) malloc(ngk * sizeof(double));
-  expl = (double*) malloc(ngl * sizeof(double));
-  cefi = (double*) malloc(ngi * sizeof(double));
-  cefj = (double*) malloc(ngj * sizeof(double));
-  cefk = (double*) malloc(ngk * sizeof(double));
-  cefl = (double*) malloc(ngl * sizeof(double));
-
-  /* gaussian integral variables */
-  double P[3], Pi[3], Pj[3];
-  double Q[3], Qk[3], Ql[3];
-  double PQ[3], PQ2, alpha;
-  double cij[3], ckl[3];
-  int lmij[3], lmkl[3];
+// eeMatrix(pair_ij, pair_kl, work);
+double eeMatrix(AOPair *ij, AOPair *kl, Workspace *work){
+  int a, b, s;
   int t1, u1, v1, t2, u2, v2;
-  double p, p2, mu, Ni, Nj, Nij;
-  double q, q2, nu, Nk, Nl, Nkl;
-  double x;
-  double Hx1, Hy1, Hz1;
-  double Hx2, Hy2, Hz2;
-  double factor1, factor2, HC_cef; 
+  double p, q, alpha, x, PQ[3], PQ2;
+  double *Ex1, *Ey1, *Ez1, *Ex2, *Ey2, *Ez2;
+  double factor1, factor2, HC_cef;
   double element_ijkl = 0;
-
-  /* setup variables and save to allocated memory */
-  for(s=0;s<aoi;s++) i0 += ng[s];
-  for(s=0;s<aoj;s++) j0 += ng[s];
-  for(s=0;s<aok;s++) k0 += ng[s];
-  for(s=0;s<aol;s++) l0 += ng[s];
-  for(s=0;s<3;s++){
-    lmi[s] = lm_xyz[s + 3*aoi];
-    lmj[s] = lm_xyz[s + 3*aoj];
-    lmk[s] = lm_xyz[s + 3*aok];
-    lml[s] = lm_xyz[s + 3*aol];
-    lmij[s] = lmi[s] + lmj[s];
-    lmkl[s] = lmk[s] + lml[s];
-    ci[s] = center[s + 3*aoi];
-    cj[s] = center[s + 3*aoj];
-    ck[s] = center[s + 3*aok];
-    cl[s] = center[s + 3*aol];
-    cij[s] = ci[s] - cj[s];
-    ckl[s] = ck[s] - cl[s];
-  }
-  /* loop for i_th AO */
-  for(i=0;i<ngi;i++){
-    expi[i] = exp[i0+i];
-    cefi[i] = cef[i0+i];
-    Ni = cefi[i] * Norm(expi[i], lmi);
-    /* loop for j_th AO */
-    for(j=0;j<ngj;j++){
-      expj[j] = exp[j0+j];
-      cefj[j] = cef[j0+j];
-      Nj = cefj[j] * Norm(expj[j], lmj);
-      /* variables for first spatial variale, r1 */
-      Nij = Ni * Nj;
-      p = expi[i] + expj[j];
-      p2 = 2*p;
-      mu = expi[i] * expj[j] / p;
+  int L = ij->lm[0] + ij->lm[1] + ij->lm[2]
+          + kl->lm[0] + kl->lm[1] + kl->lm[2];
+
+  /* loop for primitive pairs of first spatial variable, r1 */
+  for(a=0;a<ij->n;a++){
+    p = ij->p[a];
+    Ex1 = &ij->E[a * ij->n_E];
+    Ey1 = Ex1 + ij->lm[0] + 1;
+    Ez1 = Ey1 + ij->lm[1] + 1;
+    /* loop for primitive pairs of second spatial variable, r2 */
+    for(b=0;b<kl->n;b++){
+      q = kl->p[b];
+      Ex2 = &kl->E[b * kl->n_E];
+      Ey2 = Ex2 + kl->lm[0] + 1;
+      Ez2 = Ey2 + kl->lm[1] + 1;
+      factor1 = 2*pow(M_PI, 5.0/2.0);
+      factor1 /= p*q * sqrt(p+q);
+      PQ2 = 0;
       for(s=0;s<3;s++){
-        P[s] = (expi[i]*ci[s] + expj[j]*cj[s]) / p;
-        Pi[s] = P[s] - ci[s];
-        Pj[s] = P[s] - cj[s];
+        PQ[s] = ij->P[3*a + s] - kl->P[3*b + s];
+        setZero(&PQ[s]);
+        PQ2 += PQ[s] * PQ[s];
       }
-      /* loop for k_th AO */
-      for(k=0;k<ngk;k++){
-        expk[k] = exp[k0+k];
-        cefk[k] = cef[k0+k];
-        Nk = cefk[k] * Norm(expk[k], lmk);
-        /* loop for l_th AO */
-        for(l=0;l<ngl;l++){
-          expl[l] = exp[l0+l];
-          cefl[l] = cef[l0+l];
-          Nl = cefl[l] * Norm(expl[l], lml);
-          /* variables for second spatial variale, r2 */
-          Nkl = Nk * Nl;
-          q = expk[k] + expl[l];
-          q2 = 2*q;
-          nu = expk[k] * expl[l] / q;
-          factor1 = 2*pow(M_PI, 5.0/2.0);
-          factor1 /= p*q * sqrt(p+q);
-          PQ2 = 0;
-          for(s=0;s<3;s++){
-            Q[s] = (expk[k]*ck[s] + expl[l]*cl[s]) / q;
-            Qk[s] = Q[s] - ck[s];
-            Ql[s] = Q[s] - cl[s];
-            PQ[s] = P[s] - Q[s];
-            setZero(&PQ[s]);
-            PQ2 += PQ[s] * PQ[s];
-          }
-          alpha = p*q / (p+q);
-          x = alpha * PQ2;
-          /* Hermite coefficient for x1 */
-          for(t1=0;t1<lmij[0]+1;t1++){
-            Hx1 = Hermite(lmi[0], lmj[0], t1, p2, mu, 
-                          cij[0], Pi[0], Pj[0]);
-            /* Hermite coefficient for y1 */
-            for(u1=0;u1<lmij[1]+1;u1++){
-              Hy1 = Hermite(lmi[1], lmj[1], u1, p2, mu, 
-                            cij[1], Pi[1], Pj[1]);
-              /* Hermite coefficient for z1 */
-              for(v1=0;v1<lmij[2]+1;v1++){
-                Hz1 = Hermite(lmi[2], lmj[2], v1, p2, mu, 
-                              cij[2], Pi[2], Pj[2]);
-                /* Hermite coefficient for x2 */
-                for(t2=0;t2<lmkl[0]+1;t2++){
-                  Hx2 = Hermite(lmk[0], lml[0], t2, q2, nu, 
-                                ckl[0], Qk[0], Ql[0]);
-                  /* Hermite coefficient for y2 */
-                  for(u2=0;u2<lmkl[1]+1;u2++){
-                    Hy2 = Hermite(lmk[1], lml[1], u2, q2, nu, 
-                                  ckl[1], Qk[1], Ql[1]);
-                    /* Hermite coefficient for z2 */
-                    for(v2=0;v2<lmkl[2]+1;v2++){
-                      Hz2 = Hermite(lmk[2], lml[2], v2, q2, nu, 
-                                    ckl[2], Qk[2], Ql[2]);
-                      factor2 = Nij*Nkl*Hx1*Hy1*Hz1*Hx2*Hy2*Hz2;
-                      factor2 *= pow(-1, t2+u2+v2);
-                      /* 2-center integral */
-                      HC_cef = HCcef(t1+t2, u1+u2, v1+v2, 
-                                     0, PQ, 2*alpha, x);
-                      element_ijkl += factor1*factor2*HC_cef;
-                    }
-                  }
+      alpha = p*q / (p+q);
+      x = alpha * PQ2;
+      hermiteCoulomb(L, PQ, 2*alpha, x, work);
+      for(t1=0;t1<ij->lm[0]+1;t1++){
+        for(u1=0;u1<ij->lm[1]+1;u1++){
+          for(v1=0;v1<ij->lm[2]+1;v1++){
+            for(t2=0;t2<kl->lm[0]+1;t2++){
+              for(u2=0;u2<kl->lm[1]+1;u2++){
+                for(v2=0;v2<kl->lm[2]+1;v2++){
+                  factor2 = ij->N[a]*kl->N[b]
+                            *Ex1[t1]*Ey1[u1]*Ez1[v1]
+                            *Ex2[t2]*Ey2[u2]*Ez2[v2];
+                  if((t2+u2+v2) % 2) factor2 = -factor2;
+                  /* 2-center integral */
+                  HC_cef = HCcef(work, t1+t2, u1+u2, v1+v2);
+                  element_ijkl += factor1*factor2*HC_cef;
                 }
               }
             }
@@ -810,15 +718,6 @@ double eeMatrix(double *center,
       }
     }
   }
-  free(expi);
-  free(expj);
-  free(expk);
-  free(expl);
-  free(cefi);
-  free(cefj);
-  free(cefk);
-  free(cefl);
-
   return element_ijkl;
 }
 
@@ -831,153 +730,9 @@ double eeMatrix(double *center,
 // It return 3D array, OUT[a, i, j] where a is the basis index
 // for density gaussian expansion while i,j denote basis index
 // for orbital gaussian expansion
-// NOTE: Exchange interaction need to be considered 
-//       to compute two-electron energy
-// neMatrix(data, center, exp, cef, ng, 
-//          lm_xyz, Nao, N, i, j, k, l);
-double neMatrix(double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                double *fcenter,
-                double *fexp,
-                double *fcef,
-                int *fng,
-                int *flm_xyz,
-                int fNao,
-                int ana,
-                int aoi,
-                int aoj
-              ){
-
-  /* input related variables */
-  int s, a, i, j, a0 = 0, i0 = 0, j0 = 0;
-  double ca[3], ci[3], cj[3];
-  int lma[3], lmi[3], lmj[3];
-  int nga = fng[ana], ngi = ng[aoi], ngj = ng[aoj];
-  double *expa, *expi, *expj, *cefa, *cefi, *cefj;
-  expa = (double*) malloc(nga * sizeof(double));
-  expi = (double*) malloc(ngi * sizeof(double));
-  expj = (double*) malloc(ngj * sizeof(double));
-  cefa = (double*) malloc(nga * sizeof(double));
-  cefi = (double*) malloc(ngi * sizeof(double));
-  cefj = (double*) malloc(ngj * sizeof(double));
-
-  /* gaussian integral variables */
-  double Q[3];
-  double P[3], Pi[3], Pj[3];
-  double PQ[3], PQ2, alpha;
-  double cij[3];
-  int lmij[3];
-  int t1, u1, v1, t2, u2, v2;
-  double q, q2, nu, Na;
-  double p, p2, mu, Ni, Nj, Nij;
-  double x;
-  double Hx1, Hy1, Hz1;
-  double Hx2, Hy2, Hz2;
-  double factor1, factor2, HC_cef; 
-  double element_aij = 0;
-
-  /* setup variables and save to allocated memory */
-  for(s=0;s<ana;s++) a0 += fng[s];
-  for(s=0;s<aoi;s++) i0 += ng[s];
-  for(s=0;s<aoj;s++) j0 += ng[s];
-  for(s=0;s<3;s++){
-    lma[s] = flm_xyz[s + 3*ana];
-    lmi[s] = lm_xyz[s + 3*aoi];
-    lmj[s] = lm_xyz[s + 3*aoj];
-    lmij[s] = lmi[s] + lmj[s];
-    ca[s] = fcenter[s + 3*ana];
-    ci[s] = center[s + 3*aoi];
-    cj[s] = center[s + 3*aoj];
-    cij[s] = ci[s] - cj[s];
-  }
-  /* loop for a_th gaussian density */
-  for(a=0;a<nga;a++){
-    expa[a] = fexp[a0+a];
-    cefa[a] = fcef[a0+a];
-    for(s=0;s<3;s++) Q[s] = ca[s];
-    Na = cefa[a] * Norm(expa[a], lma);
-    q = expa[a];
-    q2 = 2*q;
-    nu = q;
-    /* loop for i_th AO */
-    for(i=0;i<ngi;i++){
-      expi[i] = exp[i0+i];
-      cefi[i] = cef[i0+i];
-      Ni = cefi[i] * Norm(expi[i], lmi);
-      /* loop for j_th AO */
-      for(j=0;j<ngj;j++){
-        expj[j] = exp[j0+j];
-        cefj[j] = cef[j0+j];
-        Nj = cefj[j] * Norm(expj[j], lmj);
-        /* variables for first spatial variale, r1 */
-        Nij = Ni * Nj;
-        p = expi[i] + expj[j];
-        p2 = 2*p;
-        mu = expi[i] * expj[j] / p;
-        PQ2 = 0;
-        for(s=0;s<3;s++){
-          P[s] = (expi[i]*ci[s] + expj[j]*cj[s]) / p;
-          Pi[s] = P[s] - ci[s];
-          Pj[s] = P[s] - cj[s];
-          PQ[s] = P[s] - Q[s];
-          setZero(&PQ[s]);
-          PQ2 += PQ[s] * PQ[s];
-        }
-        alpha = p*q / (p+q);
-        x = alpha * PQ2;
-        factor1 = 2*pow(M_PI, 5.0/2.0);
-        factor1 /= p*q * sqrt(p+q);
-        /* Hermite coefficient for x2 */
-        for(t2=0;t2<lma[0]+1;t2++){
-          Hx2 = Hermite(lma[0], 0, t2, q2, nu, 
-                        0, 0, 0);
-          /* Hermite coefficient for y2 */
-          for(u2=0;u2<lma[1]+1;u2++){
-            Hy2 = Hermite(lma[1], 0, u2, q2, nu, 
-                          0, 0, 0);
-            /* Hermite coefficient for z2 */
-            for(v2=0;v2<lma[2]+1;v2++){
-              Hz2 = Hermite(lma[2], 0, v2, q2, nu, 
-                            0, 0, 0);
-              /* Hermite coefficient for x1 */
-              for(t1=0;t1<lmij[0]+1;t1++){
-                Hx1 = Hermite(lmi[0], lmj[0], t1, p2, mu, 
-                              cij[0], Pi[0], Pj[0]);
-                /* Hermite coefficient for y1 */
-                for(u1=0;u1<lmij[1]+1;u1++){
-                  Hy1 = Hermite(lmi[1], lmj[1], u1, p2, mu, 
-                                cij[1], Pi[1], Pj[1]);
-                  /* Hermite coefficient for z1 */
-                  for(v1=0;v1<lmij[2]+1;v1++){
-                    Hz1 = Hermite(lmi[2], lmj[2], v1, p2, mu, 
-                                  cij[2], Pi[2], Pj[2]);
-                    factor2 = Nij*Na*Hx1*Hy1*Hz1*Hx2*Hy2*Hz2;
-                    factor2 *= pow(-1, t2+u2+v2);
-                    /* 2-center integral */
-                    HC_cef = HCcef(t1+t2, u1+u2, v1+v2, 
-                                   0, PQ, 2*alpha, x);
-                    element_aij += factor1*factor2*HC_cef;
-                  }
-                }
-              }
-            }
-          }
-        }
-      }
-    }
-  }
-  free(expa);
-  free(expi);
-  free(expj);
-  free(cefa);
-  free(cefi);
-  free(cefj);
-
-  return element_aij;
+// neMatrix(pair_ij, single_a, work);
+double neMatrix(AOPair *ij, AOPair *a, Workspace *work){
+  return eeMatrix(ij, a, work);
 }
 
 /****************************************************************
@@ -987,237 +742,33 @@ double neMatrix(double *center,
 // electron-electron repulsion matrix from atomic Gaussian density
 // It return 2D array, OUT[a, b] where a, b are the basis indices
 // for density gaussian expansion
-// NOTE: Exchange interaction need to be considered 
-//       to compute two-electron energy
-// neMatrix(data, center, exp, cef, ng, 
-//          lm_xyz, Nao, N, i, j, k, l);
-double nnMatrix(double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                int ana,
-                int anb
-              ){
-
-  /* input related variables */
-  int s, a, b, a0 = 0, b0 = 0;
-  double ca[3], cb[3];
-  int lma[3], lmb[3];
-  int nga = ng[ana], ngb = ng[anb];
-  double *expa, *expb, *cefa, *cefb;
-  expa = (double*) malloc(nga * sizeof(double));
-  expb = (double*) malloc(ngb * sizeof(double));
-  cefa = (double*) malloc(nga * sizeof(double));
-  cefb = (double*) malloc(ngb * sizeof(double));
-
-  /* gaussian integral variables */
-  double Q[3];
-  double P[3];
-  double PQ[3], PQ2, alpha;
-  int t1, u1, v1, t2, u2, v2;
-  double q, q2, nu, Na;
-  double p, p2, mu, Nb;
-  double x;
-  double Hx1, Hy1, Hz1;
-  double Hx2, Hy2, Hz2;
-  double factor1, factor2, HC_cef; 
-  double element_ab = 0;
-
-  /* setup variables and save to allocated memory */
-  for(s=0;s<ana;s++) a0 += ng[s];
-  for(s=0;s<anb;s++) b0 += ng[s];
-  for(s=0;s<3;s++){
-    lma[s] = lm_xyz[s + 3*ana];
-    lmb[s] = lm_xyz[s + 3*anb];
-    ca[s] = center[s + 3*ana];
-    cb[s] = center[s + 3*anb];
-  }
-  /* loop for a_th gaussian density */
-  for(a=0;a<nga;a++){
-    expa[a] = exp[a0+a];
-    cefa[a] = cef[a0+a];
-    for(s=0;s<3;s++) P[s] = ca[s];
-    Na = cefa[a] * Norm(expa[a], lma);
-    p = expa[a];
-    p2 = 2*p;
-    mu = p;
-    for(b=0;b<ngb;b++){
-      expb[b] = exp[b0+b];
-      cefb[b] = cef[b0+b];
-      for(s=0;s<3;s++) Q[s] = cb[s];
-      Nb = cefb[b] * Norm(expb[b], lmb);
-      q = expb[b];
-      q2 = 2*q;
-      nu = q;
-      PQ2 = 0;
-      for(s=0;s<3;s++){
-        PQ[s] = P[s] - Q[s];
-        setZero(&PQ[s]);
-        PQ2 += PQ[s] * PQ[s];
-      }
-      alpha = p*q / (p+q);
-      x = alpha * PQ2;
-      factor1 = 2*pow(M_PI, 5.0/2.0);
-      factor1 /= p*q * sqrt(p+q);
-      /* Hermite coefficient for x1 */
-      for(t1=0;t1<lma[0]+1;t1++){
-        Hx1 = Hermite(lma[0], 0, t1, p2, mu,
-                      0, 0, 0);
-        /* Hermite coefficient for y1 */
-        for(u1=0;u1<lma[1]+1;u1++){
-          Hy1 = Hermite(lma[1], 0, u1, p2, mu,
-                        0, 0, 0);
-          /* Hermite coefficient for z1 */
-          for(v1=0;v1<lma[2]+1;v1++){
-            Hz1 = Hermite(lma[2], 0, v1, p2, mu,
-                          0, 0, 0);
-            /* Hermite coefficient for x2 */
-            for(t2=0;t2<lmb[0]+1;t2++){
-              Hx2 = Hermite(lmb[0], 0, t2, q2, nu,
-                            0, 0, 0);
-              /* Hermite coefficient for y2 */
-              for(u2=0;u2<lmb[1]+1;u2++){
-                Hy2 = Hermite(lmb[1], 0, u2, q2, nu,
-                              0, 0, 0);
-                /* Hermite coefficient for z2 */
-                for(v2=0;v2<lmb[2]+1;v2++){
-                  Hz2 = Hermite(lmb[2], 0, v2, q2, nu,
-                                0, 0, 0);
-                  factor2 = Na*Nb*Hx1*Hy1*Hz1*Hx2*Hy2*Hz2;
-                  factor2 *= pow(-1, t2+u2+v2);
-                  /* 2-center integral */
-                  HC_cef = HCcef(t1+t2, u1+u2, v1+v2, 
-                                 0, PQ, 2*alpha, x);
-                  element_ab += factor1*factor2*HC_cef;
-                }
-              }
-            }
-          }
-        }
-      }
-    }
-  }
-  free(expa);
-  free(expb);
-  free(cefa);
-  free(cefb);
-
-  return element_ab;
+// nnMatrix(single_a, single_b, work);
+double nnMatrix(AOPair *a, AOPair *b, Workspace *work){
+  return eeMatrix(a, b, work);
 }
 
 /******************************************************
 *  main function for Gaussian 2nd-derivativeintegral  *
 ******************************************************/
-//keMatrix(R, Z, center, exp, cef, ng, 
-//         lm_xyz, Nao, N, i, j);
-double keMatrix(double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int aoi,
-                int aoj){
-
-  double element_ij = 0;
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          1, 0, 0, 0, 2, 0, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          1, 0, 0, 0, 0, 0, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          1, 0, 0, 0, -2, 0, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          2, 0, 0, 0, 0, 2, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          2, 0, 0, 0, 0, 0, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          2, 0, 0, 0, 0, -2, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          3, 0, 0, 0, 0, 0, 2);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          3, 0, 0, 0, 0, 0, 0);
-  element_ij += aoOverlap(center, exp, cef, ng, lm_xyz, aoi, aoj, 
-                          3, 0, 0, 0, 0, 0, -2);
+// kinetic energy integral from 1D overlap and kinetic factors
+// keMatrix(pair);
+double keMatrix(AOPair *pair){
+  int n;
+  double *S, *T, element_ij = 0;
+  for(n=0;n<pair->n;n++){
+    S = &pair->S[3*n];
+    T = &pair->T[3*n];
+    element_ij += pair->N[n] * pow(M_PI/pair->p[n], 1.5)
+                  * (T[0]*S[1]*S[2] + S[0]*T[1]*S[2] + S[0]*S[1]*T[2]);
+  }
   return -0.5*element_ij;
 }
 
 /*******************************************************
 *  main function for Gaussian 1st-derivative integral  *
 *******************************************************/
-//knMatrix(R, Z, center, exp, cef, ng, 
-//         lm_xyz, Nao, N, i, j);
-double knMatrix(double *R,      //all the rest are input
-                double *Z, 
-                double *center,
-                double *exp,
-                double *cef,
-                int *ng,
-                int *lm_xyz,
-                int Nao,
-                int N,
-                int ana
-             ){  
-
-  /* input related variables */
-  int s, a, a0 = 0, I;
-  double ca[3];
-  int lma[3];
-  int nga = ng[ana];
-  double *expa, *cefa;
-  expa = (double*) malloc(nga * sizeof(double));
-  cefa = (double*) malloc(nga * sizeof(double));
-
-  /* gaussian integral variables */
-  double cI[3], P[3], PI[3], PI2;
-  int t, u, v;
-  double p, p2, mu, ZI, x, HC_cef, Na;
-  double Hx, Hy, Hz, num, element_a = 0;
-
-  for(s=0;s<ana;s++) a0 += ng[s];
-  for(s=0;s<3;s++){
-    lma[s] = lm_xyz[s + 3*ana];
-    ca[s] = center[s + 3*ana];
-  }
-  for(a=0;a<nga;a++){
-    expa[a] = exp[a0+a];
-    cefa[a] = cef[a0+a];
-    p = expa[a];
-    p2 = 2*p;
-    mu = p;
-    Na = cefa[a] * Norm(expa[a], lma);
-    for(s=0;s<3;s++){
-      P[s] = ca[s];
-    }
-    for(I=0;I<N;I++){
-      PI2 = 0;
-      for(s=0;s<3;s++){
-        cI[s] = R[s + 3*I];
-        PI[s] = P[s] - cI[s];
-        PI2 += PI[s] * PI[s];
-      }
-      ZI = Z[I];
-      x = p*PI2;
-
-      for(t=0;t<lma[0]+1;t++){
-        Hx = Hermite(lma[0], 0, t, p2, mu,
-                     0, 0, 0);
-        for(u=0;u<lma[1]+1;u++){
-          Hy = Hermite(lma[1], 0, u, p2, mu,
-                       0, 0, 0);
-          for(v=0;v<lma[2]+1;v++){
-            Hz = Hermite(lma[2], 0, v, p2, mu,
-                         0, 0, 0);
-            HC_cef = HCcef(t, u, v, 0, PI, p2, x);
-            num = ZI*(Na*Hx*Hy*Hz*HC_cef);
-            element_a -= num*(2*M_PI/p);
-          }
-        }
-      }
-    }
-  }
-
-  free(expa);
-  free(cefa);
-  return element_a;
+// knMatrix(single, R, Z, N, work);
+double knMatrix(AOPair *single, double *R, double *Z, int N,
+                Workspace *work){
+  return veMatrix(single, R, Z, N, work);
 }
@@ -8,10 +8,6 @@ void setD2Cef(int, int, double, double*);
 double Hermite(int, int, int, double, double,
                double, double, double);
 
-// Hermite-Coulomb integral coefficient
-double HCcef(int, int, int, int, 
-             double*, double, double);
-
 // 2-factorial function
 int fac2(int);
 
@@ -39,37 +35,89 @@ void orthogonalize(double*, double*,
                    double*, double*, int*, 
                    int*, int);
 
-// Boys function
+// Boys function, reference implementation from gsl
 double F(int, double);
 
+// tabulated Boys function, highest tabulated order and
+// start of asymptotic range
+#define BOYS_M_MAX 32
+#define BOYS_X_MAX 40
+
+// boysInit() before first call of boys
+void boysInit(void);
+
+// boys(m_max, x, Fm), Fm[m] = F(m, x) for m = 0, ..., m_max
+void boys(int, double, double*);
+
+/* primitive pair data of two atomic orbitals */
+// built once per basis/geometry by aoPairs/aoSingles,
+// arrays hold n primitive pairs
+typedef struct {
+  int n;       // number of primitive pairs
+  int lm[3];   // summed angular momentum in x, y, z
+  int n_E;     // Hermite coefficients per primitive pair
+  double *p;   // combined exponents
+  double *P;   // Gaussian product centers, 3 per primitive pair
+  double *N;   // product of normalized contraction coefficients
+  double *S;   // 1D overlap factors, 3 per primitive pair
+  double *T;   // 1D kinetic factors, 3 per primitive pair
+  double *E;   // Hermite coefficients E_t for x, y, z, n_E each
+} AOPair;
+
+// index of orbital pair i <= j
+static inline int pairIndex(int i, int j, int Nao){
+  return i*Nao - i*(i-1)/2 + j - i;
+}
+
+/* per-thread scratch memory of the Coulomb kernels */
+typedef struct {
+  int L;       // highest total angular momentum t+u+v
+  double *Rn;  // scaled Boys function (-p2)^n F_n(x), L+1
+  double *R;   // Hermite-Coulomb integrals R^n_tuv, (L+1)^4
+} Workspace;
+
+// work = newWorkspace(L), one per thread
+Workspace* newWorkspace(int);
+
+void freeWorkspace(Workspace*);
+
+// L = maxAngular(pairs, n_pair);
+int maxAngular(AOPair*, int);
+
+// hermiteCoulomb(L, PI, p2, x, work);
+void hermiteCoulomb(int, double*, double, double, Workspace*);
+
+// Hermite-Coulomb integral coefficient R_tuv after hermiteCoulomb
+#define HCcef(work, t, u, v) \
+  ((work)->R[(((t)*((work)->L+1) + (u))*((work)->L+1)) + (v)])
+
+// pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+AOPair* aoPairs(double*, double*, double*, int*, int*, int);
+
+// singles = aoSingles(center, exp, cef, ng, lm_xyz, Nao);
+AOPair* aoSingles(double*, double*, double*, int*, int*, int);
+
+void freeAOPairs(AOPair*);
+
 // one-center electorn-nucleus integral
-double veMatrix(double*, double*, double*, double*, double*,
-                int*, int*, int, int, int, int);
+double veMatrix(AOPair*, double*, double*, int, Workspace*);
 
-void eeKernel(double*, double*, double*, double*, double*, double*,
-              int*, int*, int, int, int, int);
+void eeKernel(AOPair*, double*, double*, int, double*, Workspace*);
 
 // 4D two-center electorn-repulsion integral
-double eeMatrix(double*, double*, double*, int*, int*,
-                int, int, int, int, int);
+double eeMatrix(AOPair*, AOPair*, Workspace*);
 
 // 3D two-center electorn-repulsion integral
-double neMatrix(double*, double*, double*, int*, int*, int, 
-                double*, double*, double*, int*, int*, int, 
-                int, int, int);
+double neMatrix(AOPair*, AOPair*, Workspace*);
 
 // 2D two-center electorn-repulsion integral
-double nnMatrix(double*, double*, double*, int*, int*,
-                int, int, int);
+double nnMatrix(AOPair*, AOPair*, Workspace*);
 
 // one-center electorn-nucleus integral
-double vnMatrix(double*, double*, double*, double*, double*,
-                int*, int*, int, int, int);
+double vnMatrix(AOPair*, double*, double*, int, Workspace*);
 
 // electron wavefunction second order derivative integral
-double keMatrix(double*, double*, double*,
-                int*, int*, int, int);
+double keMatrix(AOPair*);
 
 // electron density first order derivative integral
-double knMatrix(double*, double*, double*, double*, double*,
-                int*, int*, int, int, int);
+double knMatrix(AOPair*, double*, double*, int, Workspace*);
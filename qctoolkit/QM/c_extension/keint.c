@@ -37,6 +37,7 @@ static PyObject* keint(PyObject* self, PyObject* args){
   double *cef;     // contraction coefficients
   int *ng;         // number of gaussians per AO
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // primitive pairs of orbitals
   int *lm_xyz;     // angular momentum
 
   /* python output variables */
@@ -149,6 +150,7 @@ static PyObject* keint(PyObject* self, PyObject* args){
 
   /* renormalization */
   renormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -162,7 +164,7 @@ static PyObject* keint(PyObject* self, PyObject* args){
 //  #pragma omp for schedule(dynamic)
   for(i=0;i<Nao;i++){
     for(j=i;j<Nao;j++){
-      data[j+i*Nao] = keMatrix(center, exp, cef, ng, lm_xyz, i, j);
+      data[j+i*Nao] = keMatrix(&pairs[pairIndex(i, j, Nao)]);
       if(j!=i) data[i+j*Nao] = data[j+i*Nao];
     }
   }
@@ -171,6 +173,7 @@ static PyObject* keint(PyObject* self, PyObject* args){
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
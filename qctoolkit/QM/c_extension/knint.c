@@ -42,6 +42,8 @@ static PyObject* knint(PyObject* self, PyObject* args){
   double *cef;     // contraction coefficients
   int *ng;         // number of gaussians per AO
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // primitive pairs of orbitals
+  int L;           // highest angular momentum of Hermite-Coulomb
   int *lm_xyz;     // angular momentum
 
   /* python output variables */
@@ -183,6 +185,8 @@ static PyObject* knint(PyObject* self, PyObject* args){
 
   /* renormalization */
   renormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+  L = maxAngular(pairs, Nao*(Nao+1)/2);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -193,21 +197,23 @@ static PyObject* knint(PyObject* self, PyObject* args){
 
 #pragma omp parallel private(i, j) shared(data)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
   for(i=0;i<Nao;i++){
     for(j=i;j<Nao;j++){
                       // NOT YET implemented
-      data[j+i*Nao] = veMatrix(R, Z, 
-                      center, exp, cef, ng, lm_xyz, 
-                      Nao, N, i, j);
+      data[j+i*Nao] = veMatrix(&pairs[pairIndex(i, j, Nao)],
+                               R, Z, N, work);
       if(j!=i) data[i+j*Nao] = data[j+i*Nao];
     }
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
@@ -237,4 +243,6 @@ PyMODINIT_FUNC initknint(void){
   (void) Py_InitModule("knint", KNInt);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
@@ -42,6 +42,9 @@ static PyObject* neint(PyObject* self, PyObject* args){
   int *ng;         // number of gaussians per AO
   int *fng;        // number of gaussians per atomic density
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // primitive pairs of orbitals
+  AOPair *fpairs;  // single densities as pairs
+  int L;           // highest angular momentum of Hermite-Coulomb
   double *fexp;    // gaussian exponents
   int *lm_xyz;     // angular momentum
   int *flm_xyz;    // angular momentum, for density-fitting
@@ -238,6 +241,9 @@ static PyObject* neint(PyObject* self, PyObject* args){
   renormalize(center, exp, cef, ng, lm_xyz, Nao);
   /* renormalization of density */
   densityRenormalize(fcenter, fexp, fcef, fng, flm_xyz, fNao);
+  pairs = aoPairs(center, exp, cef, ng, lm_xyz, Nao);
+  fpairs = aoSingles(fcenter, fexp, fcef, fng, flm_xyz, fNao);
+  L = maxAngular(pairs, Nao*(Nao+1)/2) + maxAngular(fpairs, fNao);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -248,24 +254,27 @@ static PyObject* neint(PyObject* self, PyObject* args){
 
 #pragma omp parallel private(a, i, j, s, element) shared(data)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
   for(a=0;a<fNao;a++){
     for(i=0;i<Nao;i++){
       for(j=i;j<Nao;j++){
         s = j + i*Nao + a*Nao*Nao;
-        element = neMatrix(center, exp, cef, ng, lm_xyz, Nao,
-                           fcenter, fexp, fcef, fng, flm_xyz, fNao,
-                           a, i, j);
+        element = neMatrix(&pairs[pairIndex(i, j, Nao)], &fpairs[a],
+                           work);
         data[s] = element;
         if(j>i) data[i + j*Nao + a*Nao*Nao] = element;
       }
     }
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
+  freeAOPairs(fpairs);
   free(exp);
   free(cef);
   free(ng);
@@ -299,4 +308,6 @@ PyMODINIT_FUNC initneint(void){
   (void) Py_InitModule("neint", NEInt);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
@@ -37,6 +37,8 @@ static PyObject* nnint(PyObject* self, PyObject* args){
   double *cef;     // contraction coefficients
   int *ng;         // number of gaussians per AO
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // single densities as pairs
+  int L;           // highest angular momentum of Hermite-Coulomb
   int *lm_xyz;     // angular momentum
 
   /* python output variables */
@@ -148,6 +150,8 @@ static PyObject* nnint(PyObject* self, PyObject* args){
 
   /* renormalization */
   densityRenormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoSingles(center, exp, cef, ng, lm_xyz, Nao);
+  L = 2 * maxAngular(pairs, Nao);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -158,19 +162,21 @@ static PyObject* nnint(PyObject* self, PyObject* args){
 
 #pragma omp parallel private(i, j) shared(data)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
   for(i=0;i<Nao;i++){
     for(j=i;j<Nao;j++){
-      data[j+i*Nao] = nnMatrix(center, exp, cef, ng, lm_xyz, 
-                               Nao, i, j);
+      data[j+i*Nao] = nnMatrix(&pairs[i], &pairs[j], work);
       if(j!=i) data[i+j*Nao] = data[j+i*Nao];
     }
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
@@ -199,4 +205,6 @@ PyMODINIT_FUNC initnnint(void){
   (void) Py_InitModule("nnint", NNInt);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
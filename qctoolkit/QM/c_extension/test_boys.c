@@ -0,0 +1,50 @@
+// accuracy test of tabulated Boys function against gsl
+//
+// gcc -O2 -fopenmp -o test_boys test_boys.c boys.c gaussian.c
+//     -lgsl -lgslcblas -lm && ./test_boys
+//
+// boys(m_max, x) is compared with the gsl implementation F(m, x)
+// for all orders m <= m_max on a dense x grid covering the
+// Taylor range, the switch to asymptotic range and large x.
+// Exit status is nonzero if the relative error exceeds TOLERANCE
+
+#include <stdio.h>
+#include <math.h>
+#include "gaussian.h"
+
+#define TOLERANCE 1E-12
+
+int main(void){
+  int m_max, m, i, n_fail = 0;
+  double x, ref, err, err_max = 0, x_worst = 0;
+  int m_worst = 0;
+  double Fm[BOYS_M_MAX + 2];
+
+  boysInit();
+  for(m_max=0;m_max<=BOYS_M_MAX+1;m_max++){
+    for(i=0;i<=12000;i++){
+      // dense up to asymptotic range, sparse beyond
+      if(i <= 10000) x = i * (BOYS_X_MAX + 5.0) / 10000.0;
+      else x = (BOYS_X_MAX + 5.0) * pow(20.0, (i - 10000) / 2000.0);
+      boys(m_max, x, Fm);
+      for(m=0;m<=m_max;m++){
+        ref = F(m, x);
+        err = fabs(Fm[m] - ref) / ref;
+        if(err > err_max){
+          err_max = err;
+          x_worst = x;
+          m_worst = m;
+        }
+        if(err > TOLERANCE) n_fail++;
+      }
+    }
+  }
+  printf("max relative error %.3e at m=%d, x=%.4f\n",
+         err_max, m_worst, x_worst);
+  if(n_fail > 0){
+    printf("%d values above tolerance %.1e\n", n_fail, TOLERANCE);
+    return 1;
+  }
+  printf("passed\n");
+  return 0;
+}
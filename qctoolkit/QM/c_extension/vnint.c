@@ -42,6 +42,8 @@ static PyObject* vnint(PyObject* self, PyObject* args){
   double *cef;     // contraction coefficients
   int *ng;         // number of gaussians per AO
   double *exp;     // gaussian exponents
+  AOPair *pairs;   // single densities as pairs
+  int L;           // highest angular momentum of Hermite-Coulomb
   int *lm_xyz;     // angular momentum
 
   /* python output variables */
@@ -182,6 +184,8 @@ static PyObject* vnint(PyObject* self, PyObject* args){
 
   /* renormalization */
   densityRenormalize(center, exp, cef, ng, lm_xyz, Nao);
+  pairs = aoSingles(center, exp, cef, ng, lm_xyz, Nao);
+  L = maxAngular(pairs, Nao);
 
   /* orthogonalize */
   // no effect at the moment, for debug purpose
@@ -192,16 +196,18 @@ static PyObject* vnint(PyObject* self, PyObject* args){
 
 #pragma omp parallel private(i) shared(data)
 {
+  Workspace *work = newWorkspace(L);
   #pragma omp for schedule(dynamic)
   for(i=0;i<Nao;i++){
-      data[i] = vnMatrix(R, Z, center, exp, cef, ng, lm_xyz, 
-                         Nao, N, i);
+      data[i] = vnMatrix(&pairs[i], R, Z, N, work);
   }
+  freeWorkspace(work);
 } // end of omp loop
 
   /*********************************
   * clean up and return the result *
   *********************************/
+  freeAOPairs(pairs);
   free(exp);
   free(cef);
   free(ng);
@@ -231,4 +237,6 @@ PyMODINIT_FUNC initvnint(void){
   (void) Py_InitModule("vnint", VNInt);
   /* IMPORTANT: this must be called */
   import_array();
+  /* Boys function table shared by all calls */
+  boysInit();
 }
@@ -2,7 +2,7 @@ import qctoolkit as qtk
 from general_io import GenericQMInput
 from general_io import GenericQMOutput
 from veint import veint
-from eeint import eeint
+from eeint import eeint, eejk
 from eekernel import eekernel
 from neint import neint
 from nnint import nnint
@@ -507,34 +507,42 @@ class GaussianBasisOutput(GenericQMOutput):
     out = np.einsum('is,il, kls->k', mo, mo, k)
     return out
 
-  def eeMatrix(self):
-    if not hasattr(self, '_eeMatrix'):
-      self._eeMatrix = eeMatrix(self.basis)
+  def eeMatrix(self, tolerance=1E-12, density_weighted=False):
+    """
+    packed electron repulsion integrals (ij|kl) with Schwarz
+    screening, see eeMatrix. density_weighted=True screens with the
+    density matrix of the output. Number of unique and skipped
+    quartets are kept in self.ee_screening
+    """
+    key = (tolerance, density_weighted)
+    if not hasattr(self, '_eeMatrix') or self._eeMatrix_key != key:
+      density = None
+      if density_weighted:
+        density = self.densityMatrix()
+      self._eeMatrix, n_quartet, n_skip = eeMatrix(
+        self.basis, tolerance, density, stats=True)
+      self._eeMatrix_key = key
+      self.ee_screening = {
+        'tolerance': tolerance,
+        'density_weighted': density_weighted,
+        'quartets': n_quartet,
+        'skipped': n_skip,
+      }
     return self._eeMatrix
 
-  def EJ(self):
-    ee = 2*self.eeMatrix()
-    td = np.tensordot
-    mo = self.mo_vectors
-    out = td(mo, ee, axes=(1, 0))
-    out = td(mo, out, axes=(1, 1))
-    out = td(mo, out, axes=(1, 2))
-    out = td(mo, out, axes=(1, 3))
+  def _occupiedDensity(self):
+    """P = C_occ^T C_occ of doubly occupied orbitals"""
     occ = int(np.sum(self.occupation) / 2.)
-    EJ = [out[a,a,b,b] for a in range(occ) for b in range(occ)]
-    return sum(EJ)
+    mo_occ = self.mo_vectors[:occ]
+    return np.dot(mo_occ.T, mo_occ)
+
+  def EJ(self):
+    P = self._occupiedDensity()
+    return 2 * np.sum(P * self.eeMatrix().J(P))
 
   def EX(self):
-    ex = -np.swapaxes(self.eeMatrix(), 1,2)
-    td = np.tensordot
-    mo = self.mo_vectors
-    out = td(mo, ex, axes=(1, 0))
-    out = td(mo, out, axes=(1, 1))
-    out = td(mo, out, axes=(1, 2))
-    out = td(mo, out, axes=(1, 3))
-    occ = int(np.sum(self.occupation) / 2.)
-    EX = [out[a,a,b,b] for a in range(occ) for b in range(occ)]
-    return sum(EX)
+    P = self._occupiedDensity()
+    return -np.sum(P * self.eeMatrix().K(P))
 
   def EK(self):
     km = self.keMatrix()
@@ -563,6 +571,87 @@ class GaussianBasisOutput(GenericQMOutput):
   #def neMatrix(self):
   #  return neMatrix(self.basis)
 
+class PackedERI(object):
+  """
+  electron repulsion integrals (ij|kl) stored once per unique
+  quartet of orbital pairs i<=j, k<=l and pair (i,j)<=(k,l),
+  Nao^4/8 elements instead of the full 4D tensor.
+  Coulomb/exchange contractions run on the packed form,
+  4D array is only built by unpack()
+
+  Example:
+    eri = qmout.eeMatrix()
+    eri[0, 1, 2, 3]
+    J, K = eri.JK(dm)
+    F = eri.fock(dm, h)
+  """
+  def __init__(self, data, n_ao):
+    self.data = data
+    self.n_ao = n_ao
+    self.n_pair = n_ao * (n_ao + 1) / 2
+    if len(data) != self.n_pair * (self.n_pair + 1) / 2:
+      qtk.exit("packed integrals do not match %d orbitals" % n_ao)
+
+  @staticmethod
+  def pairIndex(i, j, n_ao):
+    """canonical index of orbital pair (i, j), symmetric in i, j"""
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return i * n_ao - i * (i - 1) / 2 + j - i
+
+  def index(self, i, j, k, l):
+    """position of (ij|kl) in packed data, numpy broadcast"""
+    ij = self.pairIndex(np.asarray(i), np.asarray(j), self.n_ao)
+    kl = self.pairIndex(np.asarray(k), np.asarray(l), self.n_ao)
+    ij, kl = np.minimum(ij, kl), np.maximum(ij, kl)
+    return ij * self.n_pair - ij * (ij - 1) / 2 + kl - ij
+
+  def __getitem__(self, ijkl):
+    return self.data[self.index(*ijkl)]
+
+  def __len__(self):
+    return len(self.data)
+
+  def JK(self, density):
+    """
+    Coulomb J_ij = sum_kl (ij|kl) D_kl and exchange 
+    K_ik = sum_jl (ij|kl) D_jl of symmetric density matrix D
+    """
+    density = np.asarray(density, dtype=float)
+    if density.shape != (self.n_ao, self.n_ao):
+      qtk.exit("density matrix must be %d x %d" % \
+               (self.n_ao, self.n_ao))
+    # K of packed quartets is only valid for D = D^T
+    if not np.allclose(density, density.T):
+      qtk.exit("density matrix must be symmetric")
+    return eejk(self.data, density)
+
+  def J(self, density):
+    return self.JK(density)[0]
+
+  def K(self, density):
+    return self.JK(density)[1]
+
+  def fock(self, density, core=None):
+    """
+    closed shell Fock matrix h + J - K/2 of total density matrix,
+    two-electron part only if core Hamiltonian h is not given
+    """
+    J, K = self.JK(density)
+    out = J - 0.5 * K
+    if core is not None:
+      out = out + core
+    return out
+
+  def unpack(self):
+    """full 4D array (ij|kl), built one slice of i at a time"""
+    n = self.n_ao
+    out = np.empty([n, n, n, n])
+    r = np.arange(n)
+    for i in range(n):
+      out[i] = self[i, r[:, None, None], r[None, :, None], 
+                    r[None, None, :]]
+    return out
+
 def veMatrix(basis, coord, Z):
   basis_data, center, lm = basisData(basis)
   coord = np.array(coord) * 1.889725989
@@ -575,10 +664,26 @@ def vnMatrix(basis, coord, Z):
   warnings.filterwarnings("ignore", category=DeprecationWarning) 
   return vnint(basis_data, center, lm, coord, list(Z))
 
-def eeMatrix(basis):
+def eeMatrix(basis, tolerance=1E-12, density=None, **kwargs):
+  """
+  electron repulsion integrals (ij|kl) of unique quartets
+  i<=j, k<=l, (i,j)<=(k,l) as PackedERI, unpack() for 4D array.
+  Quartets with Cauchy-Schwarz bound sqrt((ij|ij)(kl|kl)) below
+  tolerance are skipped and left zero. With density matrix, the
+  bound is weighted by its largest element coupled to the quartet.
+  tolerance=0 gives the unscreened integrals.
+
+  kwargs:
+    stats(bool), also return number of unique and skipped quartets
+  """
   basis_data, center, lm = basisData(basis)
   warnings.filterwarnings("ignore", category=DeprecationWarning) 
-  return eeint(basis_data, center, lm)
+  out, n_quartet, n_skip = eeint(basis_data, center, lm,
+                                 float(tolerance), density)
+  out = PackedERI(out, len(center))
+  if 'stats' in kwargs and kwargs['stats']:
+    return out, n_quartet, n_skip
+  return out
 
 def eeKernel(basis, coord):
   basis_data, center, lm = basisData(basis)
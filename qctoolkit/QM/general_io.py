@@ -1,10 +1,9 @@
 import qctoolkit as qtk
 import re, os, shutil, copy, sys
 import numpy as np
-import qctoolkit.QM.qmjob as qmjob
+import qctoolkit.QM.supervisor as supervisor
+from qctoolkit.QM.monitor import getMonitor
 import universal as univ
-import paramiko
-import pexpect
 
 class InpContent(object):
   """
@@ -178,12 +177,19 @@ class QMWorker(object):
       self.name = self.inp.final_name
     else:
       self.name = new_name
+    # qmjob imports all qmcode modules which depend on this module
+    import qctoolkit.QM.qmjob as qmjob
     if self.inp.finalized:
-      cwd = os.getcwd()
-      os.chdir(self.inp.final_path)
       run_setup = copy.deepcopy(self.setting)
       del run_setup['program']
 
+      # submit to JobSupervisor of enclosing 'with' block
+      sup = supervisor.current()
+      if sup is not None:
+        return self.submit(sup, run_setup)
+
+      cwd = os.getcwd()
+      os.chdir(self.inp.final_path)
       if 'debug' in self.setting and self.setting['debug']:
         out = qmjob.QMRun(self.name, self.qmcode, **run_setup)
         os.chdir(cwd)
@@ -202,6 +208,30 @@ class QMWorker(object):
     else:
       qtk.exit("InpContent not finalized, no inp name?")
 
+  def submit(self, sup, run_setup):
+    """submit QM job to JobSupervisor, return SupervisedTask"""
+    cores = 1
+    for key in ['threads', 'omp']:
+      if key in run_setup and run_setup[key]:
+        cores = cores * int(run_setup[key])
+    timeout = None
+    if 'timeout' in run_setup:
+      timeout = run_setup['timeout']
+    import qctoolkit.QM.qmjob as qmjob
+    steps = qmjob.QMSteps(self.name, self.qmcode, **run_setup)
+    monitor = getMonitor(self.qmcode, **run_setup)
+    task = sup.submit(steps, self.inp.final_path, self.name,
+                      cores, timeout, monitor=monitor)
+
+    def check(task):
+      if task.state != 'done':
+        qtk.warning("qmjob finished unexpectedly for '" + \
+                    self.name + "'" + ", with state: %s %s" \
+                    % (task.state, str(task.error)))
+        task.out = GenericQMOutput()
+    task.onDone(check)
+    return task
+
 class GenericQMInput(object):
   """
   From GenericQMInput:
@@ -366,7 +396,7 @@ class GenericQMInput(object):
       self.setting.update(kwargs)
 
     inp = InpContent(name, **setting)
-    molecule = copy.deepcopy(self.molecule)
+    molecule = self.molecule.copy(deep=False)
     self.cm_check(molecule)
 
     if 'no_molecule' in kwargs and kwargs['no_molecule']:
@@ -0,0 +1,210 @@
+import qctoolkit as qtk
+import qctoolkit.setting as setting
+import numpy as np
+import re
+import os
+
+# per-program patterns of running output, same lines as used by
+# the output parsers in qmcode/*.py
+#   file: None for stdout of the command, '.ext' for file with the
+#         same stem as stdout, otherwise file name in job directory
+#   scf: scf step line, optional groups 'step' and 'energy'
+#   energy: converged energy line, group 'energy'
+#   error: error banners of the program
+patterns = {
+  'cpmd': {
+    'file': None,
+    'scf': r'^ *(?P<step>\d+) +\d\.\d{3}E-\d\d +\S+ +(?P<energy>\S+)',
+    'energy': r'TOTAL ENERGY = +(?P<energy>\S+)',
+    'error': [r'PROGRAM STOPS IN SUBROUTINE'],
+  },
+  'gaussian': {
+    'file': '.log',
+    'scf': r'^ Cycle +(?P<step>\d+)',
+    'energy': r'SCF Done: +E\(\S+\) = +(?P<energy>\S+)',
+    'error': [r'Error termination', r'Convergence failure'],
+  },
+  'nwchem': {
+    'file': None,
+    'scf': r'^ d= *\d+,ls=\S+ +(?P<step>\d+) +(?P<energy>\S+)',
+    'energy': r'Total \w+ energy = +(?P<energy>\S+)',
+    'error': [r'[Cc]alculation failed to converge',
+              r'There is an error in the input file'],
+  },
+  'espresso': {
+    'file': None,
+    'scf': r'^ +iteration # *(?P<step>\d+)',
+    'energy': r'^!? +total energy += +(?P<energy>\S+)',
+    'error': [r'^ %{20,}', r'convergence NOT achieved'],
+  },
+  'vasp': {
+    'file': 'OUTCAR',
+    'scf': r'Iteration +\d+\( *(?P<step>\d+)\)',
+    'energy': r'TOTEN += +(?P<energy>\S+) eV',
+    'error': [r'VERY BAD NEWS', r'ZBRENT: fatal'],
+  },
+  'abinit': {
+    'file': None,
+    'scf': r'^ ETOT +(?P<step>\d+) +(?P<energy>\S+)',
+    'energy': r'Etotal= +(?P<energy>\S+)',
+    'error': [r'^--- !ERROR'],
+  },
+  'bigdft': {
+    'file': None,
+    'scf': r'iter: *(?P<step>\d+).*EKS: *(?P<energy>[^,} ]+)',
+    'energy': r'Energy \(Hartree\) *: *(?P<energy>\S+)',
+    'error': [],
+  },
+}
+
+class OutputMonitor(object):
+  """
+  incremental parser of the output of a running QM job
+
+  New lines of the output file are parsed on each update() call,
+  i.e. at every poll of JobSupervisor. The job is aborted when an
+  error banner of the program, a NaN/overflow energy, or more than
+  max_scf SCF steps are found.
+
+  args:
+    program(str), key of monitor.patterns
+    progress(function), called as progress(task, info) when new
+                        SCF steps or energies are parsed
+    max_scf(int), abort when SCF step exceeds max_scf
+
+  attributes:
+    info(dict), parsed progress with keys
+      'scf_step': current SCF step
+      'n_scf': total number of parsed SCF steps
+      'energy': latest SCF or converged energy
+      'converged': latest converged energy
+      'file': path of the monitored file
+  """
+  def __init__(self, program, progress=None, max_scf=None):
+    program = program.lower()
+    if program not in patterns:
+      qtk.exit("no output patterns for program %s" % program)
+    self.program = program
+    self.progress = progress
+    self.max_scf = max_scf
+    pattern = patterns[program]
+    self.file = pattern['file']
+    self.scf = re.compile(pattern['scf'])
+    self.energy = re.compile(pattern['energy'])
+    self.error = [re.compile(e) for e in pattern['error']]
+    self.info = {
+      'scf_step': 0,
+      'n_scf': 0,
+      'energy': np.nan,
+      'converged': np.nan,
+      'file': None,
+    }
+    self.offset = 0
+    self.buf = ''
+    self.n_energy = 0
+
+  def __repr__(self):
+    return "OutputMonitor(%s, %s)" % (self.program, self.info['file'])
+
+  def path(self, task):
+    """file to monitor for current command of SupervisedTask"""
+    output = os.path.join(task.cwd, task.command.output)
+    if self.file is None:
+      return output
+    elif self.file.startswith('.'):
+      return os.path.splitext(output)[0] + self.file
+    else:
+      return os.path.join(task.cwd, self.file)
+
+  def update(self, task):
+    """parse new output, return error message or None"""
+    path = self.path(task)
+    if path != self.info['file']:
+      self.info['file'] = path
+      self.offset = 0
+      self.buf = ''
+    if not os.path.exists(path):
+      return
+    # output file rewritten from scratch
+    if os.path.getsize(path) < self.offset:
+      self.offset = 0
+      self.buf = ''
+    with open(path, 'r') as out:
+      out.seek(self.offset)
+      data = out.read()
+      self.offset = out.tell()
+    if not data:
+      return
+    lines = (self.buf + data).split('\n')
+    self.buf = lines.pop()
+    n_parsed = self.info['n_scf'] + self.n_energy
+    error = None
+    for line in lines:
+      error = self.parse(line)
+      if error:
+        break
+    if self.progress is not None \
+    and n_parsed != self.info['n_scf'] + self.n_energy:
+      try:
+        self.progress(task, dict(self.info))
+      except Exception as err:
+        qtk.warning("progress callback failed: %s" % err)
+    return error
+
+  def parse(self, line):
+    """parse one line, return error message or None"""
+    for error in self.error:
+      if error.search(line):
+        return "%s error: %s" % (self.program, line.strip())
+    scf = self.scf.search(line)
+    if scf:
+      groups = scf.groupdict()
+      self.info['n_scf'] += 1
+      if 'step' in groups and groups['step']:
+        self.info['scf_step'] = int(groups['step'])
+      else:
+        self.info['scf_step'] += 1
+      if 'energy' in groups and groups['energy']:
+        self.info['energy'] = _float(groups['energy'])
+        if not np.isfinite(self.info['energy']):
+          return "invalid SCF energy: %s" % line.strip()
+      if self.max_scf and self.info['scf_step'] > self.max_scf:
+        return "SCF not converged in %d steps" % self.max_scf
+      return
+    energy = self.energy.search(line)
+    if energy:
+      self.n_energy += 1
+      self.info['converged'] = _float(energy.group('energy'))
+      self.info['energy'] = self.info['converged']
+      if not np.isfinite(self.info['converged']):
+        return "invalid energy: %s" % line.strip()
+
+def _float(string):
+  """fortran float string, overflow and NaN return nan"""
+  try:
+    return float(string.replace('D', 'E').rstrip(','))
+  except ValueError:
+    return np.nan
+
+def getMonitor(program, **kwargs):
+  """
+  return OutputMonitor for QMRun kwargs,
+  None if monitoring is not requested
+  """
+  if 'monitor' in kwargs:
+    monitor = kwargs['monitor']
+  else:
+    monitor = setting.qm_monitor
+  if isinstance(monitor, OutputMonitor):
+    return monitor
+  progress = None
+  if 'progress' in kwargs:
+    progress = kwargs['progress']
+  max_scf = None
+  if 'max_scf' in kwargs:
+    max_scf = kwargs['max_scf']
+  if monitor or progress or max_scf:
+    if program.lower() in patterns:
+      return OutputMonitor(program, progress, max_scf)
+    else:
+      qtk.warning("output monitor not available for %s" % program)
@@ -0,0 +1,209 @@
+import qctoolkit as qtk
+import qctoolkit.setting as setting
+import numpy as np
+import hashlib
+import pickle
+import json
+import glob
+import os
+
+# settings not affecting the result of a QM job
+ignored_setting = [
+  'threads', 'omp', 'memory', 'bigmem', 'exe', 'scr', 'env',
+  'root_dir', 'prefix', 'suffix', 'extension', 'info', 'output',
+  'overwrite', 'rename_if_exist', 'new_name', 'no_subfolder',
+  'setting_backup', 'molecule_backup', 'link_dep', 'finalized',
+  'debug', 'no_reset', 'no_update', 'chdir', 'run_dir', 'cache',
+  'timeout', 'monitor', 'progress', 'max_scf',
+]
+
+def _normalize(obj, decimals):
+  """convert obj to json serializable data with rounded floats"""
+  if isinstance(obj, np.ndarray):
+    obj = obj.tolist()
+  if isinstance(obj, dict):
+    return dict((str(k), _normalize(v, decimals))
+                for k, v in obj.iteritems())
+  elif isinstance(obj, (list, tuple)):
+    return [_normalize(o, decimals) for o in obj]
+  elif isinstance(obj, (bool, np.bool_)) or obj is None:
+    return obj
+  elif isinstance(obj, (int, long, np.integer)):
+    return int(obj)
+  elif isinstance(obj, (float, np.floating)):
+    # avoid -0.0 after rounding
+    return round(float(obj), decimals) + 0.
+  else:
+    return str(obj)
+
+class QMCache(object):
+  """
+  content-addressed on-disk cache of QM job results
+
+  Each QMInp is hashed from its program, molecule (Z, R, charge,
+  multiplicity, cell, atom strings) and all settings which affect
+  the result. Coordinates are rounded to 'decimals' digits.
+  Results are pickled QMOutput objects named by the hash.
+  Least recently used entries are evicted when the total size
+  exceeds max_size GB.
+
+  args:
+    path(str), cache directory, default setting.qm_cache_dir
+    max_size(float), size limit in GB, default setting.qm_cache_size
+    decimals(int), rounding digits for coordinates in angstrom
+
+  attributes:
+    hits(int), number of cache hits of this object
+    misses(int), number of cache misses of this object
+
+  Example:
+    cache = qtk.QMCache()
+    inp = qtk.QMInp(mol, program='gaussian')
+    out = inp.run(cache=cache) # run job, store output
+    out = inp.run(cache=cache) # load stored output
+    out = inp.run(cache=True) # default cache at setting.qm_cache_dir
+    print cache.stats()
+  """
+  def __init__(self, path=None, max_size=None, decimals=5):
+    if path is None:
+      path = setting.qm_cache_dir
+    if max_size is None:
+      max_size = setting.qm_cache_size
+    self.path = os.path.abspath(os.path.expanduser(path))
+    self.max_size = max_size
+    self.decimals = decimals
+    self.hits = 0
+    self.misses = 0
+    if not os.path.exists(self.path):
+      try:
+        os.makedirs(self.path)
+      except OSError:
+        # created by another process
+        pass
+
+  def __repr__(self):
+    return "QMCache(%s, hits=%d, misses=%d)" % \
+      (self.path, self.hits, self.misses)
+
+  def key(self, qminp):
+    """return hash string of QMInp object"""
+    mol = qminp.molecule
+    data = {
+      'Z': _normalize(mol.Z, 6),
+      'R': _normalize(mol.R, self.decimals),
+      'charge': _normalize(mol.charge, 6),
+      'multiplicity': _normalize(mol.multiplicity, 6),
+      'celldm': _normalize(mol.celldm, 6),
+      'string': _normalize(mol.string, 6),
+    }
+    inp_setting = dict((k, v) for k, v in qminp.setting.iteritems()
+                       if k not in ignored_setting)
+    data['setting'] = _normalize(inp_setting, 8)
+    data_str = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(data_str).hexdigest()
+
+  def _file(self, key):
+    return os.path.join(self.path, key + '.pkl')
+
+  def _entry(self, qminp):
+    if type(qminp) is str:
+      return self._file(qminp)
+    else:
+      return self._file(self.key(qminp))
+
+  def get(self, qminp):
+    """return stored QMOutput of qminp (QMInp or key) or None"""
+    entry = self._entry(qminp)
+    if os.path.exists(entry):
+      try:
+        with open(entry, 'rb') as pfile:
+          out = pickle.load(pfile)
+        # access time for LRU eviction
+        os.utime(entry, None)
+        self.hits += 1
+        return out
+      except Exception as err:
+        qtk.warning("corrupted cache entry %s: %s" % (entry, err))
+    self.misses += 1
+    return None
+
+  def put(self, qminp, qmout):
+    """store qmout for qminp, failed jobs (Et is nan) are skipped"""
+    Et = getattr(qmout, 'Et', np.nan)
+    try:
+      if Et is None or np.isnan(Et):
+        return False
+    except TypeError:
+      return False
+    entry = self._entry(qminp)
+    tmp = entry + '.%d.tmp' % os.getpid()
+    try:
+      with open(tmp, 'wb') as pfile:
+        pickle.dump(qmout, pfile, pickle.HIGHEST_PROTOCOL)
+      # atomic for concurrent writers
+      os.rename(tmp, entry)
+    except Exception as err:
+      qtk.warning("can not cache output %s: %s" % (str(qmout), err))
+      if os.path.exists(tmp):
+        os.remove(tmp)
+      return False
+    self.evict()
+    return True
+
+  def entries(self):
+    """list of (mtime, size, file) sorted by last access"""
+    out = []
+    for entry in glob.glob(os.path.join(self.path, '*.pkl')):
+      try:
+        st = os.stat(entry)
+        out.append((st.st_mtime, st.st_size, entry))
+      except OSError:
+        pass
+    return sorted(out)
+
+  def evict(self):
+    """remove least recently used entries beyond max_size"""
+    entries = self.entries()
+    size = sum([e[1] for e in entries])
+    limit = self.max_size * 1E9
+    itr = 0
+    while size > limit and itr < len(entries):
+      _, entry_size, entry = entries[itr]
+      try:
+        os.remove(entry)
+        size -= entry_size
+      except OSError:
+        pass
+      itr += 1
+
+  def clear(self):
+    for _, _, entry in self.entries():
+      os.remove(entry)
+
+  def stats(self):
+    entries = self.entries()
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'entries': len(entries),
+      'size': sum([e[1] for e in entries]) / 1E9,
+    }
+
+_default_cache = None
+
+def getCache(cache=True):
+  """
+  return QMCache object for cache setting/kwarg,
+  None if caching is disabled
+  """
+  global _default_cache
+  if isinstance(cache, QMCache):
+    return cache
+  elif cache is True:
+    if _default_cache is None:
+      _default_cache = QMCache()
+    return _default_cache
+  elif type(cache) is str:
+    return QMCache(cache)
+  else:
+    return None
@@ -85,6 +85,7 @@ class inp(GaussianBasisInput):
     else:
       new_Z = []
     z_itr = 0
+    molecule.string = list(molecule.string)
     for i in range(molecule.N):
       n_charge = ''
       e_str = molecule.type_list[i]
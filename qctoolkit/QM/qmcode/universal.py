@@ -1,5 +1,7 @@
 import qctoolkit as qtk
 import os, re, glob
+from qctoolkit.QM.qmcache import getCache
+from qctoolkit.QM.supervisor import SupervisedTask
 
 def runCode(self, parrent, name, **kwargs):
   worker, name = \
@@ -8,6 +10,11 @@ def runCode(self, parrent, name, **kwargs):
   if 'no_subfolder' not in kwargs or not kwargs['no_subfolder']:
     self.setting['root_dir'] = name
 
+  if 'cache' in kwargs:
+    cache = getCache(kwargs['cache'])
+  else:
+    cache = getCache(qtk.setting.qm_cache)
+
   def run():
     if 'charge' in kwargs:
       self.setChargeMultiplicity(kwargs['charge'], 1)
@@ -15,7 +22,22 @@ def runCode(self, parrent, name, **kwargs):
     new_name = None
     if 'new_name' in kwargs:
       new_name = kwargs['new_name']
-    return worker.start(inp, new_name)
+    out = worker.start(inp, new_name)
+    if cache is not None:
+      if isinstance(out, SupervisedTask):
+        out.onDone(lambda task: cache.put(key, task.out))
+      else:
+        cache.put(key, out)
+    return out
+
+  if cache is not None:
+    if 'charge' in kwargs:
+      self.setChargeMultiplicity(kwargs['charge'], 1)
+    key = cache.key(self)
+    out = cache.get(key)
+    if out is not None:
+      qtk.report("QMInp.run", "%s loaded from cache" % name)
+      return out
 
   if not os.path.exists(name):
     return run()
@@ -7,6 +7,8 @@ import subprocess as sp
 import qctoolkit.utilities as ut
 import numpy as np
 import qctoolkit.setting as setting
+from supervisor import QMCommand, runSteps
+from monitor import getMonitor
 
 # python interface to run QM code
 # all code dependent part should be wrapped here
@@ -26,10 +28,35 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     threads=n(int): number of threads per job
     bigmem=Boolean: big memory request, implemented for CPMD and others
 
+    timeout=x(float): wall-clock limit in seconds, job is killed
+                      and RuntimeError is raised when exceeded
+    monitor=Boolean: parse running output, the job is killed and
+                     RuntimeError is raised on error banners, NaN
+                     energies or too many SCF steps, default
+                     setting.qm_monitor, see OutputMonitor
+    progress=f(function): called as f(task, info) with parsed
+                          SCF step and energy, implies monitor
+    max_scf=n(int): abort if SCF step exceeds n, implies monitor
+
     CPMD:
       save_restart=Boolean
       scr=/path/to/scratch
   """
+  qtk.check_setup()
+  if 'timeout' in kwargs:
+    timeout = kwargs['timeout']
+  else:
+    timeout = None
+  monitor = getMonitor(program, **kwargs)
+  return runSteps(QMSteps(inp, program, **kwargs), inp, timeout,
+                  monitor)
+
+def QMSteps(inp, program=setting.qmcode, **kwargs):
+  """
+  generator version of QMRun, yields a QMCommand for each external
+  program run in cwd and finally the QMOutput object.
+  It allows JobSupervisor to run many QM jobs from one process
+  """
 
   if 'threads' in kwargs:
     _threads = kwargs['threads']
@@ -66,12 +93,15 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
   ###########################################
   def compute(exestr, outpath, threads_per_job, **kwargs):
     """
-    initiate a single MPI job, wait for it, and write to output
+    construct a single MPI job to be yielded, stdout to outpath
     """
 
-    os.environ["OMP_NUM_THREADS"] = str(omp)
+    if 'env' in kwargs:
+      env = kwargs['env']
+    else:
+      env = os.environ.copy()
+    env["OMP_NUM_THREADS"] = str(omp)
 
-    outfile = open(outpath, "w")
     if threads_per_job > 1:
       mpi_cmd = "%s %d"% (setting.mpistr, threads_per_job)
       for mpi_flag in setting.mpi_flags:
@@ -84,14 +114,8 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     else:
       cmd = exestr
     ut.progress('QMInp.run', 'running job with command: %s\n' % cmd)
-    if 'env' in kwargs:
-      run = sp.Popen(cmd, shell=True, stdout=outfile, env=kwargs['env'])
-    else:
-      run = sp.Popen(cmd, shell=True, stdout=outfile)
-    # wait each mpijob to finish before lauching another
-    # otherwise all mpijobs will be launched simutaniously
-    run.wait()
-    outfile.close()
+    # each mpijob is finished before the generator is resumed
+    return QMCommand(cmd, outpath, env)
   ########## END OF SYSTEM CALL ##########
 
   #################################
@@ -131,7 +155,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     for job in inp_list:
       out = os.path.splitext(job)[0] + '.out'
       exestr = "%s %s" % (exe, job)
-      compute(exestr, out, _threads)
+      yield compute(exestr, out, _threads)
       if(len(inp_list) > 1):
         rst_list = sorted(glob.glob('RESTART.*'))
         if rst_list:
@@ -192,7 +216,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
       exestr = setting.vasp_exe
     qmoutput = inp + '.out'
     qmlog = inp + '.log'
-    compute(exestr, qmoutput, _threads)
+    yield compute(exestr, qmoutput, _threads)
     qio_out = qio.QMOut('vasprun.xml', program='vasp')
 
     if not _save_restart:
@@ -218,7 +242,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
       exe = setting.nwchem_exe
     exestr = "%s %s" % (exe, inp)
     qmoutput = os.path.splitext(inp)[0] + '.out'
-    compute(exestr, qmoutput, _threads)
+    yield compute(exestr, qmoutput, _threads)
     qio_out = qio.QMOut(qmoutput, program='nwchem')
 
     files = sorted(glob.glob('*.*'))
@@ -258,7 +282,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     exestr = "%s %s" % (exe, inp)
     qmoutput = inp + '.out'
     qmlog = 'log-%s.yaml' % inp
-    compute(exestr, qmoutput, _threads, env=env)
+    yield compute(exestr, qmoutput, _threads, env=env)
     qio_out = qio.QMOut(qmlog, program='bigdft')
 
   #########################
@@ -273,7 +297,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     exestr = "%s < %s" % (exe, inp + '.files')
     qmlog = inp + '.log'
     qmoutput = inp + '.out'
-    compute(exestr, qmlog, _threads)
+    yield compute(exestr, qmlog, _threads)
 
     # unfold bandstructure
     if 'unfold' in kwargs and kwargs['unfold']:
@@ -365,7 +389,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     exestr = "%s %s" % (exe, inp)
     qmoutput = os.path.splitext(inp)[0] + '.out'
     qmlog = os.path.splitext(inp)[0] + '.log'
-    compute(exestr, qmoutput, _threads)
+    yield compute(exestr, qmoutput, _threads)
     os.rename(qmlog, qmoutput)
 
     chks = sorted(glob.glob('*.chk'))
@@ -394,7 +418,7 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     for job in inp_list:
       out = os.path.splitext(job)[0] + '.out'
       exestr = "%s < %s" % (exe, job)
-      compute(exestr, out, _threads)
+      yield compute(exestr, out, _threads)
     qio_out = qio.QMOut(out, program='espresso')
     if not _save_restart:
       rst_list = sorted(glob.glob("*.wfc*"))
@@ -418,4 +442,4 @@ def QMRun(inp, program=setting.qmcode, **kwargs):
     os.chdir(cwd)
 
   qio_out.path = inp
-  return qio_out
+  yield qio_out
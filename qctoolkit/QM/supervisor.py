@@ -0,0 +1,418 @@
+import qctoolkit as qtk
+import qctoolkit.setting as setting
+import subprocess as sp
+import select
+import signal
+import time
+import sys
+import os
+
+# supervisors entered by 'with' statement, see JobSupervisor
+_active = []
+
+def current():
+  """return innermost active JobSupervisor or None"""
+  if _active:
+    return _active[-1]
+
+class QMCommand(object):
+  """
+  external command yielded by a job generator, e.g. QMSteps
+
+  args:
+    cmd(str), shell command
+    output(str), file for stdout, relative to job directory
+    env(dict), environment of the command
+  """
+  def __init__(self, cmd, output, env=None):
+    self.cmd = cmd
+    self.output = output
+    self.env = env
+
+  def __repr__(self):
+    return "QMCommand(%s > %s)" % (self.cmd, self.output)
+
+class SupervisedTask(object):
+  """
+  handle of a job run by JobSupervisor
+
+  attributes:
+    name(str), job name
+    state(str), 'pending', 'waiting' (for cores), 'running',
+                'done', 'failed', 'timeout', 'aborted' (by monitor)
+                or 'killed'
+    out, final value yielded by the job, QMOutput for QM jobs
+    error(str), error message of failed or aborted job
+    monitor(OutputMonitor), parser of running output
+    returncode(int), exit code of the last command
+    start(float), end(float), wall-clock time stamps
+
+  methods:
+    onDone(f), call f(task) when the task is finished
+  """
+  final_states = ['done', 'failed', 'timeout', 'aborted', 'killed']
+
+  def __init__(self, steps, cwd, name, cores, timeout, callback,
+               monitor=None):
+    self.steps = steps
+    self.cwd = cwd
+    self.name = name
+    self.cores = cores
+    self.timeout = timeout
+    self.callback = callback
+    self.monitor = monitor
+    self.state = 'pending'
+    self.out = None
+    self.error = None
+    self.exc_info = None
+    self.returncode = None
+    self.start = None
+    self.end = None
+    self.command = None
+    self.proc = None
+    self.fd = None
+    self.outfile = None
+    self.kill_time = None
+    self._hooks = []
+
+  def __repr__(self):
+    return "SupervisedTask(%s, %s)" % (self.name, self.state)
+
+  @property
+  def finished(self):
+    return self.state in self.final_states
+
+  def onDone(self, f):
+    if self.finished:
+      f(self)
+    else:
+      self._hooks.append(f)
+
+class JobSupervisor(object):
+  """
+  run many external programs from a single python process
+
+  Jobs are generators yielding QMCommand objects, each command is
+  launched in the job directory once enough cores are free. The
+  generator is resumed with the return code of the command when it
+  finishes, and the last non-QMCommand value it yields is stored
+  as the job output. Stdout of the commands are streamed to their
+  output files through one select loop. The process cwd is switched
+  to the job directory whenever a generator is resumed, which is
+  safe since everything runs in one thread.
+
+  Within a 'with' block, QMInp.run submits QM jobs to the
+  supervisor and returns SupervisedTask objects instead of
+  QMOutput. The block waits for all jobs on exit.
+
+  args:
+    cores(int), total cores for running commands, default cpu_count
+    timeout(float), default wall-clock limit of each job in seconds
+    callback(function), called as callback(task, event) with event
+                        'started', 'finished' (of each command) and
+                        the final states of the task
+    poll(float), maximum seconds between timeout checks
+    grace(float), seconds between SIGTERM and SIGKILL
+
+  Example:
+    with qtk.JobSupervisor(cores=32) as sup:
+      tasks = [inp.run() for inp in inp_list]
+    out = [t.out for t in tasks]
+
+    sup = qtk.JobSupervisor()
+    sup.command('sleep 10; echo done', 'sleep.out', timeout=5)
+    for task, event in sup.events():
+      print task, event
+  """
+  def __init__(self, cores=None, timeout=None, callback=None,
+               poll=0.5, grace=5.0):
+    if cores is None:
+      cores = setting.cpu_count
+    self.cores = cores
+    self.timeout = timeout
+    self.callback = callback
+    self.poll = poll
+    self.grace = grace
+    self.tasks = []
+    self._ready = []
+    self._waiting = []
+    self._running = []
+    self._fds = {}
+    self._events = []
+
+  def __repr__(self):
+    return "JobSupervisor(cores=%d, tasks=%d)" % \
+      (self.cores, len(self.tasks))
+
+  def __enter__(self):
+    _active.append(self)
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    _active.remove(self)
+    if exc_type is None:
+      self.wait()
+    else:
+      self.terminate()
+
+  def __getstate__(self):
+    qtk.exit("JobSupervisor can not be sent to other processes")
+
+  def submit(self, steps, cwd=None, name=None, cores=1,
+             timeout=None, callback=None, monitor=None):
+    """
+    add job generator steps, started in cwd (default current dir)
+    the output of running commands is checked by monitor,
+    see OutputMonitor. return SupervisedTask
+    """
+    if cwd is None:
+      cwd = os.getcwd()
+    if name is None:
+      name = 'job%d' % len(self.tasks)
+    if timeout is None:
+      timeout = self.timeout
+    task = SupervisedTask(steps, os.path.abspath(cwd), name,
+                          max(int(cores), 1), timeout, callback,
+                          monitor)
+    self.tasks.append(task)
+    self._ready.append((task, None))
+    return task
+
+  def command(self, cmd, output, cwd=None, env=None, **kwargs):
+    """submit single shell command, output is its return code"""
+    return self.submit(_commandSteps(cmd, output, env), cwd, **kwargs)
+
+  def events(self):
+    """run all jobs, yield (task, event) as they happen"""
+    try:
+      while self._ready or self._waiting or self._running:
+        while self._ready:
+          task, value = self._ready.pop(0)
+          self._resume(task, value)
+        self._launch()
+        for event in self._flush():
+          yield event
+        if self._running:
+          self._read(self.poll)
+          self._check()
+        for event in self._flush():
+          yield event
+    except BaseException:
+      self.terminate()
+      raise
+
+  def wait(self):
+    """run all jobs, return list of outputs"""
+    for _ in self.events():
+      pass
+    return [task.out for task in self.tasks]
+
+  def kill(self, task, state='killed'):
+    """terminate running command of task"""
+    if task.proc is not None and task.kill_time is None:
+      task.state = state
+      task.kill_time = time.time()
+      self._signal(task, signal.SIGTERM)
+    elif not task.finished:
+      if task in self._waiting:
+        self._waiting.remove(task)
+      self._ready = [r for r in self._ready if r[0] is not task]
+      task.steps.close()
+      self._finish(task, state)
+
+  def terminate(self):
+    """kill all running commands"""
+    for task in list(self._running):
+      self._signal(task, signal.SIGKILL)
+      task.proc.wait()
+      self._close(task)
+      task.state = 'killed'
+    self._running = []
+    self._waiting = []
+    self._ready = []
+
+  def _emit(self, task, event):
+    self._events.append((task, event))
+    for callback in [self.callback, task.callback]:
+      if callback is not None:
+        try:
+          callback(task, event)
+        except Exception as err:
+          qtk.warning("callback of %s failed: %s" % (task.name, err))
+
+  def _flush(self):
+    events, self._events = self._events, []
+    return events
+
+  def _resume(self, task, value):
+    if task.finished:
+      return
+    cwd = os.getcwd()
+    try:
+      os.chdir(task.cwd)
+      try:
+        item = task.steps.send(value)
+      finally:
+        # job might change directory
+        task.cwd = os.getcwd()
+        os.chdir(cwd)
+    except StopIteration:
+      self._finish(task, 'done')
+    except Exception as err:
+      task.error = str(err)
+      task.exc_info = sys.exc_info()
+      self._finish(task, 'failed')
+    else:
+      if isinstance(item, QMCommand):
+        task.command = item
+        task.state = 'waiting'
+        self._waiting.append(task)
+      else:
+        task.out = item
+        task.steps.close()
+        self._finish(task, 'done')
+
+  def _finish(self, task, state):
+    task.state = state
+    task.end = time.time()
+    task.steps = None
+    self._emit(task, state)
+    hooks, task._hooks = task._hooks, []
+    for hook in hooks:
+      hook(task)
+
+  def _free(self):
+    return self.cores - sum([t.cores for t in self._running])
+
+  def _launch(self):
+    for task in list(self._waiting):
+      if task.cores <= self._free() or not self._running:
+        self._waiting.remove(task)
+        self._start(task)
+
+  def _start(self, task):
+    cmd = task.command
+    try:
+      task.outfile = open(os.path.join(task.cwd, cmd.output), 'w')
+      task.proc = sp.Popen(cmd.cmd, shell=True, stdout=sp.PIPE,
+                           cwd=task.cwd, env=cmd.env,
+                           close_fds=True, preexec_fn=os.setsid)
+    except Exception as err:
+      if task.outfile is not None:
+        task.outfile.close()
+        task.outfile = None
+      task.error = str(err)
+      task.exc_info = sys.exc_info()
+      self._finish(task, 'failed')
+      return
+    task.fd = task.proc.stdout.fileno()
+    self._fds[task.fd] = task
+    if task.start is None:
+      task.start = time.time()
+    task.state = 'running'
+    self._running.append(task)
+    self._emit(task, 'started')
+
+  def _read(self, timeout):
+    if not self._fds:
+      time.sleep(timeout)
+      return
+    readable = select.select(self._fds.keys(), [], [], timeout)[0]
+    for fd in readable:
+      task = self._fds[fd]
+      data = os.read(fd, 65536)
+      if data:
+        task.outfile.write(data)
+        task.outfile.flush()
+        self._output(task, data)
+      else:
+        del self._fds[fd]
+        task.fd = None
+
+  def _output(self, task, data):
+    """stdout chunk of running command of task"""
+    pass
+
+  def _close(self, task):
+    if task.fd is not None:
+      del self._fds[task.fd]
+      task.fd = None
+    task.proc.stdout.close()
+    if task.outfile is not None:
+      task.outfile.close()
+      task.outfile = None
+
+  def _signal(self, task, sig):
+    try:
+      os.killpg(task.proc.pid, sig)
+    except OSError:
+      pass
+
+  def _check(self):
+    now = time.time()
+    for task in list(self._running):
+      returncode = task.proc.poll()
+      if returncode is None:
+        if task.kill_time is not None:
+          if now - task.kill_time > self.grace:
+            self._signal(task, signal.SIGKILL)
+        elif task.timeout and now - task.start > task.timeout:
+          qtk.warning("%s exceeds %s seconds, killed"\
+                      % (task.name, str(task.timeout)))
+          self.kill(task, 'timeout')
+        elif task.monitor is not None:
+          self._monitor(task)
+        continue
+      # drain remaining output
+      while task.fd is not None:
+        self._read(0)
+        if task.fd is not None and task.fd not in \
+        select.select([task.fd], [], [], 0)[0]:
+          break
+      self._close(task)
+      self._running.remove(task)
+      task.proc = None
+      task.returncode = returncode
+      self._emit(task, 'finished')
+      if task.kill_time is None and task.monitor is not None:
+        # output written since last poll
+        self._monitor(task)
+        if task.finished:
+          continue
+      if task.kill_time is not None:
+        task.steps.close()
+        self._finish(task, task.state)
+      else:
+        self._ready.append((task, returncode))
+
+  def _monitor(self, task):
+    try:
+      error = task.monitor.update(task)
+    except Exception as err:
+      qtk.warning("monitor of %s failed: %s" % (task.name, err))
+      task.monitor = None
+      return
+    if error:
+      qtk.warning("%s aborted: %s" % (task.name, error))
+      task.error = error
+      self.kill(task, 'aborted')
+
+def _commandSteps(cmd, output, env):
+  returncode = yield QMCommand(cmd, output, env)
+  yield returncode
+
+def runSteps(steps, name=None, timeout=None, monitor=None):
+  """
+  run job generator in current process and directory,
+  return its output
+  """
+  sup = JobSupervisor(timeout=timeout)
+  task = sup.submit(steps, name=name, monitor=monitor)
+  sup.wait()
+  if task.state == 'failed':
+    raise task.exc_info[0], task.exc_info[1], task.exc_info[2]
+  elif task.state == 'aborted':
+    qtk.exit("job %s aborted: %s" % (name, task.error))
+  elif task.state != 'done':
+    qtk.exit("job %s %s" % (name, task.state))
+  return task.out
@@ -1,68 +1,160 @@
+"""
+qctoolkit package namespace
+
+setting, utilities, Molecule and MoleculeBatch are imported
+eagerly. QM, analysis, alchemy and all other subpackages, with their
+heavy dependencies (pandas, matplotlib, sqlalchemy, yaml, ...), are
+imported on first attribute access, e.g. qtk.QMInp imports
+qctoolkit.QM.qmInterface.
+QM executables and pseudopotential paths are checked by
+check_setup().
+"""
+import sys
+import types
+import importlib
+
+# names resolved on first access: (module, attribute),
+# attribute None for the module itself
+_lazy_attrs = {
+  'QMInp': ('qctoolkit.QM.qmInterface', 'QMInp'),
+  'QMOut': ('qctoolkit.QM.qmInterface', 'QMOut'),
+  'QMRun': ('qctoolkit.QM.qmjob', 'QMRun'),
+  'QMSteps': ('qctoolkit.QM.qmjob', 'QMSteps'),
+  'QMResult': ('qctoolkit.QM.qmresult', 'QMResult'),
+  'QMInput': ('qctoolkit.QM.general_io', 'GenericQMInput'),
+  'QMOutput': ('qctoolkit.QM.general_io', 'GenericQMOutput'),
+  'QMCache': ('qctoolkit.QM.qmcache', 'QMCache'),
+  'JobSupervisor': ('qctoolkit.QM.supervisor', 'JobSupervisor'),
+  'xc_dict': ('qctoolkit.QM.ofdft.libxc_dict', 'xc_dict'),
+  'PP': ('qctoolkit.QM.pseudo.pseudo', 'PP'),
+  'Al1st': ('qctoolkit.alchemy.aljob', 'Al1st'),
+  'mutatePP': ('qctoolkit.alchemy.aljob', 'mutatePP'),
+  'AlPath': ('qctoolkit.alchemy.alpath', 'AlPath'),
+  'CUBE': ('qctoolkit.analysis', 'CUBE'),
+  'PCA': ('qctoolkit.analysis', 'PCA'),
+  'QMList': ('qctoolkit.analysis', 'QMList'),
+  'CCS': ('qctoolkit.ccs.ccs', 'CCS'),
+  'element': ('qctoolkit.data.elements.element_list', 'ELEMENTS'),
+  'Logger': ('qctoolkit.DB', 'Logger'),
+  'basis': ('qctoolkit.data.basis_set', None),
+  'data': ('qctoolkit.data', None),
+  'QM': ('qctoolkit.QM', None),
+  'MD': ('qctoolkit.MD', None),
+  'ML': ('qctoolkit.ML', None),
+  'DB': ('qctoolkit.DB', None),
+  'ccs': ('qctoolkit.ccs', None),
+  'alchemy': ('qctoolkit.alchemy', None),
+  'analysis': ('qctoolkit.analysis', None),
+  'optimization': ('qctoolkit.optimization', None),
+}
+
+# modules formerly star-imported into the namespace, searched for
+# names not in _lazy_attrs
+_lazy_star = [
+  'qctoolkit.QM.qmInterface',
+  'qctoolkit.QM.qmjob',
+  'qctoolkit.QM.qmresult',
+  'qctoolkit.alchemy.aljob',
+  'qctoolkit.alchemy.alpath',
+  'qctoolkit.QM.pseudo.pseudo',
+]
+
+class _LazyModule(types.ModuleType):
+  """package module resolving missing attributes lazily"""
+  def __getattr__(self, name):
+    # names defined so far by __init__, during eager imports
+    if name in _namespace:
+      return _namespace[name]
+    if name.startswith('__'):
+      raise AttributeError(name)
+    if name in _lazy_attrs:
+      module_name, attr = _lazy_attrs[name]
+      if module_name.startswith('qctoolkit.QM.'):
+        # circular imports of QM modules resolve only when
+        # entered through qmInterface
+        importlib.import_module('qctoolkit.QM.qmInterface')
+      value = importlib.import_module(module_name)
+      if attr is not None:
+        value = getattr(value, attr)
+    elif name == 'missing_files':
+      value = check_setup(warn=False)
+    else:
+      modules = [importlib.import_module(m) for m in _lazy_star]
+      for module in reversed(modules):
+        if hasattr(module, name) and not name.startswith('_'):
+          value = getattr(module, name)
+          break
+      else:
+        raise AttributeError("module 'qctoolkit' has no attribute '%s'"\
+                             % name)
+    setattr(self, name, value)
+    return value
+
+_namespace = globals()
+_module = _LazyModule(__name__, __doc__)
+for _key in ['__file__', '__path__', '__package__']:
+  if _key in _namespace:
+    setattr(_module, _key, _namespace[_key])
+# python 2 clears the dict of a collected module
+_module._init_module = sys.modules[__name__]
+sys.modules[__name__] = _module
+
 from molecule import *
-from QM.qmInterface import *
-from QM.qmjob import *
-from QM.qmresult import *
-from QM.ofdft.libxc_dict import xc_dict
-from alchemy.aljob import *
-from alchemy.alpath import *
-from analysis import CUBE
-from analysis import PCA
-from analysis import QMList
-from QM.pseudo.pseudo import *
+from molecule_batch import MoleculeBatch
 from utilities import *
 from setting import *
-from ccs.ccs import CCS
-from QM.general_io import GenericQMInput as QMInput
-from QM.general_io import GenericQMOutput as QMOutput
-from data.elements.element_list import ELEMENTS as element
-from DB import Logger
-import data.basis_set as basis
-import MD
-import ML
-import ccs
-import QM
-import optimization
-import alchemy
 import setting
-import DB
 
 import os
+import re
 import copy_reg
 import copy
 import types
 import pickle
 
-# check for qtk setting
-missing_files = []
-paths = os.environ["PATH"].split(":")
-code_pattern = re.compile('cpmd|bigdft|vasp|nwchem|espresso')
-exe_pattern = re.compile('.*exe')
-url_pattern = re.compile('.*url')
-for dep in dir(setting):
-  if code_pattern.match(dep) and not url_pattern.match(dep):
-    not_found = True
-    file_str = getattr(setting, dep)
-    if exe_pattern.match(dep):
-       itr = 0
-       while not_found and itr < len(paths):
-         path = paths[itr]
-         test_path = os.path.join(path, file_str)
-         itr = itr +1
-         if os.access(test_path, os.X_OK):
-           not_found = False
-    else:
-      if os.access(file_str, os.F_OK):
-        not_found = False
-    if not_found:
-      missing_files.append(file_str)
+_missing_files = None
+_setup_warned = False
 
-if missing_files:
-  for missing_file in missing_files:
-    qtk.warning("missing file: %s" % missing_file)
-  qtk.warning(
-               'please modify /path/to/qctoolkit/setting.py ' +\
-               'and recompile.'
-             )
+def check_setup(warn=True):
+  """
+  check QM executables and pseudopotential paths of setting,
+  return list of missing files, result is cached
+  """
+  global _missing_files, _setup_warned
+  if _missing_files is None:
+    missing_files = []
+    paths = os.environ["PATH"].split(":")
+    code_pattern = re.compile('cpmd|bigdft|vasp|nwchem|espresso')
+    exe_pattern = re.compile('.*exe')
+    url_pattern = re.compile('.*url')
+    for dep in dir(setting):
+      if code_pattern.match(dep) and not url_pattern.match(dep):
+        not_found = True
+        file_str = getattr(setting, dep)
+        if exe_pattern.match(dep):
+           itr = 0
+           while not_found and itr < len(paths):
+             path = paths[itr]
+             test_path = os.path.join(path, file_str)
+             itr = itr +1
+             if os.access(test_path, os.X_OK):
+               not_found = False
+        else:
+          if os.access(file_str, os.F_OK):
+            not_found = False
+        if not_found:
+          missing_files.append(file_str)
+    _missing_files = missing_files
+
+  if _missing_files and warn and not _setup_warned:
+    _setup_warned = True
+    for missing_file in _missing_files:
+      warning("missing file: %s" % missing_file)
+    warning(
+             'please modify /path/to/qctoolkit/setting.py ' +\
+             'and recompile.'
+           )
+  return _missing_files
 
 # Steven Bethard's fix for instance method pickling
 def _pickle_method(method):
@@ -82,3 +174,8 @@ def _unpickle_method(func_name, obj, cls):
   return func.__get__(obj, cls)
 
 copy_reg.pickle(types.MethodType, _pickle_method, _unpickle_method)
+
+# eagerly imported names, avoid __getattr__ for frequent lookups
+for _key, _value in _namespace.items():
+  if not _key.startswith('_') and _key not in _module.__dict__:
+    setattr(_module, _key, _value)
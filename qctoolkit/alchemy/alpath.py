@@ -101,7 +101,7 @@ class AlPath(object):
     # dirty fix, grep '_[0-9]' pattern in QM.write function
     lambda_string = '_%03d' % (kwargs['l']*100)
     del kwargs['l']
-    mol = self.ref.molecule.copy()
+    mol = self.ref.molecule.copy(deep=False)
     mol.name = self.name + lambda_string
     N = mol.N
     string_dict = {}
@@ -642,18 +642,29 @@ class CUBE(object):
       )
       return out
 
+  def _copy(self):
+    """
+    copy for arithmetic results, data is shared until replaced and
+    molecule is copied copy-on-write
+    """
+    out = copy.copy(self)
+    out.molecule = self.molecule.copy(deep=False)
+    out.grid = self.grid.copy()
+    out.interp = None
+    return out
+
   def __add__(self, other):
     if isinstance(other, CUBE):
       _grid = self.grid[1:] - other.grid[1:]
       if(abs(sum(sum(_grid))) < 10**-7 ):
-        _out = copy.deepcopy(self)
+        _out = self._copy()
         _out.data = self.data + other.data
         return _out
       else:
         ut.exit("ERROR from qmout.py->CUBE: " +\
                  "grid mesh does not match")
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = _out.data + other
       return _out
 
@@ -664,14 +675,14 @@ class CUBE(object):
     if isinstance(other, CUBE):
       _grid = self.grid[1:] - other.grid[1:]
       if(abs(sum(sum(_grid))) < 10**-7 ):
-        _out = copy.deepcopy(self)
+        _out = self._copy()
         _out.data = self.data - other.data
         return _out
       else:
         ut.exit("ERROR from qmout.py->CUBE: " +\
                  "grid mesh does not match")
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = _out.data - other
       return _out
 
@@ -682,14 +693,14 @@ class CUBE(object):
     if isinstance(other, CUBE):
       _grid = self.grid[1:] - other.grid[1:]
       if(abs(sum(sum(_grid))) < 10**-7 ):
-        _out = copy.deepcopy(self)
+        _out = self._copy()
         _out.data = np.multiply(self.data, other.data)
         return _out
       else:
         ut.exit("ERROR from qmout.py->CUBE: " +\
                  "grid mesh does not match")
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = _out.data * other
       return _out
 
@@ -700,14 +711,14 @@ class CUBE(object):
     if isinstance(other, CUBE):
       _grid = self.grid[1:] - other.grid[1:]
       if(abs(sum(sum(_grid))) < 10**-7 ):
-        _out = copy.deepcopy(self)
+        _out = self._copy()
         _out.data = np.divide(self.data, other.data)
         return _out
       else:
         ut.exit("ERROR from qmout.py->CUBE: " +\
                  "grid mesh does not match")
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = _out.data / other
       return _out
 
@@ -715,7 +726,7 @@ class CUBE(object):
     if isinstance(other, CUBE):
       return self.__div__(other)
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = other / _out.data
       return _out
 
@@ -723,7 +734,7 @@ class CUBE(object):
     if isinstance(other, CUBE):
       ut.exit("power operation is not allowed between CUBE objects")
     else:
-      _out = copy.deepcopy(self)
+      _out = self._copy()
       _out.data = _out.data ** other
       return _out
 
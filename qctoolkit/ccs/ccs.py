@@ -241,7 +241,7 @@ class CCS(object):
   # !!TODO!!
   # interface between mutation and other operations is necessary!
   def generate(self, **kwargs):
-    self.new_structure = copy.deepcopy(self.structure)
+    self.new_structure = self.structure.copy(deep=False)
     if 'suffix' in kwargs:
       self.new_structure.name = self.new_structure.name + "_" + \
                                 kwargs['suffix']
@@ -260,8 +260,7 @@ class CCS(object):
         index = self.mutation_list[m][i]
         #target = self.mutation_target[m][mutation[m][i]]
         target = mutation[m][i]
-        self.new_structure.Z[index] = target
-        self.new_structure.type_list[index] = qtk.Z2n(target)
+        self.new_structure.setAtoms(index, Z=target)
   def _stretch(self, stretching):
     pass
   def _rotate(self, rotation):
@@ -3,7 +3,9 @@ import qctoolkit as qtk
 
 class Elements(object):
   path = re.sub('pyc', 'yml', os.path.realpath(__file__))
-  data = yaml.safe_load(open(path))
+  # libyaml loader is much faster if available
+  data = yaml.load(open(path), Loader=getattr(yaml, 'CSafeLoader',
+                                               yaml.SafeLoader))
   def __init__(self):
     pass
 
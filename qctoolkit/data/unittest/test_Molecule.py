@@ -19,6 +19,7 @@
 #
 #  return mols
 from setup_test import *
+import gzip
 
 def test_IO():
   # test for read and __add__ function
@@ -167,3 +168,257 @@ def test_crystal():
   mol = setup(mol='periodic_algaas.xyz')[0]
   assert mol.celldm
   assert mol.scale
+
+def test_periodic_bonds():
+  mol = qtk.Molecule(['H', 'H', 'O'], 
+                     [[0.37, 5, 5], [9.63, 5, 5], [5, 5, 5]])
+  mol.findBonds()
+  assert len(mol.bonds) == 0
+  assert len(mol.segments) == 3
+  mol.setCelldm([10, 10, 10, 0, 0, 0])
+  mol.findBonds()
+  assert sorted(mol.bond_index[0]) == [0, 1]
+  assert mol.bond_names[mol.bond_code[0]] == 'H-H'
+  assert abs(mol.bonds[0]['length'] - 0.74) < 1E-7
+  assert [s.N for s in mol.segments] == [2, 1]
+  assert np.allclose(mol.segments[0].R_scale, mol.R_scale[:2])
+  assert np.allclose(mol.segments[1].R_scale, mol.R_scale[2:])
+
+def test_molecule_batch():
+  mols = [m for m in setup() if not m.periodic and m.N > 1]
+  batch = qtk.MoleculeBatch(mols)
+  assert len(batch) == len(mols)
+  assert batch.stoichiometry() == [m.stoichiometry() for m in mols]
+  assert np.allclose(batch.nuclear_repulsion(), 
+                     [m.nuclear_repulsion() for m in mols])
+  assert np.allclose(batch.getCenterOfMass(),
+                     [m.getCenterOfMass() for m in mols])
+  mol = batch[-1]
+  assert mol.stoichiometry() == mols[-1].stoichiometry()
+  assert np.allclose(mol.R, mols[-1].R)
+  sub = batch[1:3]
+  sub.center()
+  assert np.allclose(batch.getCenterOfMass()[1:3], 0)
+  R, Z, mask = batch.padded()
+  assert np.allclose(qtk.MoleculeBatch(R=R, Z=Z, N=batch.N).R, batch.R)
+  batch.align()
+  for i, m in enumerate(mols):
+    m.align()
+    R = batch.molecule(i).R
+    # sign convention of second axis, see MoleculeBatch.align
+    assert np.allclose(R, m.R) or np.allclose(R, m.R * [1, -1, -1])
+  empty = qtk.MoleculeBatch([])
+  assert empty.getCenterOfMass().shape == (0, 3)
+  assert empty.getCenter().shape == (0, 3)
+
+def test_read_xyz_frames():
+  mols = setup(mol='h2o*.xyz')
+  name = 'qct_test_frames_%d.xyz.gz' % os.getpid()
+  try:
+    out = gzip.open(name, 'wb')
+    for mol in mols * 3:
+      out.write('%d\n\n' % mol.N)
+      for t, r in zip(mol.type_list, mol.R):
+        out.write('%s %f %f %f\n' % (t, r[0], r[1], r[2]))
+    out.close()
+    frames = list(qtk.readXYZ(name))
+    assert [m.N for m in frames] == [m.N for m in mols * 3]
+    assert np.allclose(frames[-1].R, mols[-1].R, atol=1E-5)
+    offsets = qtk.xyzOffsets(name)
+    assert len(offsets) == len(frames)
+    last = list(qtk.readXYZ(name, start=-1, offsets=offsets))
+    assert np.allclose(last[0].R, frames[-1].R)
+    batch = list(qtk.readXYZ(name, step=2, batch_size=100))[0]
+    assert list(batch.N) == [m.N for m in frames[::2]]
+    # mixed column counts, 8 tokens divisible by 2 atoms
+    out = gzip.open(name, 'wb')
+    out.write('2\n\nH 0 0 0\nH 0 0 0.74 1.0 2.0\n')
+    out.close()
+    mixed = list(qtk.readXYZ(name))[0]
+    assert mixed.type_list == ['H', 'H']
+    assert np.allclose(mixed.R, [[0, 0, 0], [0, 0, 0.74]])
+  finally:
+    os.remove(name)
+
+def test_frame_index():
+  mols = setup(mol='h2o*.xyz')
+  name = 'qct_test_index_%d.xyz' % os.getpid()
+  index_name = name + '.qtk_index.npz'
+  try:
+    out = open(name, 'w')
+    for k, mol in enumerate(mols * 3):
+      out.write('%d\n%d\n' % (mol.N, k))
+      for t, r in zip(mol.type_list, mol.R):
+        out.write('%s %f %f %f\n' % (t, r[0], r[1], r[2]))
+    out.close()
+    offsets = qtk.frameIndex(name)
+    assert os.path.exists(index_name)
+    assert np.array_equal(offsets, qtk.xyzOffsets(name))
+    mtime = os.path.getmtime(index_name)
+    assert np.array_equal(qtk.frameIndex(name), offsets)
+    assert os.path.getmtime(index_name) == mtime
+    mol = qtk.Molecule(name, frame=len(offsets) - 1)
+    assert mol.prop_list[0] == len(offsets) - 1
+    assert np.allclose(mol.R, mols[-1].R, atol=1E-5)
+
+    # appended frame invalidates index
+    out = open(name, 'a')
+    out.write('1\n%d\nH 0 0 0\n' % len(offsets))
+    out.close()
+    frames = list(qtk.readXYZ(name, frames=[len(offsets), 0]))
+    assert len(qtk.frameIndex(name)) == len(offsets) + 1
+    assert [m.N for m in frames] == [1, mols[0].N]
+  finally:
+    for f in [name, index_name]:
+      if os.path.exists(f):
+        os.remove(f)
+
+def test_pair_distance():
+  mol = setup(mol='h2o.xyz')[0]
+  E, dE = mol.nuclear_repulsion(gradient=True)
+  assert np.allclose(E, mol.nuclear_repulsion())
+  h = 1E-5
+  mol.R[0, 0] += h
+  Ep = mol.nuclear_repulsion()
+  assert np.allclose((Ep - E) / (h * 1.8897261245650618), dE[0, 0],
+                     rtol=1E-3)
+  # in-place change of R invalidates cached distances
+  D = mol.pairDistance()
+  mol.R[1] += [1, 0, 0]
+  assert np.allclose(mol.pairDistance()[0, 1], mol.distance(0, 1))
+  assert not np.allclose(mol.pairDistance()[0, 1], D[0, 1])
+
+  mol.periodic = True
+  mol.celldm = [2, 2, 2, 0, 0, 0]
+  d = mol.distance([0, 0], [1, 2], minimum_image=True)
+  assert np.all(d <= np.sqrt(3) + 1E-8)
+  assert np.allclose(mol.pairDistance(minimum_image=True)[0, 1:], d)
+
+def test_periodic_images():
+  mol = setup(mol='si.xyz')[0]
+  lattice = qtk.celldm2lattice(mol.celldm)
+  ext = mol.copy()
+  ext.extend([2, 3, 1], normalize=True)
+  assert ext.N == mol.N * 6
+  images, shifts = qtk.periodicImages(mol.R, lattice)
+  assert np.allclose(images[13], mol.R)
+  assert np.allclose(images[14], ext.R[mol.N:2*mol.N])
+  R, index, shift = qtk.periodicImages(mol.R, lattice, 3.0)
+  assert np.allclose(R, mol.R[index] + np.dot(shift, lattice))
+  d = np.linalg.norm(R[:, np.newaxis] - mol.R, axis=2).min(axis=1)
+  assert np.all(d <= 3.0)
+  assert len(R) < images.size / 3
+
+def test_radial_distribution():
+  mol = setup(mol='si.xyz')[0]
+  lattice = qtk.celldm2lattice(mol.celldm)
+  r, g = mol.gr(periodic=True, dr=0.1, r_max=6.0)
+  R, index, _ = qtk.periodicImages(mol.R, lattice, 6.0)
+  d = np.linalg.norm(R[:, np.newaxis] - mol.R, axis=2)
+  d = d[(d > 1E-5) & (d < 6.0)]
+  counts = np.histogram(d, bins=np.r_[0.1 * np.arange(60), 6.0])[0]
+  shell = 4 * np.pi * np.diff(np.r_[0.1 * np.arange(60), 6.0]**3) / 3
+  rho = mol.N / abs(np.linalg.det(lattice))
+  assert np.allclose(g * mol.N * rho * shell, counts)
+  # same histogram for sheared cell of same periodic structure
+  sheared = lattice + [[0, 0, 0], lattice[0], lattice[0] + lattice[1]]
+  _, g_sheared = qtk.radialDistribution(mol.R, sheared, dr=0.1,
+                                        r_max=6.0)
+  assert np.allclose(g_sheared, g)
+
+def test_shallow_copy():
+  mol = setup(mol='h2o.xyz')[0]
+  mol.findBonds()
+  R = np.array(mol.R)
+  new = mol.copy(deep=False)
+  assert len(new.segments) == 0
+  # reading either molecule does not duplicate shared data
+  assert np.shares_memory(new.R, mol.R)
+  # molecule writing first gets its own copy
+  mol.R[0] += 1
+  mol.R[1, 0] = 5
+  assert np.allclose(new.R, R)
+  assert np.allclose(mol.R[0], R[0] + 1) and mol.R[1, 0] == 5
+  assert not np.shares_memory(new.R, mol.R)
+  new2 = mol.copy(deep=False)
+  new2.R += 1
+  new2.setAtoms(0, Z=9)
+  assert np.allclose(new2.R - 1, mol.R)
+  assert mol.Z[0] != 9
+  new3 = mol.copy(deep=False)
+  mol.shift([0, 0, 1])
+  assert not np.allclose(new3.R[1], mol.R[1])
+  assert new3.type_list == mol.type_list
+  # deep copy of shallow copy owns writable arrays
+  new4 = copy.deepcopy(new3)
+  new4.R[0, 0] = 1
+  assert new4.R.flags.writeable and new3.R[0, 0] != 1
+
+def test_legacy_pickle():
+  mol = setup(mol='h2o.xyz')[0]
+  # instance dict of molecule pickled before bond arrays
+  state = {'N': mol.N, 'R': np.array(mol.R), 'Z': list(mol.Z),
+           'type_list': list(mol.type_list), 'string': list(mol.string),
+           'R_scale': np.atleast_2d(np.array([])), 'charge': 0,
+           'multiplicity': 1, 'index': 0, 'bond_types': {},
+           'bonds': {0: {'name': 'H-O'}}, 'segments': [],
+           'periodic': False, 'isolated': False, 'scale': False,
+           'celldm': False, 'symmetry': False, 'grid': False,
+           'name': 'h2o'}
+  old = qtk.Molecule.__new__(qtk.Molecule)
+  old.__setstate__(state)
+  assert old.bonds[0]['name'] == 'H-O'
+  assert old.haveBond('O', 'H')
+  assert len(old.bonds) == 2
+  assert np.allclose(old.copy(deep=False).R, mol.R)
+
+def test_element_arrays():
+  labels = ['C', 'H1', 'H_pp', 'O', 'Cl2', 'C']
+  Z = qtk.n2Z_array(labels)
+  assert list(Z) == [qtk.n2Z(l) for l in labels] == [6, 1, 1, 8, 17, 6]
+  assert list(qtk.Z2n_array(Z)) == ['C', 'H', 'H', 'O', 'Cl', 'C']
+  assert list(qtk.n2ve_array(labels)) == [qtk.n2ve(l) for l in labels]
+  assert np.allclose(qtk.n2m_array(labels), [qtk.n2m(l) for l in labels])
+
+def test_dataset():
+  mols = setup(mol='*.xyz')
+  name = 'qct_test_dataset_%d.qtk' % os.getpid()
+  n_atoms = sum([m.N for m in mols])
+  mols[0].name = u'H\xe9lium'
+  try:
+    qtk.saveDataset(name, mols,
+                    properties={'energy': np.arange(len(mols))},
+                    atom_properties={'forces': np.ones([n_atoms, 3])})
+    data = qtk.loadDataset(name)
+    assert len(data) == len(mols)
+    for i in [0, len(mols) - 1]:
+      assert np.allclose(data[i].R, mols[i].R)
+      assert list(data[i].Z) == list(mols[i].Z)
+      assert data[i].name == mols[i].name
+    assert data.properties['energy'][-1] == len(mols) - 1
+    assert data[1:3].atom_properties['forces'].shape == \
+           (mols[1].N + mols[2].N, 3)
+    batches = [data[:1], qtk.MoleculeBatch(mols[1:2])]
+    try:
+      qtk.saveDataset(name, batches)
+      assert False
+    except RuntimeError:
+      pass
+  finally:
+    os.remove(name)
+
+def test_rmsd():
+  mol = setup(mol='h2o.xyz')[0]
+  q, _ = np.linalg.qr(np.random.RandomState(0).randn(3, 3))
+  structures = [mol.R, mol.R.dot(q) + 1, mol.R * [1.1, 1, 1]]
+  rmsd = qtk.alignRMSD(mol, structures)
+  assert np.allclose(rmsd[:2], 0)
+  assert rmsd[2] > 0
+  D = qtk.rmsdMatrix(structures, block_size=2)
+  assert np.allclose(D, D.T)
+  assert np.allclose(D[0], rmsd)
+  assert np.allclose(qtk.rmsdMatrix(structures, threads=2), D)
+  new = mol.copy()
+  new.R = structures[1]
+  assert np.allclose(new.alignSVD(mol), 0)
+  assert np.allclose(new.R, mol.R)
@@ -58,6 +58,91 @@ def test_general_inp_render_file():
   testRun(g_list, g_theory)
   testRun(wl_list, wl_theory)
 
+def test_inp_molecule():
+  mol = setup(mol='h2o.xyz')[0]
+  inp = qtk.QMInp(mol, program='nwchem')
+  R = np.array(mol.R)
+  mol.R[0] += 1
+  assert np.allclose(inp.molecule.R, R)
+  inp.molecule.R[0, 0] = 5
+  assert inp.molecule.R[0, 0] == 5 and mol.R[0, 0] != 5
+  new = copy.deepcopy(inp.molecule.copy(deep=False))
+  new.R[0, 0] = 1
+  assert inp.molecule.R[0, 0] == 5
+
+def gaussian_basis():
+  """s, p and d cartesian gaussians on two centers in bohr"""
+  shells = [
+    ([0., 0., 0.], [('s', [3.4, 0.6]), ('s', [0.2]), ('p', [0.9])]),
+    ([0.3, 0.2, 1.4], [('s', [5.1, 1.2, 0.3]), ('p', [1.3, 0.4]),
+                       ('d', [0.8])]),
+  ]
+  cartesian = {'s': ['s'], 'p': ['px', 'py', 'pz'],
+               'd': ['dxx', 'dxy', 'dxz', 'dyy', 'dyz', 'dzz']}
+  basis = []
+  for center, atom_shells in shells:
+    for l, exponents in atom_shells:
+      for ao_type in cartesian[l]:
+        basis.append({'center': np.array(center), 'type': ao_type,
+                      'exponents': exponents,
+                      'coefficients': [0.5] * len(exponents)})
+  return basis
+
+def test_packed_eri():
+  from qctoolkit.QM.gaussianbasis_io import eeMatrix, GaussianBasisOutput
+  basis = gaussian_basis()
+  n = len(basis)
+  eri, n_quartet, n_skip = eeMatrix(basis, tolerance=0, stats=True)
+  assert n_skip == 0 and n_quartet == len(eri)
+  ee = eri.unpack()
+  assert np.allclose(ee, ee.transpose(1, 0, 2, 3))
+  assert np.allclose(ee, ee.transpose(2, 3, 0, 1))
+  r = np.random.RandomState(0)
+  i, j, k, l = r.randint(n, size=(4, 50))
+  assert np.allclose(eri[i, j, k, l], ee[i, j, k, l])
+
+  D = r.randn(n, n)
+  D = D + D.T
+  J, K = eri.JK(D)
+  assert np.allclose(J, np.einsum('ijkl,kl->ij', ee, D))
+  assert np.allclose(K, np.einsum('ijkl,jl->ik', ee, D))
+  assert np.allclose(eri.J(D), J) and np.allclose(eri.K(D), K)
+  h = r.randn(n, n)
+  assert np.allclose(eri.fock(D, h), h + J - 0.5 * K)
+  try:
+    eri.JK(D + np.triu(D))
+    assert False
+  except RuntimeError:
+    pass
+
+  # energies against contraction of the 4D tensor
+  out = GaussianBasisOutput()
+  out.basis = basis
+  out.mo_vectors, _ = np.linalg.qr(r.randn(n, n))
+  out.occupation = [2, 2, 2, 0]
+  td = np.tensordot
+  mo = out.mo_vectors
+  for ee_4d, E in [(2 * ee, out.EJ()),
+                   (-np.swapaxes(ee, 1, 2), out.EX())]:
+    ref = td(mo, ee_4d, axes=(1, 0))
+    ref = td(mo, ref, axes=(1, 1))
+    ref = td(mo, ref, axes=(1, 2))
+    ref = td(mo, ref, axes=(1, 3))
+    assert np.allclose(E, sum([ref[a, a, b, b] for a in range(3)
+                                                for b in range(3)]))
+
+def test_eri_screening():
+  from qctoolkit.QM.gaussianbasis_io import eeMatrix
+  basis = gaussian_basis()
+  exact = eeMatrix(basis, tolerance=0)
+  for tolerance in [1E-2, 1E-1]:
+    eri, n_quartet, n_skip = eeMatrix(basis, tolerance=tolerance,
+                                      stats=True)
+    assert 0 < n_skip < n_quartet
+    assert np.sum(eri.data == 0) >= n_skip
+    # skipped integrals are below their Schwarz bound
+    assert np.max(np.abs(eri.data - exact.data)) < tolerance
+
 def test_h2_pbe_allcode():
   if qtk.setting.run_qmtest:
     codes = ['nwchem', 'cpmd', 'vasp', 'bigdft']
@@ -140,6 +225,80 @@ def test_QMOut_operations():
       assert out1.Et == E1 * factor
       assert out2.Et == E2 * factor
 
+def test_qm_cache():
+  path = os.path.realpath(__file__)
+  path = re.sub('[a-zA-Z0-9\._\-]*$', '', path)
+  mol = setup(mol='h2o.xyz')[0]
+  qmout = qtk.QMOut(os.path.join(path, 'test_data/qmout/h2n/h2n.out'),
+                    program='nwchem')
+  cache = qtk.QMCache(tmp_str + 'cache_' + str(os.getpid()))
+  inp = qtk.QMInp(mol, program='nwchem', theory='pbe')
+  key = cache.key(inp)
+  assert cache.get(inp) is None
+  assert cache.put(inp, qmout)
+  assert cache.get(inp).Et == qmout.Et
+  assert cache.hits == 1 and cache.misses == 1
+
+  # rounding tolerance and non-physical settings
+  mol2 = mol.copy()
+  mol2.R[0, 0] += 1E-8
+  inp2 = qtk.QMInp(mol2, program='nwchem', theory='pbe', threads=4)
+  assert cache.key(inp2) == key
+  inp3 = qtk.QMInp(mol, program='nwchem', theory='blyp')
+  assert cache.key(inp3) != key
+
+  # failed jobs are not stored
+  assert not cache.put(inp3, qtk.QMOut())
+  assert cache.stats()['entries'] == 1
+  cache.max_size = 0
+  cache.evict()
+  assert cache.stats()['entries'] == 0
+
+def test_job_supervisor():
+  root = os.path.abspath(tmp_str + 'supervisor_' + str(os.getpid()))
+  os.makedirs(root)
+  def steps(n):
+    for i in range(n):
+      yield qtk.QM.supervisor.QMCommand('echo %d' % i, 'step%d.out' % i)
+    yield sorted(glob.glob('step*.out'))
+  events = []
+  sup = qtk.JobSupervisor(cores=2, poll=0.05, grace=0.1,
+                          callback=lambda t, e: events.append(e))
+  t1 = sup.command('echo hello', 'hello.out', cwd=root)
+  t2 = sup.command('sleep 10', 'sleep.out', cwd=root, timeout=0.2)
+  t3 = sup.submit(steps(3), cwd=root)
+  out = sup.wait()
+  assert t1.state == 'done' and t1.out == 0
+  assert open(os.path.join(root, 'hello.out')).read() == 'hello\n'
+  assert t2.state == 'timeout' and t2.out is None
+  assert out[2] == ['step0.out', 'step1.out', 'step2.out']
+  assert events.count('started') == 5
+  assert events.count('finished') == 5
+
+def test_output_monitor():
+  path = os.path.realpath(__file__)
+  path = re.sub('[a-zA-Z0-9\._\-]*$', '', path)
+  ref = os.path.join(path, 'test_data/qmout/h2n/h2n.out')
+  root = os.path.abspath(tmp_str + 'monitor_' + str(os.getpid()))
+  os.makedirs(root)
+  info = []
+  progress = lambda task, i: info.append(i)
+  sup = qtk.JobSupervisor(poll=0.05, grace=0.1)
+  monitor = qtk.QM.monitor.OutputMonitor('nwchem', progress)
+  t1 = sup.command('cat %s' % ref, 'h2n.out', cwd=root, monitor=monitor)
+  failing = 'cat %s; echo " calculation failed to converge"; sleep 10'
+  t2 = sup.command(failing % ref, 'fail.out', cwd=root,
+                   monitor=qtk.QM.monitor.OutputMonitor('nwchem'))
+  t3 = sup.command('cat %s; sleep 10' % ref, 'scf.out', cwd=root,
+                   monitor=qtk.QM.monitor.OutputMonitor('nwchem',
+                                                        max_scf=3))
+  sup.wait()
+  assert t1.state == 'done'
+  assert info[-1]['n_scf'] == 4
+  assert abs(info[-1]['converged'] - (-1.161904335963)) < 1E-10
+  assert t2.state == 'aborted' and 'converge' in t2.error
+  assert t3.state == 'aborted' and 'SCF' in t3.error
+
 def test_cleanup():
   tmp_files = glob.glob(tmp_str + '*')
   for tmp in tmp_files:
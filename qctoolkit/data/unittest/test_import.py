@@ -0,0 +1,44 @@
+from setup_test import *
+import subprocess as sp
+import sys
+
+heavy_modules = [
+  'networkx', 'pandas', 'matplotlib', 'sqlalchemy', 'paramiko',
+  'pexpect', 'scipy.interpolate', 'qctoolkit.QM.qmInterface',
+  'qctoolkit.MD', 'qctoolkit.DB',
+]
+
+bench_str = """
+import time, sys
+t0 = time.time()
+import qctoolkit as qtk
+t1 = time.time()
+mol = qtk.Molecule()
+# everything formerly imported eagerly
+for name in qtk._lazy_attrs.keys():
+  getattr(qtk, name)
+t2 = time.time()
+print t1 - t0, t2 - t1
+"""
+
+def import_time(repeat=3):
+  """best wall-clock time of import qctoolkit in fresh interpreters"""
+  timing = []
+  for _ in range(repeat):
+    out = sp.check_output([sys.executable, '-c', bench_str],
+                          stderr=sp.STDOUT)
+    timing.append([float(t) for t in out.split('\n')[-2].split()])
+  return np.array(timing).min(axis=0)
+
+def test_lazy_import():
+  check_str = "import sys, qctoolkit; qctoolkit.Molecule();" +\
+              "print [m for m in %s if m in sys.modules]" % heavy_modules
+  out = sp.check_output([sys.executable, '-c', check_str],
+                        stderr=sp.STDOUT)
+  assert out.split('\n')[-2] == '[]'
+
+if __name__ == '__main__':
+  # benchmark, python test_import.py
+  t_import, t_lazy = import_time()
+  print "import qctoolkit: %.3f s, all subpackages: %.3f s"\
+        % (t_import, t_import + t_lazy)
@@ -0,0 +1,84 @@
+from setup_test import *
+qtk.setting.no_warning = True
+qtk.setting.quiet = True
+
+def add(a, b, factor=1):
+  if a < 0:
+    raise ValueError('negative input')
+  return a + b * factor
+
+def test_parallelize():
+  inp = [[i, 1, {'factor': 2}] for i in range(10)]
+  out = qtk.parallelize(add, inp, threads=2)
+  assert out == [i + 2 for i in range(10)]
+
+def test_pool():
+  inp = [[i, 1] for i in range(-2, 8)]
+  with qtk.Pool(threads=2, retry=1) as pool:
+    out = qtk.parallelize(add, inp, pool=pool)
+    assert isinstance(out[0], qtk.TaskFailure)
+    assert out[0].attempts == 2
+    assert out[0].error_type == 'ValueError'
+    assert out[2:] == [i + 1 for i in range(8)]
+    streamed = dict(pool.imap(add, inp, block_size=3))
+    assert sorted(streamed.keys()) == range(len(inp))
+    assert streamed[5] == 4
+
+def norm(v):
+  return np.linalg.norm(v, axis=1), v * 2
+
+def test_shm_transport():
+  grid = np.random.rand(20000, 3)
+  inp = [[grid] for _ in range(4)]
+  for pool in [None, qtk.Pool(threads=2)]:
+    out = qtk.parallelize(norm, inp, n_output=2, pool=pool,
+                          transport='shm', threads=2)
+    assert len(out[0]) == 4
+    for n, v in zip(*out):
+      assert np.allclose(n, np.linalg.norm(grid, axis=1))
+      assert np.allclose(v, grid * 2)
+    if pool:
+      pool.close()
+
+def test_guided_schedule():
+  inp = [[i, 1] for i in range(50)]
+  cost = lambda a, b: a
+  ref = [i + 1 for i in range(50)]
+  assert qtk.parallelize(add, inp, threads=3, 
+                         schedule='guided', cost=cost) == ref
+  with qtk.Pool(threads=3) as pool:
+    assert qtk.parallelize(add, inp, pool=pool, 
+                           schedule='guided', cost=cost) == ref
+    assert pool.map(add, inp, schedule='guided') == ref
+
+def test_core_scheduler():
+  sch = qtk.CoreScheduler(cores=4, memory=8)
+  inp = [[i, 1] for i in range(-1, 6)]
+  out = sch.run(add, inp, [4, 1, 2, 1, 3, 1, 2], [0, 1, 1, 4, 2, 8, 0])
+  assert isinstance(out[0], qtk.TaskFailure)
+  assert out[1:] == [i + 1 for i in range(6)]
+
+def claim(journal, name):
+  return journal.claim(name)
+
+def test_job_journal():
+  root = 'qct_test_journal_' + str(os.getpid())
+  os.makedirs(root)
+  try:
+    journal = qtk.JobJournal(root)
+    assert journal.claim('a')
+    assert not journal.claim('a')
+    # claimed by other processes through shared journal file
+    out = qtk.parallelize(claim, [[journal, n] for n in 'abc'], threads=2)
+    assert out == [False, True, True]
+    # running jobs of dead processes are claimed again
+    assert journal.claim('b')
+    journal.mark('a', 'failed')
+    assert journal.claim('a')
+    out = qtk.QMOutput()
+    out.Et = -1.0
+    journal.finish('a', out)
+    assert not qtk.JobJournal(root).claim('a')
+    assert journal.summary() == {'finished': 1, 'running': 2}
+  finally:
+    shutil.rmtree(root)
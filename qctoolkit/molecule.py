@@ -3,13 +3,195 @@ import qctoolkit as qtk
 import setting
 import re, os, sys, copy, operator
 from time import sleep
-import networkx
-from networkx.algorithms.components.connected\
-     import connected_components
 import periodictable as pt
 import collections
+import itertools
 from math import ceil, floor
-from MD.dlist_2_cv import dlist_2_cv as dl2
+
+# covalent radius plus its uncertainty of element symbols
+_radius_table = {}
+
+def _covalentRadius(type_list):
+  """covalent radius array of element symbols, in angstrom"""
+  types, inverse = np.unique(np.asarray(type_list), return_inverse=True)
+  radius = []
+  for t in types:
+    if t not in _radius_table:
+      atom = getattr(pt, t)
+      _radius_table[t] = atom.covalent_radius + \
+                         atom.covalent_radius_uncertainty
+    radius.append(_radius_table[t])
+  return np.array(radius)[inverse]
+
+def _neighborPairs(R, cutoff, lattice=None):
+  """
+  atom pairs i < j within cutoff on a KD-tree, return i, j, d
+  sorted by i, j. For periodic lattice, d is the minimum
+  image distance
+  """
+  from scipy.spatial import cKDTree
+  R = np.asarray(R, dtype=float).reshape(-1, 3)
+  empty = np.array([], dtype=int)
+  if len(R) < 2:
+    return empty, empty, np.array([])
+  if lattice is None:
+    pairs = cKDTree(R).query_pairs(cutoff, output_type='ndarray')
+    i, j = pairs[:, 0], pairs[:, 1]
+    d = np.linalg.norm(R[i] - R[j], axis=1)
+  else:
+    lattice = np.asarray(lattice, dtype=float)
+    frac = np.linalg.solve(lattice.T, R.T).T
+    R = np.dot(frac - np.floor(frac), lattice)
+    # images needed along each lattice vector,
+    # distance between opposite cell faces is volume/area
+    volume = abs(np.linalg.det(lattice))
+    n_image = []
+    for k in range(3):
+      area = np.linalg.norm(np.cross(lattice[(k+1) % 3],
+                                     lattice[(k+2) % 3]))
+      n_image.append(int(ceil(cutoff * area / volume)))
+    tree = cKDTree(R)
+    i, j, d = [], [], []
+    for shift in itertools.product(*[range(-n, n+1) for n in n_image]):
+      image = cKDTree(R + np.dot(shift, lattice))
+      dist = tree.sparse_distance_matrix(image, cutoff,
+                                         output_type='ndarray')
+      i.append(dist['i'])
+      j.append(dist['j'])
+      d.append(dist['v'])
+    i, j, d = np.concatenate(i), np.concatenate(j), np.concatenate(d)
+    keep = i != j
+    i, j = np.minimum(i, j)[keep], np.maximum(i, j)[keep]
+    d = d[keep]
+    # keep shortest image of each pair
+    order = np.lexsort((d, j, i))
+    i, j, d = i[order], j[order], d[order]
+    first = np.ones(len(i), dtype=bool)
+    first[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1])
+    return i[first], j[first], d[first]
+  order = np.lexsort((j, i))
+  return i[order], j[order], d[order]
+
+# molecules of up to _pair_cache_size atoms keep distance matrix
+_pair_cache_size = 2000
+
+def _minimumImage(vectors, lattice):
+  """vectors (..., 3) wrapped to nearest periodic image"""
+  frac = np.dot(vectors, np.linalg.inv(lattice))
+  frac -= np.round(frac)
+  return np.dot(frac, lattice)
+
+def _pairBlocks(R, lattice=None, R2=None):
+  """
+  yield row blocks (start, stop, vectors, d) of pair vectors
+  R_i - R2_j and distances d of atoms start:stop to all atoms of
+  R2 (default R), about 2**20 pairs per block. Minimum image if
+  lattice is given
+  """
+  R = np.asarray(R, dtype=float).reshape(-1, 3)
+  if R2 is None:
+    R2 = R
+  R2 = np.asarray(R2, dtype=float).reshape(-1, 3)
+  block_size = max(1, 2**20 // max(len(R2), 1))
+  for start in range(0, len(R), block_size):
+    stop = min(start + block_size, len(R))
+    vectors = R[start:stop, np.newaxis, :] - R2[np.newaxis, :, :]
+    if lattice is not None:
+      vectors = _minimumImage(vectors, lattice)
+    d = np.sqrt(np.einsum('ijk,ijk->ij', vectors, vectors))
+    yield start, stop, vectors, d
+
+# per-atom attributes shared copy-on-write by Molecule.copy(deep=False)
+_shared_names = ['R', 'R_scale', 'Z', 'type_list', 'string']
+
+class _SharedArray(np.ndarray):
+  """
+  read-only view of per-atom array shared by Molecule.copy(deep=False).
+  Item assignment and in-place operators give the molecule its own
+  copy first and write to it. Indexing returns copies, so that
+  mol.R[0] += 1 ends in item assignment. Results of numpy operations
+  on the view are plain arrays
+  """
+  def __array_finalize__(self, obj):
+    self._owner = None
+
+  def __array_wrap__(self, out, context=None):
+    out = np.ndarray.__array_wrap__(self, out, context).view(np.ndarray)
+    if out.ndim == 0:
+      return out[()]
+    return out
+
+  def _writable(self):
+    """array of the owning molecule, copied first if still shared"""
+    if self._owner is None:
+      return None
+    mol, key, shared = self._owner
+    state = mol.__dict__
+    if state['_shared'].get(key) != id(shared):
+      return None
+    if state[key] is shared:
+      state[key] = shared.copy()
+    return state[key]
+
+  def __getitem__(self, index):
+    out = np.ndarray.__getitem__(self, index)
+    if self._owner is not None and isinstance(out, np.ndarray):
+      return np.array(out)
+    return out
+
+  def __setitem__(self, index, value):
+    target = self._writable()
+    if target is None:
+      np.ndarray.__setitem__(self, index, value)
+    else:
+      target[index] = value
+
+def _inplace(name):
+  def method(self, other):
+    target = self._writable()
+    if target is None:
+      return getattr(np.ndarray, name)(self, other)
+    return getattr(target, name)(other)
+  method.__name__ = name
+  return method
+
+for _name in ['__iadd__', '__isub__', '__imul__', '__idiv__',
+              '__itruediv__', '__ifloordiv__', '__imod__', '__ipow__',
+              '__iand__', '__ior__', '__ixor__']:
+  setattr(_SharedArray, _name, _inplace(_name))
+
+class _CopyOnWrite(object):
+  """
+  per-atom attribute of Molecule stored as _name. An array shared by
+  Molecule.copy(deep=False) is handed out as _SharedArray view, the
+  molecule writing first gets its own copy
+  """
+  def __init__(self, name):
+    self.name = name
+    self.key = '_' + name
+
+  def __get__(self, mol, cls=None):
+    if mol is None:
+      return self
+    state = mol.__dict__
+    try:
+      value = state[self.key]
+    except KeyError:
+      raise AttributeError(self.name)
+    if state.get('_shared', {}).get(self.key) == id(value):
+      shared = value
+      value = shared.view(_SharedArray)
+      value.flags.writeable = False
+      value._owner = (mol, self.key, shared)
+    return value
+
+  def __set__(self, mol, value):
+    state = mol.__dict__
+    if self.key in state.get('_shared', {}):
+      del state['_shared'][self.key]
+    if isinstance(value, _SharedArray):
+      value = np.array(value)
+    state[self.key] = value
 
 class Molecule(object):
   """
@@ -25,8 +207,12 @@ class Molecule(object):
     type_list
     charge
     multiplicity
-    bonds
+    bonds, dict view of bond_index/bond_code/bond_length
     bond_types
+    bond_index(np.array), Nb x 2 atom indices of bonds
+    bond_code(np.array), index of bond name in bond_names
+    bond_length(np.array), bond lengths
+    bond_names(list), bond names, e.g. 'C=O'
     segments
     name
 
@@ -45,7 +231,11 @@ class Molecule(object):
 
     geometry operation:
       distance(i, j) --- return distance (angstrom) between 
-                         atom i and j
+                         atom i and j, minimum_image=True for
+                         nearest periodic image
+      pairDistance() --- cached NxN distance matrix (angstrom)
+      nuclear_repulsion(gradient=False) --- nuclear repulsion
+                                            energy (and gradient)
       center(coord) --- shift molecule such that coord becomes 
                         zero vector. It can be used for centering 
                         selected atom: R = R - coord
@@ -75,9 +265,11 @@ class Molecule(object):
                                        in list_str. Used for user 
                                        define atom symbols
       isolateAtoms(list_ind) --- keep only the atoms listed in list_ind
+      copy(deep=True) --- deep copy, deep=False shares per-atom data
+                          copy-on-write and drops bonds/segments
     basic IO:
       read()
-      read_xyz()
+      read_xyz() --- frame=i for frame i of multi-frame file
       read_pdb() --- not yet implemented
       write()
       write_xyz()
@@ -90,7 +282,16 @@ class Molecule(object):
 
   # used for pymol numeration
   mol_id = 0
+
+  R = _CopyOnWrite('R')
+  R_scale = _CopyOnWrite('R_scale')
+  Z = _CopyOnWrite('Z')
+  type_list = _CopyOnWrite('type_list')
+  string = _CopyOnWrite('string')
+
   def __init__(self, *args, **kwargs):
+    # per-atom data shared with copies, see copy(deep=False)
+    self._shared = {}
     # number of atoms
     self.N = 0
     # atom coordinates
@@ -107,6 +308,11 @@ class Molecule(object):
     self.index = 0
     self.bonds = {}
     self.bond_types = {}
+    self.bond_index = None
+    self.bond_code = None
+    self.bond_length = None
+    self.bond_names = []
+    self._pair_cache = None
     self.string = []
     self.segments = []
     self.periodic = False
@@ -167,17 +373,125 @@ class Molecule(object):
     out.name = self.name + "_" + other.name
     return out
 
-  def copy(self):
-    return copy.deepcopy(self)
-
-  def nuclear_repulsion(self):
-    out = 0.
-    for i in range(self.N):
-      for j in range(i+1, self.N):
-        Rij = np.linalg.norm(self.R[i] - self.R[j]) * 1.8897261245650618
-        out += self.Z[i] * self.Z[j] / Rij
+  def __getstate__(self):
+    # deep copies and pickles own their per-atom arrays
+    state = dict(self.__dict__)
+    state['_shared'] = {}
+    return state
+
+  def __setstate__(self, state):
+    # pickled before per-atom data became copy-on-write
+    for name in _shared_names:
+      if name in state:
+        state['_' + name] = state.pop(name)
+    if not isinstance(state.get('_shared'), dict):
+      state['_shared'] = {}
+    # pickled before bond arrays, rebuilt by findBonds when needed
+    if 'bonds' in state:
+      state['_bonds'] = state.pop('bonds')
+    for key, value in [('_bonds', {}), ('bond_types', {}),
+                       ('bond_index', None), ('bond_code', None),
+                       ('bond_length', None), ('bond_names', []),
+                       ('_pair_cache', None)]:
+      if key not in state:
+        state[key] = value
+    self.__dict__.update(state)
+
+  def copy(self, deep=True):
+    """
+    deep copy of molecule. For deep=False, per-atom arrays (R,
+    R_scale, Z, type_list, string) are shared copy-on-write, the
+    molecule writing first gets its own copy. Bonds and segments are
+    dropped and all other attributes are copied shallow
+    """
+    if deep:
+      return copy.deepcopy(self)
+    if not isinstance(self.__dict__.get('_shared'), dict):
+      self._shared = {}
+    out = self.__class__.__new__(self.__class__)
+    out._shared = {}
+    for key, value in self.__dict__.iteritems():
+      if key in ['_shared', 've', 'ne']:
+        continue
+      if key[1:] in _shared_names and isinstance(value, np.ndarray):
+        self._shared[key] = id(value)
+        out._shared[key] = id(value)
+        out.__dict__[key] = value
+      elif key == '_pair_cache':
+        out.__dict__[key] = value
+      else:
+        out.__dict__[key] = copy.copy(value)
+    out.ve = out.getValenceElectrons
+    out.ne = out.getTotalElectrons
+    out.bonds = {}
+    out.bond_types = {}
+    out.bond_index = None
+    out.bond_code = None
+    out.bond_length = None
+    out.bond_names = []
+    out.segments = []
     return out
 
+  def nuclear_repulsion(self, gradient=False):
+    """
+    nuclear repulsion energy in hartree, with gradient=True return
+    energy and its gradient with respect to R in hartree/bohr
+    """
+    bohr = 1.8897261245650618
+    Z = np.asarray(self.Z, dtype=float)
+    if not gradient and self.N <= _pair_cache_size:
+      D = self.pairDistance() * bohr
+      np.fill_diagonal(D, np.inf)
+      return 0.5 * np.sum(np.outer(Z, Z) / D)
+
+    energy = 0.
+    grad = np.zeros([self.N, 3])
+    for start, stop, vectors, d in _pairBlocks(self.R):
+      d = d * bohr
+      d[np.arange(stop - start), np.arange(start, stop)] = np.inf
+      ZZ_d = Z[start:stop, np.newaxis] * Z / d
+      energy += 0.5 * np.sum(ZZ_d)
+      if gradient:
+        grad[start:stop] = -np.einsum('ij,ijk->ik', ZZ_d / d**2,
+                                      vectors * bohr)
+    if gradient:
+      return energy, grad
+    return energy
+
+  def _lattice(self, minimum_image):
+    """lattice vectors for minimum image, None otherwise"""
+    if not minimum_image:
+      return None
+    if not self.periodic or np.size(self.celldm) < 6:
+      qtk.exit("minimum image requires periodic molecule with celldm")
+    return qtk.celldm2lattice(self.celldm)
+
+  def pairDistance(self, minimum_image=False):
+    """
+    N x N distance matrix in angstrom, minimum image distances of
+    periodic molecule for minimum_image=True. The read-only matrix
+    is cached for up to _pair_cache_size atoms and recomputed
+    when R is changed, also in place, or celldm is changed
+    """
+    R = np.asarray(self.R, dtype=float).reshape(-1, 3)
+    lattice = self._lattice(minimum_image)
+    cache = getattr(self, '_pair_cache', None)
+    if cache is None or not np.array_equal(cache['R'], R):
+      cache = {'R': R.copy()}
+    key = bool(minimum_image)
+    if key in cache:
+      cached_lattice, D = cache[key]
+      if lattice is None or np.array_equal(lattice, cached_lattice):
+        return D
+    D = np.empty([len(R), len(R)])
+    for start, stop, _, d in _pairBlocks(R, lattice):
+      D[start:stop] = d
+    if len(R) <= _pair_cache_size:
+      D.flags.writeable = False
+      cache[key] = (lattice, D)
+      self._pair_cache = cache
+    return D
+
   def view(self, name=None):
     tmp = copy.deepcopy(self)
     if qtk.imported('pymol'):
@@ -221,7 +535,7 @@ class Molecule(object):
       self.N = moleculeData.shape[0]
       self.Z = moleculeData[:, 0]
       self.R = moleculeData[:, 1:]
-      self.type_list = [qtk.Z2n(z) for z in self.Z]
+      self.type_list = qtk.Z2n_array(self.Z).tolist()
       self.string = ['' for i in range(self.N)]
       if name is None:
         self.name = self.stoichiometry()
@@ -235,7 +549,7 @@ class Molecule(object):
       self.N = len(Z)
       self.Z = Z
       self.R = R
-      self.type_list = [qtk.Z2n(z) for z in self.Z]
+      self.type_list = qtk.Z2n_array(self.Z).tolist()
       self.string = ['' for i in range(self.N)]
       self.name = self.stoichiometry()
 
@@ -244,133 +558,142 @@ class Molecule(object):
 
     return self
 
+  @property
+  def bonds(self):
+    """dict of bond properties, built from bond arrays on access"""
+    if self._bonds is None:
+      bond_table = qtk.data.elements.bond_table
+      kj2kcal = qtk.convE(1, 'kj-kcal')[0]
+      self._bonds = {}
+      for itr in range(len(self.bond_index)):
+        index_begin, index_end = [int(i) for i in self.bond_index[itr]]
+        name = self.bond_names[self.bond_code[itr]]
+        if name in bond_table:
+          energy = bond_table[name][1] * kj2kcal
+        else:
+          energy = np.nan
+        self._bonds[itr] = {'atom_begin'  : self.Z[index_begin],
+                            'index_begin' : index_begin,
+                            'atom_end'    : self.Z[index_end],
+                            'index_end'   : index_end,
+                            'length'      : self.bond_length[itr],
+                            'name'        : name,
+                            'energy'      : energy}
+    return self._bonds
+
+  @bonds.setter
+  def bonds(self, bonds):
+    self._bonds = bonds
+
   # tested
   def findBonds(self, ratio=setting.bond_ratio, **kwargs):
-    del self.segments
-    del self.bond_types
+    """
+    bonded pairs within (R_i + R_j) * ratio by KD-tree search,
+    where R is covalent radius. Minimum image distances are used
+    for periodic molecules. Bond type with closest tabulated
+    length is assigned to each pair
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
     self.segments = []
     self.bond_types = {}
     if 'no_report' not in kwargs or not kwargs['no_report']:
       qtk.report("Molecule", 
                  "finding bonds with cutoff ratio", 
                  ratio)
-    def to_graph(l):
-      G = networkx.Graph()
-      for part in l:
-        # each sublist is a bunch of nodes
-        G.add_nodes_from(part)
-        # it also imlies a number of edges:
-        G.add_edges_from(to_edges(part))
-      return G
-    
-    def to_edges(l):
-      """ 
-      treat `l` as a Graph and returns it's edges 
-      to_edges(['a','b','c','d']) -> [(a,b), (b,c),(c,d)]
-      """
-      it = iter(l)
-      last = next(it)
-    
-      for current in it:
-        yield last, current
-        last = current 
-    itr = 0
-    bond_list = []
-    bonded = [False for i in range(self.N)]
-    for i in xrange(self.N):
-      for j in xrange(i+1, self.N):
-        d_ij = np.linalg.norm(self.R[i,:] - self.R[j,:])
-        atom_i = getattr(pt, self.type_list[i])
-        atom_j = getattr(pt, self.type_list[j])
-        Ri = atom_i.covalent_radius + \
-             atom_i.covalent_radius_uncertainty
-        Rj = atom_j.covalent_radius + \
-             atom_j.covalent_radius_uncertainty
-        Dij = (Ri+Rj) * float(ratio)
-        if d_ij < Dij:
-          bonded[i] = True
-          bonded[j] = True
-          if self.Z[i] < self.Z[j]:
-            atom_begin = self.Z[i]
-            atom_end = self.Z[j]
-            index_begin = i
-            index_end = j
-          else:
-            atom_begin = self.Z[j]
-            atom_end = self.Z[i]
-            index_begin = j
-            index_end = i
-          self.bonds[itr] = {'atom_begin'  : atom_begin,
-                             'index_begin' : index_begin,
-                             'atom_end'    : atom_end,
-                             'index_end'   : index_end,
-                             'length'      : d_ij}
-          bond_list.append([i, j])
-          type_begin = qtk.Z2n(atom_begin)
-          type_end   = qtk.Z2n(atom_end)
-          bond_table = qtk.data.elements.bond_table
-          bond_keys = []
-          bond_keys = [
-            type_begin + _ + type_end for _ in ['-', '=', '#']
-          ]
-          try:
-            bond_type_ind = np.argmin(
-              abs(
-                np.array([
-                          bond_table[k][0] for k in bond_keys
-                          if k in bond_table.keys()
-                         ]) - d_ij
-              )
-            )
-          except Exception as _e:
-            qtk.warning(
-              "error while processing bond" +\
-              str(bond_keys) + "with error message %s" % str(_e))
-            bond_type_ind = -1
-          bond_type = bond_keys[bond_type_ind]
-          self.bonds[itr]['name'] = bond_type
-          try:
-            bond_energy = \
-              bond_table[bond_keys[bond_type_ind]][1] * \
-              qtk.convE(1, 'kj-kcal')[0]
-          except:
-            bond_energy = np.nan
-          self.bonds[itr]['energy'] = bond_energy
-          if np.isnan(bond_energy):
-            qtk.warning("Non-tabliated covalent bond %s" % bond_type)
-          if bond_type in self.bond_types:
-            self.bond_types[bond_type] += 1
-          else:
-            self.bond_types[bond_type] = 1
-          itr += 1
-
-    segments = list(connected_components(to_graph(bond_list)))
-    for s in range(len(segments)):
-      segment = list(segments[s])
-      new_mol = self.getSegment(segment, **kwargs)
-      ns = len(self.segments)
-      new_mol.name = new_mol.name + '_%d' % ns
-      self.segments.append(new_mol)
-    for s in [i for i in range(self.N) if not bonded[i]]:
-      segment = [s]
-      new_mol = self.getSegment(segment, **kwargs)
+    ratio = float(ratio)
+    Z = np.asarray(self.Z)
+    radius = _covalentRadius(self.type_list)
+    lattice = None
+    if self.periodic and np.size(self.celldm) >= 6:
+      lattice = qtk.celldm2lattice(self.celldm)
+    cutoff = 0.
+    if self.N > 0:
+      cutoff = 2 * radius.max() * ratio
+    i, j, d = _neighborPairs(self.R, cutoff, lattice)
+    bonded = d < (radius[i] + radius[j]) * ratio
+    i, j, d = i[bonded], j[bonded], d[bonded]
+
+    # lower Z first
+    swap = Z[i] >= Z[j]
+    self.bond_index = np.stack([np.where(swap, j, i),
+                                np.where(swap, i, j)], axis=1)
+    self.bond_length = d
+    self.bond_code = np.zeros(len(d), dtype=int)
+    self.bond_names = []
+    self._bonds = None
+
+    # classify by tabulated bond length of each element pair
+    bond_table = qtk.data.elements.bond_table
+    if len(d) > 0:
+      pairs, pair_index = np.unique(Z[self.bond_index], axis=0,
+                                    return_inverse=True)
+    else:
+      pairs, pair_index = [], []
+    for p, (Z_begin, Z_end) in enumerate(pairs):
+      bond_keys = [qtk.Z2n(Z_begin) + _ + qtk.Z2n(Z_end)
+                   for _ in ['-', '=', '#']]
+      ref = np.array([bond_table[k][0] if k in bond_table else np.nan
+                      for k in bond_keys])
+      members = np.where(pair_index == p)[0]
+      if np.isnan(ref).all():
+        qtk.warning("Non-tabliated covalent bond %s" % bond_keys[0])
+        bond_type = np.zeros(len(members), dtype=int)
+      else:
+        ref[np.isnan(ref)] = np.inf
+        bond_type = np.argmin(abs(ref - d[members, np.newaxis]), axis=1)
+      self.bond_code[members] = len(self.bond_names) + bond_type
+      self.bond_names.extend(bond_keys)
+    for code, count in enumerate(np.bincount(self.bond_code,
+                                 minlength=len(self.bond_names))):
+      if count > 0:
+        self.bond_types[self.bond_names[code]] = int(count)
+
+    # bonded segments ordered by their first atom, then single atoms
+    graph = coo_matrix((np.ones(len(d)), (i, j)), shape=(self.N, self.N))
+    n_segments, label = connected_components(graph, directed=False)
+    order = np.argsort(label, kind='mergesort')
+    members = np.split(order, np.cumsum(np.bincount(label))[:-1])
+    members.sort(key=lambda m: (len(m) == 1, m[0]))
+    for segment in members:
+      new_mol = self.getSegment(segment.tolist(), **kwargs)
       ns = len(self.segments)
       new_mol.name = new_mol.name + '_%d' % ns
       self.segments.append(new_mol)
 
   # tested
   def getSegment(self, index_list, **kwargs):
-    new_mol = copy.deepcopy(self)
-    new_mol.charge = 0
     if type(index_list) != list:
       index_list = [index_list]
-    index_list = map(lambda a: a, index_list)
+    # per-atom data and bonds are not copied from the full molecule
+    skip = ['_R', '_R_scale', '_Z', '_type_list', '_string', '_shared',
+            'segments', 've', 'ne', '_pair_cache', '_bonds', 'bond_types',
+            'bond_index', 'bond_code', 'bond_length', 'bond_names']
+    state = dict([(k, v) for k, v in self.__dict__.iteritems()
+                  if k not in skip])
+    new_mol = self.__class__.__new__(self.__class__)
+    new_mol.__dict__.update(copy.deepcopy(state))
+    new_mol._shared = {}
+    new_mol.ve = new_mol.getValenceElectrons
+    new_mol.ne = new_mol.getTotalElectrons
+    new_mol.bonds = {}
+    new_mol.bond_types = {}
+    new_mol.bond_index = None
+    new_mol.bond_code = None
+    new_mol.bond_length = None
+    new_mol.bond_names = []
+    new_mol.segments = []
+    new_mol.charge = 0
     new_mol.N = len(index_list)
-    new_mol.R = np.array([new_mol.R[i] for i in index_list])
-    new_mol.Z = np.array([new_mol.Z[i] for i in index_list])
-    new_mol.type_list = \
-      [new_mol.type_list[i] for i in index_list]
-    new_mol.string = np.array(new_mol.string)[index_list].tolist()
+    new_mol.R = np.asarray(self.R)[index_list]
+    if self.periodic and np.asarray(self.R_scale).shape[-1] > 0:
+      new_mol.R_scale = np.asarray(self.R_scale)[index_list]
+    else:
+      new_mol.R_scale = np.atleast_2d(np.array([]))
+    new_mol.Z = np.array([self.Z[i] for i in index_list])
+    new_mol.type_list = [self.type_list[i] for i in index_list]
+    new_mol.string = [self.string[i] for i in index_list]
     unpaired = new_mol.getValenceElectrons() % 2
     if unpaired == 1:
       if 'charge_saturation' not in kwargs:
@@ -383,27 +706,17 @@ class Molecule(object):
 
   # tested
   def haveBond(self, type_a, type_b):
-    result = False
-    type_a = type_a.title()
-    type_b = type_b.title()
-    if '0' not in self.bonds:
+    if self.bond_index is None:
       self.findBonds()
-    if qtk.n2Z(type_a) > qtk.n2Z(type_b):
-      atom_begin = qtk.n2Z(type_b)
-      atom_end = qtk.n2Z(type_a)
-    else:
-      atom_begin = qtk.n2Z(type_a)
-      atom_end = qtk.n2Z(type_b)
-    for key in self.bonds:
-      if self.bonds[key]['atom_begin'] == atom_begin \
-      and self.bonds[key]['atom_end'] == atom_end:
-        result = True
-    return result
+    Z_a = qtk.n2Z(type_a.title())
+    Z_b = qtk.n2Z(type_b.title())
+    Z = np.asarray(self.Z)[self.bond_index]
+    return bool(np.any((Z[:, 0] == min(Z_a, Z_b)) \
+                     & (Z[:, 1] == max(Z_a, Z_b))))
 
   # tested
   def getValenceElectrons(self):
-    ve = np.vectorize(qtk.n2ve)
-    nve = sum(ve(self.type_list)) - self.charge
+    nve = sum(qtk.n2ve_array(self.type_list)) - self.charge
     return int(nve)
 
   def getTotalElectrons(self):
@@ -446,10 +759,17 @@ class Molecule(object):
         self.setChargeMultiplicity(charge, 1)
 
   # tested
-  def distance(self, i, j):
-    Ri = self.R[i]
-    Rj = self.R[j]
-    return np.linalg.norm(Ri - Rj)
+  def distance(self, i, j, minimum_image=False):
+    """
+    distance in angstrom of atom i and j, or array of distances
+    for index arrays i and j
+    """
+    R = np.asarray(self.R, dtype=float)
+    vectors = R[i] - R[j]
+    lattice = self._lattice(minimum_image)
+    if lattice is not None:
+      vectors = _minimumImage(vectors, lattice)
+    return np.sqrt(np.sum(vectors**2, axis=-1))
 
   # tested
   def center(self, center_coord = None):
@@ -481,7 +801,7 @@ class Molecule(object):
     ref = copy.deepcopy(self.R)
     ref[targets,:] = 0
     shift = np.kron(vector, template)
-    self.R += shift
+    self.R = self.R + shift
 
   # tested
   def align(self, u=None, **kwargs):
@@ -527,6 +847,11 @@ class Molecule(object):
     self.align(U[:,1], axis=np.array([0,1,0]))
 
   def alignSVD(self, mol, ref_list=None, tar_list=None):
+    """
+    rotate and translate self onto mol by Kabsch alignment of atoms
+    ref_list of self to atoms tar_list of mol, returns the RMSD
+    of aligned atoms
+    """
     if type(mol) is str:
       try:
         mol = qtk.Molecule(mol)
@@ -538,26 +863,9 @@ class Molecule(object):
     if not tar_list:
       tar_list = copy.deepcopy(ref_list)
 
-    lst_a = self.R[ref_list]
-    lst_b = mol.R[tar_list]
-    center_a = np.mean(lst_a, axis=0)
-    center_b = np.mean(lst_b, axis=0)
-    #na = len(lst_a)
-    na = self.N
-    #nb = len(lst_b)
-    nb = mol.N
-    crd_a = self.R - np.kron(center_a, np.ones((self.N, 1)))
-    crd_b = mol.R - np.kron(center_b, np.ones((mol.N, 1)))
-    ref_a = lst_a - np.kron(center_a, np.ones((len(lst_a), 1)))
-    ref_b = lst_b - np.kron(center_a, np.ones((len(lst_b), 1)))
-
-    H = np.dot(np.transpose(ref_a), ref_b)
-    U, s, V = np.linalg.svd(H)
-    R = np.dot(np.transpose(V), np.transpose(U))
-    self.R = np.transpose(
-      np.dot(R, np.transpose(crd_a))) + \
-      np.kron(center_b, np.ones((na, 1))
-    )
+    rmsd, R = qtk.alignRMSD(mol, self, tar_list, ref_list, align=True)
+    self.R = R[0]
+    return rmsd[0]
 
   def alignAtoms(self, ind1, ind2, ind3):
     self.center(self.R[ind1])
@@ -592,7 +900,9 @@ class Molecule(object):
     vector = self.R[vec_ind[1]] - self.R[vec_ind[0]]
     vector = vector / np.linalg.norm(vector)
     R_part = np.dot(qtk.R(angle, vector), R_part.T).T
-    self.R[targets] = R_part
+    R = np.array(self.R)
+    R[targets] = R_part
+    self.R = R
     self.shift(center)
 
   # tested
@@ -606,13 +916,13 @@ class Molecule(object):
 
   # tested
   def getCenterOfMass(self):
-    mass_list = [qtk.n2m(elem) for elem in self.type_list]
+    mass_list = qtk.n2m_array(self.type_list)
     weighted = self.R * np.array(mass_list).reshape([self.N,1])
     return np.sum(weighted, axis=0)/float(sum(mass_list))
 
   # tested
   def principalAxes(self, order='ascent', **kwargs):
-    weight = [qtk.n2m(elem) for elem in self.type_list]
+    weight = qtk.n2m_array(self.type_list)
     center = self.getCenterOfMass()
     self.center(center)
 
@@ -662,6 +972,9 @@ class Molecule(object):
   def setAtoms(self, index, **kwargs):
     if type(index) is int:
       index = [index]
+    Z_list = copy.copy(self.Z)
+    type_list = copy.copy(self.type_list)
+    string = copy.copy(self.string)
     if 'element' in kwargs or 'Z' in kwargs:
       for i in index:
         if 'element' in kwargs:
@@ -675,13 +988,16 @@ class Molecule(object):
         elif 'Z' in kwargs:
           Z = kwargs['Z']
           Zn = qtk.Z2n(Z)
-        self.Z[i] = Z
-        self.type_list[i] = Zn
+        Z_list[i] = Z
+        type_list[i] = Zn
     if 'string' in kwargs:
-      minZ = min(min(self.Z)-1, 0)
+      minZ = min(min(Z_list)-1, 0)
       for i in index:
-        self.string[i] = kwargs['string']
-        self.Z[i] = minZ
+        string[i] = kwargs['string']
+        Z_list[i] = minZ
+    self.Z = Z_list
+    self.type_list = type_list
+    self.string = string
 
   def mutateElement(self, oldZ, newZ):
     if oldZ != newZ:
@@ -772,13 +1088,15 @@ class Molecule(object):
         for i in range(len(celldm)):
           self.celldm[i] = celldm[i]
         self.box = celldm[:3]
+        R = np.array(self.R)
         for i in range(self.N):
           for j in range(3):
             if self.scale:
-              self.R[i, j] = self.R_scale[i, j] * \
-                             self.celldm[j] / float(self.scale[j])
+              R[i, j] = self.R_scale[i, j] * \
+                        self.celldm[j] / float(self.scale[j])
             else:
-              self.R[i, j] = self.R_scale[i, j] * celldm[j]
+              R[i, j] = self.R_scale[i, j] * celldm[j]
+        self.R = R
     return self.celldm
 
   def expand(self, ratio):
@@ -789,99 +1107,63 @@ class Molecule(object):
     else:
       self.R = self.R * ratio
 
+  def _supercell(self, replicas, unit):
+    """
+    fractional coordinates and atom index of all replicas, x
+    replica running fastest. Replica shifts are unit along
+    each axis, built by broadcasting
+    """
+    grid = np.mgrid[0:replicas[2], 0:replicas[1], 0:replicas[0]]
+    shifts = grid.reshape(3, -1).T[:, ::-1]
+    R_scale = np.asarray(self.R_scale, dtype=float)
+    R_scale = R_scale[np.newaxis, :, :] \
+            + (shifts * np.asarray(unit))[:, np.newaxis, :]
+    index = np.tile(np.arange(len(self.R_scale)), len(shifts))
+    return R_scale.reshape(-1, 3), index, np.repeat(shifts, self.N, 0)
+
   def extend_scale(self, ratio):
     assert len(ratio) == 3
     assert len(self.R_scale) == self.N
 
-    # type_list
-    # Z
-    # string
-
-    new = self.copy()
-    new.type_list = np.array(new.type_list)
-    new.Z = np.array(new.Z)
-    new.string = np.array(new.string)
-
-    type_new = [new.type_list]
-    Z_new = [new.Z]
-    string_new = [new.string]
+    new = self.copy(deep=False)
+    replicas = [r if r > 1 else 1 for r in ratio]
+    R_scale, index, _ = self._supercell(replicas, [1, 1, 1])
+    new.type_list = np.array(self.type_list)[index]
+    new.Z = np.array(self.Z)[index]
+    new.string = np.array(self.string)[index]
     for i in range(3):
-      r = ratio[i]
-      if r > 1:
-        base = new.R_scale.copy()
-        b_type = new.type_list.copy()
-        b_Z = new.Z.copy()
-        b_string = new.string.copy()
-        
-        new.celldm[i] = new.celldm[i] * r
-        N = len(new.R_scale)
-        step = np.zeros([N * (r - 1), 3])
-        R_scale_new = np.zeros([N * (r - 1), 3])
-        for j in range(1, r):
-          step[(j - 1) * N:j * N, i] = j
-          R_scale_new[(j - 1) * N:j * N, :] = base
-          type_new.append(b_type)
-          Z_new.append(b_Z)
-          string_new.append(b_string)
-        R_scale_new = R_scale_new + step
-        new.R_scale = np.vstack([
-          new.R_scale,
-          R_scale_new,
-        ])
-        new.type_list = np.concatenate(type_new)
-        new.Z = np.concatenate(Z_new)
-        new.string = np.concatenate(string_new)
-    new.N = len(new.R_scale)
+      new.celldm[i] = new.celldm[i] * replicas[i]
+    new.N = len(R_scale)
+    new.R_scale = R_scale / np.array(ratio, dtype=float)
     lattice = qtk.celldm2lattice(new.celldm)
-    for i in range(3):
-      new.R_scale[:,i] = new.R_scale[:,i] / ratio[i]
     new.R = qtk.scale2cart(lattice, new.R_scale)
     return new
 
-  # need to be rewritten for arbitrary cell, where!!!
   def extend(self, ratio, normalize=False, construct_R=True):
-
-    def take(data, mask):
-      return list(data[i] for i in range(len(mask)) if mask[i])
-
+    """
+    replicate molecule floor(ratio[i]) times along lattice vector
+    i, replicas of fractional coordinates beyond ratio are dropped
+    """
     assert len(ratio) == 3
     assert len(self.R_scale) == self.N
-    factor = reduce(lambda x, y: x*y, ratio)
     max_R = [ceil(i) for i in np.max(self.R_scale, axis = 0)]
+    replicas = [max(int(floor(r)), 1) for r in ratio]
+    R_scale, index, shifts = self._supercell(replicas, max_R)
+    limit = np.array(max_R) * np.array(ratio, dtype=float)
+    mask = np.all((shifts == 0) | (R_scale < limit), axis=1)
+    R_scale, index, shifts = R_scale[mask], index[mask], shifts[mask]
+
+    lattice = qtk.celldm2lattice(self.celldm)
+    self.R = np.asarray(self.R, dtype=float)[index] \
+           + np.dot(shifts, lattice)
+    self.R_scale = R_scale
+    self.N = len(index)
+    self.Z = list(np.asarray(self.Z)[index])
+    self.type_list = [str(a) for a in np.asarray(self.type_list)[index]]
+    self.string = [str(a) for a in np.asarray(self.string)[index]]
     for i in range(3):
-      M = self.N
-      R_scale = copy.deepcopy(self.R_scale)
-      R = copy.deepcopy(self.R)
-      Z = np.array(self.Z)
-      type_list = np.array(self.type_list)
-      string = np.array(self.string)
-      mask = [True for j in range(M)]
-      for r in range(int(floor(ratio[i])) - 1):
-        S = M
-        new_R_scale = copy.deepcopy(R_scale)
-        new_R = copy.deepcopy(R)
-        for j in range(len(new_R_scale)):
-          new_scale_j = new_R_scale[:, i][j] + max_R[i] * (r + 1)
-          new_Rj = new_R[:, i][j] + self.celldm[i] * (r + 1)
-          if new_scale_j < max_R[i] * ratio[i]:
-            new_R_scale[:, i][j] = new_scale_j
-            new_R[:, i][j] = new_Rj
-          else:
-            S = S - 1 
-            mask[j] = False
-        self.N = S + self.N
-        self.R_scale = np.vstack(
-                         [self.R_scale, 
-                          take(new_R_scale,mask)]
-                       )
-        self.R = np.vstack([self.R, take(new_R, mask)])
-        self.Z = list(np.hstack([self.Z, take(Z,mask)]))
-        new_list = np.hstack([self.type_list, take(type_list,mask)])
-        self.type_list = [str(a) for a in new_list]
-        new_str = np.hstack([self.string, take(string,mask)])
-        self.string = [str(s) for s in new_str]
       self.celldm[i] = self.celldm[i] * ratio[i]
-      self.scale =  [ceil(i) for i in np.max(self.R_scale, axis = 0)]
+    self.scale =  [ceil(i) for i in np.max(self.R_scale, axis = 0)]
     if normalize:
       for i in range(3):
         self.R_scale[:,i] = self.R_scale[:,i] / ratio[i]
@@ -890,9 +1172,6 @@ class Molecule(object):
       lattice = qtk.celldm2lattice(self.celldm)
       self.R = qtk.scale2cart(lattice, self.R_scale)
 
-  def copy(self):
-    return copy.deepcopy(self)
-
   # tested by qminp
   def sort(self, order = 'Zxyz', inplace=True):
     odict = {'x':0, 'y':1, 'z':2}
@@ -906,7 +1185,7 @@ class Molecule(object):
         qtk.exit("sorting order '%c' not valid" % o)
     ind = np.lexsort(tmp)
     if not inplace:
-      self = self.copy()
+      self = self.copy(deep=False)
     self.R = self.R[ind]
     if list(self.R_scale[0]):
       self.R_scale = self.R_scale[ind]
@@ -936,20 +1215,31 @@ class Molecule(object):
     self.sort(order, **kwargs)
 
   def gr(self, type1=None, type2=None, normalize=None, radial_normalization=True, **kwargs):
+    """
+    histogram of distances in the cell up to the cell diagonal.
+    periodic=True gives radial distribution function of periodic
+    molecule up to r_max by qtk.radialDistribution, already
+    normalized by shell volume and density
+    """
     if 'dr' not in kwargs:
       kwargs['dr'] = 0.005
+
     def distance_list(list1, list2):
+      # histogram of distances up to length of cell diagonal,
+      # coordinates from fractional coordinates
       assert hasattr(self, 'R_scale')
-      traj = self.R_scale.copy()
-      size_t = 1
-      size_n = self.N
-      size = self.N * 3
-      flatTraj = list(traj.reshape([size]))
+      dr = kwargs['dr']
       cell = qtk.celldm2lattice(self.celldm)
-
-      cell = cell.reshape(9).tolist()
-
-      return dl2(flatTraj, size_t, size_n, list1, list2, cell, kwargs['dr'])
+      cell_diag = np.linalg.norm(cell.sum(0))
+      size = int(ceil(cell_diag / dr))
+      R = np.dot(self.R_scale, cell)
+      g = np.zeros(size)
+      for _, _, _, d in _pairBlocks(R[list1], R2=R[list2]):
+        d = d[(d < cell_diag) & (d > 1E-5)]
+        g += np.bincount(np.floor(d / dr).astype(int),
+                         minlength=size)[:size]
+      r = dr * (np.arange(size) + 0.5)
+      return r, g
 
     def get_index(inp_type):
       if inp_type:
@@ -973,9 +1263,17 @@ class Molecule(object):
       list1 = np.arange(self.N)
       list2 = np.arange(self.N)
 
-    r, g = distance_list(list1, list2)
-    if radial_normalization:
-      g[1:] = g[1:] / (4 * np.pi * np.diff(r**3) / 3.)
+    if 'periodic' in kwargs and kwargs['periodic']:
+      r_max = None
+      if 'r_max' in kwargs:
+        r_max = kwargs['r_max']
+      r, g = qtk.radialDistribution(self.R, self._lattice(True),
+                                    list1, list2, dr=kwargs['dr'],
+                                    r_max=r_max)
+    else:
+      r, g = distance_list(list1, list2)
+      if radial_normalization:
+        g[1:] = g[1:] / (4 * np.pi * np.diff(r**3) / 3.)
     if not normalize:
       g_out, r_out = g, r
     elif normalize == 'tail':
@@ -992,6 +1290,8 @@ class Molecule(object):
   def read(self, name, **kwargs):
     if os.path.exists(name):
       stem, extension = os.path.splitext(name)
+      if extension in ['.gz', '.bz2']:
+        stem, extension = os.path.splitext(stem)
       if re.match('\.xyz', extension):
         self.read_xyz(name, **kwargs)
       elif re.match('\.ascii', extension):
@@ -1013,7 +1313,14 @@ class Molecule(object):
       qtk.exit("file: '" + name + "' not found")
 
   def read_xyz(self, name, **kwargs):
-    xyz = open(name, 'r')
+    if 'frame' in kwargs:
+      # single frame of multi-frame file through frame index
+      mol = next(qtk.readXYZ(name, frames=[kwargs['frame']]))
+      for attr in ['N', 'type_list', 'Z', 'R', 'prop_list']:
+        setattr(self, attr, getattr(mol, attr))
+      return
+
+    xyz = qtk.openXYZ(name)
     content = xyz.readlines()
     xyz.close()
     content = [line.replace('\t', ' ') for line in content]
@@ -1090,8 +1397,7 @@ class Molecule(object):
              for entry in coord_list]
     type_list = list(np.array(coord)[:,0])
     self.type_list = [str(elem) for elem in type_list]
-    self.Z = [qtk.n2Z(elem) for elem in self.type_list]
-    self.Z = np.array(self.Z)
+    self.Z = qtk.n2Z_array(self.type_list)
     self.R = np.array(coord)[:,1:4].astype(float)
 
     self.box = False
@@ -1265,10 +1571,7 @@ class Molecule(object):
 
     def connect(molecule, shift, connection):
       molecule.findBonds(quiet=True)
-      for i in molecule.bonds.iterkeys():
-        bond = molecule.bonds[i]
-        ai = bond['index_begin'] + shift
-        aj = bond['index_end'] + shift
+      for ai, aj in molecule.bond_index + shift:
         connection = connection +\
           "%-6s%4d %4d\n" % ('CONECT', ai, aj)
       return connection
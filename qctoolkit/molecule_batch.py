@@ -0,0 +1,338 @@
+import numpy as np
+import qctoolkit as qtk
+import copy
+
+def _mass(Z):
+  """atomic mass array of nuclear charge array Z"""
+  return qtk.n2m_array(qtk.Z2n_array(Z))
+
+class MoleculeBatch(object):
+  """
+  structure-of-arrays container of many molecules
+
+  Coordinates and nuclear charges of all molecules are stored
+  contiguously in a ragged layout, molecule i owns atoms
+  offset[i]:offset[i+1]. Per-molecule properties are arrays of
+  length M. Molecule objects are only created on item access.
+
+  args:
+    molecules(list), list of qtk.Molecule
+    R(np.array), coordinates, either (sum(N), 3) together with N,
+                 or padded (M, max(N), 3)
+    Z(np.array), nuclear charges, (sum(N),) or padded (M, max(N))
+    N(list), number of atoms of each molecule,
+             default all atoms of padded input
+    charge(list), multiplicity(list),
+    celldm(np.array), (M, 6), nan for non-periodic molecules
+    name(list), molecule names
+    properties(dict), per-molecule arrays of length M, e.g. energy
+    atom_properties(dict), per-atom arrays of length sum(N),
+                           e.g. forces
+
+  attributes:
+    M(int), number of molecules
+    R, Z, N, offset, charge, multiplicity, celldm, name,
+    properties, atom_properties
+
+  methods:
+    batch[i] --- materialized qtk.Molecule
+    batch[i:j], batch[index_list] --- MoleculeBatch, slices of
+                                      consecutive molecules share
+                                      arrays with batch
+    positions(i) --- coordinate view of molecule i
+    padded(fill=0) --- padded arrays R, Z and atom mask
+    batch versions of Molecule methods, returning one entry
+    per molecule: center, align, getCenter, getCenterOfMass,
+    getCenterOfCharge, nuclear_repulsion, stoichiometry
+
+  Example:
+    batch = qtk.MoleculeBatch([qtk.Molecule(f) for f in xyz_files])
+    batch.center()
+    E_nn = batch.nuclear_repulsion()
+    mol = batch[3]
+  """
+  def __init__(self, molecules=None, **kwargs):
+    if molecules is not None:
+      molecules = list(molecules)
+      N = [int(mol.N) for mol in molecules]
+      if molecules:
+        R = np.vstack([np.asarray(mol.R, dtype=float).reshape(-1, 3)
+                       for mol in molecules])
+        Z = np.concatenate([np.asarray(mol.Z, dtype=float)
+                            for mol in molecules])
+      else:
+        R, Z = np.zeros([0, 3]), np.zeros(0)
+      charge = [mol.charge for mol in molecules]
+      multiplicity = [mol.multiplicity for mol in molecules]
+      celldm = [mol.celldm if mol.periodic else [np.nan] * 6
+                for mol in molecules]
+      name = [mol.name for mol in molecules]
+    else:
+      if 'R' not in kwargs or 'Z' not in kwargs:
+        qtk.exit("MoleculeBatch requires molecules or R and Z")
+      R = np.asarray(kwargs['R'], dtype=float)
+      Z = np.asarray(kwargs['Z'], dtype=float)
+      if R.ndim == 3:
+        if 'N' in kwargs:
+          N = np.asarray(kwargs['N'], dtype=int)
+        else:
+          N = np.ones(R.shape[0], dtype=int) * R.shape[1]
+        mask = np.arange(R.shape[1]) < N[:, np.newaxis]
+        R, Z = R[mask], Z[mask]
+      elif 'N' in kwargs:
+        N = kwargs['N']
+      else:
+        N = [len(Z)]
+      M = len(N)
+      if 'charge' in kwargs:
+        charge = kwargs['charge']
+      else:
+        charge = np.zeros(M, dtype=int)
+      if 'multiplicity' in kwargs:
+        multiplicity = kwargs['multiplicity']
+      else:
+        multiplicity = np.ones(M, dtype=int)
+      if 'celldm' in kwargs:
+        celldm = kwargs['celldm']
+      else:
+        celldm = np.nan * np.ones([M, 6])
+      if 'name' in kwargs:
+        name = kwargs['name']
+      else:
+        name = ['' for _ in range(M)]
+
+    self.N = np.asarray(N, dtype=int)
+    self.M = len(self.N)
+    self.offset = np.zeros(self.M + 1, dtype=int)
+    self.offset[1:] = np.cumsum(self.N)
+    self.R = np.ascontiguousarray(R, dtype=float).reshape(-1, 3)
+    self.Z = np.ascontiguousarray(Z, dtype=float)
+    if len(self.R) != self.offset[-1] or len(self.Z) != self.offset[-1]:
+      qtk.exit("MoleculeBatch: R, Z and N do not match")
+    self.charge = np.asarray(charge)
+    self.multiplicity = np.asarray(multiplicity, dtype=int)
+    self.celldm = np.asarray(celldm, dtype=float).reshape(self.M, 6)
+    if isinstance(name, np.ndarray):
+      # e.g. memory-mapped names of saved dataset
+      self.name = name
+    else:
+      self.name = list(name)
+    self.properties = {}
+    self.atom_properties = {}
+    if 'properties' in kwargs:
+      for key, value in kwargs['properties'].iteritems():
+        self.properties[key] = np.asarray(value)
+    if 'atom_properties' in kwargs:
+      for key, value in kwargs['atom_properties'].iteritems():
+        self.atom_properties[key] = np.asarray(value)
+    for key, value in self.properties.iteritems():
+      if len(value) != self.M:
+        qtk.exit("MoleculeBatch: property %s has wrong length" % key)
+    for key, value in self.atom_properties.iteritems():
+      if len(value) != len(self.Z):
+        qtk.exit("MoleculeBatch: atom property %s has wrong length" % key)
+
+  def __repr__(self):
+    return "MoleculeBatch(M=%d, atoms=%d)" % (self.M, len(self.Z))
+
+  def __len__(self):
+    return self.M
+
+  def __iter__(self):
+    for i in range(self.M):
+      yield self[i]
+
+  def __getitem__(self, key):
+    if isinstance(key, (int, np.integer)):
+      return self.molecule(key)
+    index = np.arange(self.M)[key]
+    if isinstance(key, slice) and (key.step is None or key.step == 1):
+      # consecutive molecules, share arrays
+      out = copy.copy(self)
+      s = slice(self.offset[index[0]] if len(index) else 0,
+                self.offset[index[-1] + 1] if len(index) else 0)
+      out.R = self.R[s]
+      out.Z = self.Z[s]
+      out.atom_properties = dict([(k, v[s]) for k, v
+                                  in self.atom_properties.iteritems()])
+    else:
+      out = copy.copy(self)
+      atoms = self._atoms(index)
+      out.R = self.R[atoms]
+      out.Z = self.Z[atoms]
+      out.atom_properties = dict([(k, v[atoms]) for k, v
+                                  in self.atom_properties.iteritems()])
+    out.N = self.N[index]
+    out.M = len(index)
+    out.offset = np.zeros(out.M + 1, dtype=int)
+    out.offset[1:] = np.cumsum(out.N)
+    out.charge = self.charge[index]
+    out.multiplicity = self.multiplicity[index]
+    out.celldm = self.celldm[index]
+    out.name = [self.name[i] for i in index]
+    out.properties = dict([(k, v[index]) for k, v
+                           in self.properties.iteritems()])
+    return out
+
+  def _atoms(self, index):
+    """atom indices of molecules in index"""
+    if len(index) == 0:
+      return np.zeros(0, dtype=int)
+    return np.concatenate([np.arange(self.offset[i], self.offset[i+1])
+                           for i in index])
+
+  def _molecule_id(self):
+    """molecule index of each atom"""
+    return np.repeat(np.arange(self.M), self.N)
+
+  def _sum(self, data):
+    """sum of per-atom data over each molecule"""
+    molecule_id = self._molecule_id()
+    flat = data.reshape(len(data), int(np.prod(data.shape[1:])))
+    out = np.zeros([self.M, flat.shape[1]])
+    for k in range(flat.shape[1]):
+      out[:, k] = np.bincount(molecule_id, weights=flat[:, k],
+                              minlength=self.M)
+    return out.reshape((self.M,) + data.shape[1:])
+
+  def positions(self, i):
+    """coordinate view of molecule i"""
+    return self.R[self.offset[i]:self.offset[i+1]]
+
+  def molecule(self, i):
+    """qtk.Molecule of entry i, coordinates are copied"""
+    if i < 0:
+      i = i + self.M
+    if i < 0 or i >= self.M:
+      raise IndexError("molecule index %d out of range" % i)
+    s = slice(self.offset[i], self.offset[i+1])
+    mol = qtk.Molecule()
+    mol.N = int(self.N[i])
+    mol.R = self.R[s].copy()
+    mol.Z = self.Z[s].copy()
+    mol.type_list = qtk.Z2n_array(mol.Z).tolist()
+    mol.string = ['' for _ in range(mol.N)]
+    mol.charge = self.charge[i].item()
+    mol.multiplicity = int(self.multiplicity[i])
+    if not np.isnan(self.celldm[i]).any():
+      mol.periodic = True
+      mol.celldm = self.celldm[i].tolist()
+      mol.R_scale = qtk.xyz2fractional(mol.R, mol.celldm)
+    name = self.name[i]
+    if not isinstance(name, unicode):
+      name = str(name).decode('utf-8')
+    mol.name = name
+    return mol
+
+  def padded(self, fill=0.):
+    """
+    return padded coordinates (M, max(N), 3),
+    nuclear charges (M, max(N)) and boolean atom mask
+    """
+    n_max = self.N.max() if self.M > 0 else 0
+    mask = np.arange(n_max) < self.N[:, np.newaxis]
+    R = np.ones([self.M, n_max, 3]) * fill
+    Z = np.zeros([self.M, n_max])
+    R[mask] = self.R
+    Z[mask] = self.Z
+    return R, Z, mask
+
+  def getCenter(self):
+    return self._sum(self.R) / self.N[:, np.newaxis]
+
+  def getCenterOfCharge(self):
+    weighted = self._sum(self.R * self.Z[:, np.newaxis])
+    return weighted / self._sum(self.Z)[:, np.newaxis]
+
+  def getCenterOfMass(self):
+    mass = _mass(self.Z)
+    weighted = self._sum(self.R * mass[:, np.newaxis])
+    return weighted / self._sum(mass)[:, np.newaxis]
+
+  def center(self, center_coord=None):
+    """shift each molecule by its center of mass or center_coord"""
+    if center_coord is None:
+      center_coord = self.getCenterOfMass()
+    center_coord = np.asarray(center_coord, dtype=float)
+    if center_coord.shape == (3,):
+      self.R -= center_coord
+    else:
+      self.R -= np.repeat(center_coord, self.N, axis=0)
+
+  def principalAxes(self):
+    """
+    eigenvalues (M, 3) and eigenvectors (M, 3, 3) of the
+    moment of inertia tensors with respect to center of mass
+    """
+    mass = _mass(self.Z)
+    R = self.R - np.repeat(self.getCenterOfMass(), self.N, axis=0)
+    outer = R[:, :, np.newaxis] * R[:, np.newaxis, :]
+    second = self._sum(outer * mass[:, np.newaxis, np.newaxis])
+    trace = np.trace(second, axis1=1, axis2=2)
+    inertia = trace[:, np.newaxis, np.newaxis] * np.eye(3) - second
+    return np.linalg.eigh(inertia)
+
+  def align(self):
+    """
+    center molecules at center of mass and rotate principal axes
+    of smallest and second smallest moment of inertia to x and y,
+    as Molecule.align(). Sign of the axes are fixed by positive
+    x component of the first, and positive y component of the
+    second axis in the original frame. Molecule.align() takes the
+    sign of the second axis from eigh after the first rotation,
+    which follows round-off, results can differ by a rotation of
+    180 degrees about x
+    """
+    self.center()
+    _, U = self.principalAxes()
+    e1 = U[:, :, 0] * np.where(U[:, 0, 0] > 0, 1., -1.)[:, np.newaxis]
+    e2 = U[:, :, 1] * np.where(U[:, 1, 1] >= 0, 1., -1.)[:, np.newaxis]
+    rotation = np.stack([e1, e2, np.cross(e1, e2)], axis=1)
+    rotation = np.repeat(rotation, self.N, axis=0)
+    self.R = np.einsum('aij,aj->ai', rotation, self.R)
+
+  def nuclear_repulsion(self, chunk_size=4000000):
+    """
+    nuclear repulsion energies in hartree, computed for molecules
+    of the same size together, chunk_size limits the number of
+    pair distances held in memory
+    """
+    out = np.zeros(self.M)
+    for n in np.unique(self.N):
+      if n < 2:
+        continue
+      members = np.where(self.N == n)[0]
+      i, j = np.triu_indices(n, 1)
+      step = max(1, chunk_size // len(i))
+      for start in range(0, len(members), step):
+        m = members[start:start + step]
+        atoms = self._atoms(m)
+        Rm = self.R[atoms].reshape(-1, n, 3)
+        Zm = self.Z[atoms].reshape(-1, n)
+        d = np.linalg.norm(Rm[:, i] - Rm[:, j], axis=2) * 1.8897261245650618
+        out[m] = np.sum(Zm[:, i] * Zm[:, j] / d, axis=1)
+    return out
+
+  def stoichiometry(self, output='string'):
+    """list of stoichiometry of each molecule, see Molecule"""
+    elements, inverse = np.unique(self.Z, return_inverse=True)
+    count = np.zeros([self.M, len(elements)], dtype=int)
+    np.add.at(count, (self._molecule_id(), inverse), 1)
+    names = [qtk.Z2n(z) for z in elements]
+    formula = {}
+    out = []
+    for row in count:
+      key = row.tostring()
+      if key not in formula:
+        if output == 'dictionary' or output == 'count':
+          formula[key] = dict([(names[k], row[k])
+                               for k in np.nonzero(row)[0]])
+        else:
+          formula[key] = ''.join([names[k] + \
+                                 (str(row[k]) if row[k] > 1 else '')
+                                 for k in np.nonzero(row)[0]])
+      value = formula[key]
+      if type(value) is dict:
+        value = dict(value)
+      out.append(value)
+    return out
@@ -23,6 +23,14 @@ box_margin = 3     # for planewave box setup
 mpistr = 'mpirun -np'
 mpi_flags = []
 
+# QM result cache, see QM/qmcache.py
+qm_cache = False  # use cache for all QMInp.run calls
+qm_cache_dir = os.path.join(os.path.expanduser('~'), '.qctoolkit', 'qmcache')
+qm_cache_size = 1.0  # cache size limit in GB
+
+# abort QM jobs on errors in running output, see QM/monitor.py
+qm_monitor = False
+
 # QM executables
 libgbasis = '/home/samio/src/science/nwchem-6.6/src/basis/libraries'
 # default setup for qm jobs
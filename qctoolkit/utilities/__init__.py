@@ -3,5 +3,8 @@ from element_tool import *
 from parallizer import *
 from processing_str import *
 from tools import *
+from xyz_io import *
+from dataset_io import *
+from alignment import *
 from submit import *
 import rdkit_tools as rdk
@@ -0,0 +1,195 @@
+import qctoolkit as qtk
+import numpy as np
+
+def _coordinates(data, index=None):
+  """
+  coordinates (M, n, 3) of molecule, list of molecules, MoleculeBatch
+  or coordinate array, atoms selected by index of shape (n,) for all
+  structures or (M, n) for each structure
+  """
+  if isinstance(data, qtk.Molecule):
+    R = np.asarray(data.R, dtype=float)[np.newaxis]
+  elif isinstance(data, qtk.MoleculeBatch):
+    if len(set(data.N)) > 1:
+      qtk.exit("structures of different number of atoms")
+    R = np.asarray(data.R).reshape(data.M, -1, 3)
+  elif len(data) > 0 and isinstance(data[0], qtk.Molecule):
+    if len(set([mol.N for mol in data])) > 1:
+      qtk.exit("structures of different number of atoms")
+    R = np.stack([np.asarray(mol.R, dtype=float) for mol in data])
+  else:
+    R = np.asarray(data, dtype=float)
+    if R.ndim == 2:
+      R = R[np.newaxis]
+  if index is not None:
+    index = np.asarray(index, dtype=int)
+    if index.ndim == 1:
+      R = R[:, index]
+    else:
+      R = R[np.arange(len(R))[:, np.newaxis], index]
+  return R
+
+def _covariance(P, Q):
+  """covariance matrices P_i^T Q_j (len(P), len(Q), 3, 3) by one GEMM"""
+  b, n, _ = P.shape
+  m = len(Q)
+  H = np.dot(P.transpose(0, 2, 1).reshape(b * 3, n),
+             Q.transpose(1, 0, 2).reshape(n, m * 3))
+  return H.reshape(b, 3, m, 3).transpose(0, 2, 1, 3)
+
+def _kabsch(H, rotation=True):
+  """
+  stacked SVD of covariances H (..., 3, 3), return rotations and
+  sum of singular values, both corrected to exclude reflections
+  """
+  U, s, Vt = np.linalg.svd(H)
+  d = np.where(np.linalg.det(U) * np.linalg.det(Vt) < 0, -1., 1.)
+  s[..., 2] *= d
+  if not rotation:
+    return None, s.sum(axis=-1)
+  U[..., :, 2] *= d[..., np.newaxis]
+  return np.matmul(U, Vt), s.sum(axis=-1)
+
+def kabsch(P, Q):
+  """
+  optimal rotations of centered coordinates P onto Q, both of shape
+  (..., n, 3), such that P.dot(rotation) ~ Q. Reflections are
+  excluded
+  """
+  P = np.asarray(P, dtype=float)
+  Q = np.asarray(Q, dtype=float)
+  return _kabsch(np.matmul(np.swapaxes(P, -1, -2), Q))[0]
+
+def _msdRoot(norm, s, n):
+  """
+  RMSD from summed squared norms and singular values, differences
+  at round-off level of the norms are zero
+  """
+  msd = norm - 2 * s
+  msd[msd < 1E-13 * norm] = 0
+  return np.sqrt(msd / n)
+
+def _rmsd(H, norm_P, norm_Q, n):
+  _, s = _kabsch(H, rotation=False)
+  return _msdRoot(norm_P[:, np.newaxis] + norm_Q[np.newaxis, :], s, n)
+
+def alignRMSD(ref, targets, ref_list=None, tar_list=None, **kwargs):
+  """
+  RMSD of each target to ref after optimal superposition
+
+  args:
+    ref, qtk.Molecule or coordinates (N, 3)
+    targets, qtk.Molecule, list of molecules, MoleculeBatch or
+             coordinates (M, N, 3)
+    ref_list(list), atoms of ref used for alignment, default all
+    tar_list(list), atoms of targets matching ref_list, (n,) for
+                    all targets or (M, n) for each target,
+                    default ref_list
+  kwargs:
+    align(bool), also return all target atoms aligned onto ref
+    block_size(int), number of targets per block, default 65536
+
+  Example:
+    rmsd = qtk.alignRMSD(mols[0], mols)
+    rmsd, R_aligned = qtk.alignRMSD(mols[0], mols, align=True)
+  """
+  if tar_list is None:
+    tar_list = ref_list
+  P = _coordinates(ref, ref_list)[0]
+  R = _coordinates(targets)
+  Q = _coordinates(R, tar_list)
+  if len(P) != Q.shape[1]:
+    qtk.exit("different number of atoms for alignment")
+  block_size = 65536
+  if 'block_size' in kwargs:
+    block_size = kwargs['block_size']
+  align = 'align' in kwargs and kwargs['align']
+
+  center_P = P.mean(axis=0)
+  P = P - center_P
+  norm_P = np.array([np.sum(P**2)])
+  rmsd = np.zeros(len(Q))
+  if align:
+    aligned = np.empty(R.shape)
+  for start in range(0, len(Q), block_size):
+    s = slice(start, min(start + block_size, len(Q)))
+    center_Q = Q[s].mean(axis=1)
+    Qs = Q[s] - center_Q[:, np.newaxis]
+    H = np.matmul(np.swapaxes(Qs, 1, 2), P)
+    rotation, sv = _kabsch(H, align)
+    rmsd[s] = _msdRoot(norm_P + np.sum(Qs**2, axis=(1, 2)), sv, len(P))
+    if align:
+      aligned[s] = np.matmul(R[s] - center_Q[:, np.newaxis], rotation)\
+                   + center_P
+  if align:
+    return rmsd, aligned
+  return rmsd
+
+def _rmsdRows(Q, norm_Q, start, stop, block_size):
+  """
+  rows start:stop of RMSD matrix, columns from start on, lower
+  triangle zero. Covariances of each block of at most block_size
+  pairs come from one GEMM
+  """
+  rows = stop - start
+  cols = max(1, block_size // rows)
+  out = np.zeros([rows, len(Q) - start])
+  for j in range(start, len(Q), cols):
+    k = min(j + cols, len(Q))
+    H = _covariance(Q[start:stop], Q[j:k])
+    out[:, j - start:k - start] = _rmsd(
+      H, norm_Q[start:stop], norm_Q[j:k], Q.shape[1])
+  return np.triu(out, 1)
+
+def rmsdMatrix(structures, tar_list=None, **kwargs):
+  """
+  all pairs RMSD matrix (M, M) after optimal superposition, computed
+  on row blocks of the upper triangle by stacked 3x3 SVDs
+
+  args:
+    structures, list of molecules, MoleculeBatch or
+                coordinates (M, N, 3)
+    tar_list(list), atoms used for alignment, (n,) for all or
+                    (M, n) for each structure, default all
+  kwargs:
+    block_size(int), number of pairs per block, default 65536,
+                     bounds the memory footprint
+    threads(int), number of forked processes for row blocks,
+                  default 1
+
+  Example:
+    D = qtk.rmsdMatrix(qtk.Molecules('conformers.xyz'), threads=4)
+  """
+  Q = _coordinates(structures, tar_list)
+  Q = Q - Q.mean(axis=1)[:, np.newaxis]
+  norm_Q = np.sum(Q**2, axis=(1, 2))
+  M = len(Q)
+  block_size = 65536
+  if 'block_size' in kwargs:
+    block_size = kwargs['block_size']
+  threads = 1
+  if 'threads' in kwargs:
+    threads = kwargs['threads']
+
+  # row blocks of similar number of pairs
+  rows = max(1, block_size // max(M, 1))
+  if threads > 1:
+    rows = min(rows, max(1, M // (threads * 4)))
+  blocks = [[start, min(start + rows, M)] for start in range(0, M, rows)]
+  if threads > 1:
+    # forked workers share Q without pickling
+    def rowBlock(start, stop):
+      return _rmsdRows(Q, norm_Q, start, stop, block_size)
+    out = qtk.parallelize(rowBlock, blocks, threads=threads, block_size=1)
+    for block in out:
+      if isinstance(block, qtk.TaskFailure):
+        qtk.exit("rmsdMatrix failed: %s" % str(block))
+  else:
+    out = [_rmsdRows(Q, norm_Q, start, stop, block_size)
+           for start, stop in blocks]
+
+  D = np.zeros([M, M])
+  for (start, stop), block in zip(blocks, out):
+    D[start:stop, start:] = block
+  D = np.triu(D, 1)
+  return D + D.T
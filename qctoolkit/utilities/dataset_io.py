@@ -0,0 +1,149 @@
+import qctoolkit as qtk
+import numpy as np
+import json
+import struct
+import os
+
+# file layout: magic, header length (uint64), json header of columns,
+# raw little endian column data aligned to _align bytes
+_magic = 'QTKDATA1'
+_align = 64
+
+def _toBatch(data):
+  """MoleculeBatch of Molecule, list of molecules or of batches"""
+  if isinstance(data, qtk.MoleculeBatch):
+    return data
+  if isinstance(data, qtk.Molecule):
+    return qtk.MoleculeBatch([data])
+  data = list(data)
+  if data and all([isinstance(d, qtk.MoleculeBatch) for d in data]):
+    for attr in ['properties', 'atom_properties']:
+      keys = sorted(getattr(data[0], attr))
+      for d in data[1:]:
+        if sorted(getattr(d, attr)) != keys:
+          qtk.exit("batches have different %s: %s and %s"
+                   % (attr, keys, sorted(getattr(d, attr))))
+    columns = ['R', 'Z', 'N', 'charge', 'multiplicity', 'celldm']
+    kwargs = dict([(c, np.concatenate([getattr(d, c) for d in data]))
+                   for c in columns])
+    kwargs['name'] = [n for d in data for n in d.name]
+    kwargs['properties'] = dict([
+      (k, np.concatenate([d.properties[k] for d in data]))
+      for k in data[0].properties])
+    kwargs['atom_properties'] = dict([
+      (k, np.concatenate([d.atom_properties[k] for d in data]))
+      for k in data[0].atom_properties])
+    return qtk.MoleculeBatch(**kwargs)
+  return qtk.MoleculeBatch(data)
+
+def saveDataset(file_name, data, **kwargs):
+  """
+  write molecules column-wise to binary dataset file, which is
+  opened memory-mapped by loadDataset
+
+  args:
+    data, qtk.Molecule, list of molecules, MoleculeBatch or list of
+          MoleculeBatch, e.g. readXYZ(..., batch_size=10000)
+  kwargs:
+    properties(dict), per-molecule arrays, e.g. energy
+    atom_properties(dict), per-atom arrays, e.g. forces
+  """
+  batch = _toBatch(data)
+  properties = dict(batch.properties)
+  atom_properties = dict(batch.atom_properties)
+  if 'properties' in kwargs:
+    properties.update(kwargs['properties'])
+  if 'atom_properties' in kwargs:
+    atom_properties.update(kwargs['atom_properties'])
+
+  # utf-8 encoded, decoded by MoleculeBatch.molecule
+  names = np.array([n.encode('utf-8') if isinstance(n, unicode)
+                    else str(n) for n in batch.name])
+  if names.size == 0:
+    names = names.astype('S1')
+  arrays = [
+    ('R', batch.R), ('Z', batch.Z), ('offset', batch.offset),
+    ('charge', batch.charge),
+    ('multiplicity', batch.multiplicity), ('celldm', batch.celldm),
+    ('name', names),
+  ]
+  for key, value in sorted(properties.iteritems()):
+    value = np.asarray(value)
+    if len(value) != batch.M:
+      qtk.exit("property %s has wrong length" % key)
+    arrays.append(('property/' + key, value))
+  for key, value in sorted(atom_properties.iteritems()):
+    value = np.asarray(value)
+    if len(value) != len(batch.Z):
+      qtk.exit("atom property %s has wrong length" % key)
+    arrays.append(('atom_property/' + key, value))
+
+  columns = {}
+  position = 0
+  for key, value in arrays:
+    value = np.ascontiguousarray(value)
+    if value.dtype.kind == 'O':
+      qtk.exit("column %s of object type can not be saved" % key)
+    columns[key] = {
+      'dtype': value.dtype.newbyteorder('<').str,
+      'shape': list(value.shape),
+      'offset': position,
+    }
+    position += -(-value.nbytes // _align) * _align
+  header = json.dumps({'version': 1, 'M': batch.M, 'columns': columns})
+  start = -(-(len(_magic) + 8 + len(header)) // _align) * _align
+  header = header + ' ' * (start - len(_magic) - 8 - len(header))
+
+  tmp_name = '%s.%d.tmp' % (file_name, os.getpid())
+  with open(tmp_name, 'wb') as out:
+    out.write(_magic)
+    out.write(struct.pack('<Q', len(header)))
+    out.write(header)
+    for key, value in arrays:
+      out.seek(start + columns[key]['offset'])
+      out.write(np.ascontiguousarray(value,
+                dtype=np.dtype(columns[key]['dtype'])).tostring())
+    out.truncate(start + position)
+  os.rename(tmp_name, file_name)
+
+def loadDataset(file_name, mmap_mode='r'):
+  """
+  MoleculeBatch of binary dataset file of saveDataset. All columns
+  are memory-mapped without copy, molecules are read on access
+  by index, e.g. loadDataset(name)[812345]
+
+  args:
+    mmap_mode, numpy memory-map mode, 'r' for read-only, 'c' for
+               copy-on-write changes in memory, 'r+' to write back
+  """
+  with open(file_name, 'rb') as data:
+    if data.read(len(_magic)) != _magic:
+      qtk.exit("%s is not a qctoolkit dataset" % file_name)
+    size = struct.unpack('<Q', data.read(8))[0]
+    header = json.loads(data.read(size))
+  start = len(_magic) + 8 + size
+
+  arrays = {}
+  for key, column in header['columns'].iteritems():
+    dtype = np.dtype(str(column['dtype']))
+    shape = tuple(column['shape'])
+    if int(np.prod(shape)) == 0:
+      arrays[key] = np.zeros(shape, dtype=dtype)
+    else:
+      arrays[key] = np.memmap(file_name, dtype=dtype, mode=mmap_mode,
+                              offset=start + column['offset'],
+                              shape=shape)
+
+  properties = {}
+  atom_properties = {}
+  for key, value in arrays.iteritems():
+    if key.startswith('property/'):
+      properties[key[len('property/'):]] = value
+    elif key.startswith('atom_property/'):
+      atom_properties[key[len('atom_property/'):]] = value
+  return qtk.MoleculeBatch(
+    R=arrays['R'], Z=arrays['Z'], N=np.diff(arrays['offset']),
+    charge=arrays['charge'], multiplicity=arrays['multiplicity'],
+    celldm=arrays['celldm'], name=arrays['name'],
+    properties=properties, atom_properties=atom_properties,
+  )
@@ -12,6 +12,33 @@ z_list = qel.Elements.z_list()
 type_list = qel.Elements.type_list()
 mass_list = qel.Elements.mass_list()
 
+# results of element labels, e.g. 'C1' or 'H_pp', filled on first
+# use of each label
+_n2Z_cache = {}
+_n2ve_cache = {}
+_n2m_cache = {}
+# element symbol of nuclear charge, 'X' for undefined charges
+_symbol_table = np.array(['X'] * (max(type_list) + 1), dtype=object)
+for _Z, _symbol in type_list.iteritems():
+  _symbol_table[_Z] = _symbol
+
+def _match(Zn, table):
+  """longest key of table contained in label Zn, None if not found"""
+  if Zn in table:
+    return Zn
+  match = [m for m in table.iterkeys() if m in Zn]
+  if len(match) > 0:
+    return match[np.argmax([len(m) for m in match])]
+
+def _labelArray(labels, lookup):
+  """lookup of each distinct label in array of labels"""
+  labels = np.asarray(labels)
+  if labels.size == 0:
+    return np.zeros(labels.shape)
+  names, inverse = np.unique(labels, return_inverse=True)
+  values = np.array([lookup(str(n)) for n in names], dtype=float)
+  return values[inverse].reshape(labels.shape)
+
 def e2ve(e):
   pattern = re.compile('\d[spdf]')
   ve = 0
@@ -48,29 +75,25 @@ def e2ve(e):
   return ve
 
 def n2ve(Zn):
+  if Zn in _n2ve_cache:
+    return _n2ve_cache[Zn]
   ref = re.sub('2[a-zA-Z].*','',Zn)
   tar = re.sub('.*[a-zA-Z]2','',Zn)
   tar = re.sub('_.*','',tar)
   # WARNING! symbol V is used for 
-  match = [m for m in ve_list.iterkeys() if m in Zn]
-  match_tar = [m for m in ve_list.iterkeys() if m in tar]
-  match_ref = [m for m in ve_list.iterkeys() if m in ref]
-  mlen = [len(s) for s in match]
-  rlen = [len(s) for s in match_ref]
-  tlen = [len(s) for s in match_tar]
-  if len(match) > 0:
-    ind = np.argmax(mlen)
-    return ve_list[match[ind]]
-  elif len(match_ref) > 0:
-    ind = np.argmax(rlen)
-    return ve_list[match_ref[ind]]
-  elif len(match_tar) > 0:
-    ind = np.argmax(tlen)
-    return ve_list[match_tar[ind]]
-  else:
-    qtk.exit("n2ve: element type " + Zn + " is not defined")
+  for label in [Zn, ref, tar]:
+    match = _match(label, ve_list)
+    if match is not None:
+      _n2ve_cache[Zn] = ve_list[match]
+      return ve_list[match]
+  qtk.exit("n2ve: element type " + Zn + " is not defined")
 
 def Z2n(Z):
+  try:
+    if Z in type_list:
+      return type_list[Z]
+  except TypeError:
+    pass
   try: 
     Z = np.round(Z).astype(int)
     if type_list.has_key(Z):
@@ -81,35 +104,58 @@ def Z2n(Z):
     msg = "Z2n: atomic number " + str(Z) + " is not defined."
     qtk.warning(msg)
     return str(Z)
-  
+
+def n2Z0(Zn):
+  if Zn not in _n2Z_cache:
+    match = _match(Zn, z_list)
+    if match is None:
+      _n2Z_cache[Zn] = None
+    else:
+      _n2Z_cache[Zn] = float(z_list[match])
+  if _n2Z_cache[Zn] is None:
+    return 0
+  return _n2Z_cache[Zn]
+
 def n2Z(Zn):
-  match = [m for m in z_list.iterkeys() if m in Zn]
-  mlen = [len(s) for s in match]
-  if len(match) > 0:
-    ind = np.argmax(mlen)
-    return float(z_list[match[ind]])
-  else:
+  Z = n2Z0(Zn)
+  if _n2Z_cache[Zn] is None:
     qtk.warning("n2Z: element type " + str(Zn) +\
                 " is not defined, returning nuclear charge 0")
-    return 0
+  return Z
 
-def n2Z0(Zn):
-  match = [m for m in z_list.iterkeys() if m in Zn]
-  mlen = [len(s) for s in match]
-  if len(match) > 0:
-    ind = np.argmax(mlen)
-    return float(z_list[match[ind]])
-  else:
-    return 0
-  
 def n2m(Zn):
-  match = [m for m in mass_list.iterkeys() if m in Zn]
-  mlen = [len(s) for s in match]
-  if len(match) > 0:
-    ind = np.argmax(mlen)
-    return float(mass_list[match[ind]])
-  else:
-    qtk.exit("n2Z: element type " + str(Zn) + " is not defined")
+  if Zn not in _n2m_cache:
+    match = _match(Zn, mass_list)
+    if match is None:
+      qtk.exit("n2Z: element type " + str(Zn) + " is not defined")
+    _n2m_cache[Zn] = float(mass_list[match])
+  return _n2m_cache[Zn]
+
+def n2Z_array(labels):
+  """
+  nuclear charges of array of element labels, each distinct label
+  is looked up once
+
+  Example:
+    Z = qtk.n2Z_array(['C', 'H1', 'H_pp', 'O'])
+  """
+  return _labelArray(labels, n2Z)
+
+def n2ve_array(labels):
+  """valence electrons of array of element labels"""
+  return _labelArray(labels, n2ve)
+
+def n2m_array(labels):
+  """atomic masses of array of element labels"""
+  return _labelArray(labels, n2m)
+
+def Z2n_array(Z):
+  """element symbols of array of nuclear charges"""
+  Z = np.round(np.asarray(Z, dtype=float)).astype(int)
+  out = np.array(['X'] * Z.size, dtype=object).reshape(Z.shape)
+  defined = (Z >= 0) & (Z < len(_symbol_table))
+  out[defined] = _symbol_table[Z[defined]]
+  return out.astype(str)
 
 def qAtomName(query):
   if type(query) == str:
@@ -0,0 +1,193 @@
+import qctoolkit as qtk
+import numpy as np
+import socket
+import fcntl
+import json
+import time
+import os
+
+class JobJournal(object):
+  """
+  append-only record of job states under a root folder
+
+  Each line of the journal file is a json record of
+    name, state, output, host, pid, time
+  the latest record of a job name defines its state:
+    'written': input written by qmWriteAll
+    'running': claimed by a process
+    'finished': done with valid output, path relative to root
+    'failed': done without valid output
+
+  All reads and writes are done under an exclusive fcntl lock of
+  a separate lock file, which allows several processes or hosts
+  on a shared filesystem (with working POSIX locks) to claim jobs
+  from the same root folder. Only new lines are parsed on each
+  update, each process keeps its own offset.
+
+  A 'running' job is claimed again when its owning process on the
+  same host is dead, i.e. after an interrupted run. Claims from
+  other hosts are respected unless stale=seconds is set.
+
+  args:
+    root(str), root folder of the jobs
+    stale(float), seconds after which 'running' records of other
+                  hosts can be claimed, default None (never)
+
+  methods:
+    claim(name), return True if the job is claimed by this process
+    mark(name, state, output=None), append record
+    state(name), return latest record of name or None
+    summary(), return dict of number of jobs in each state
+  """
+  journal_name = 'qtk_journal.log'
+  lock_name = 'qtk_journal.lock'
+
+  def __init__(self, root, stale=None):
+    self.root = os.path.abspath(root)
+    self.path = os.path.join(self.root, self.journal_name)
+    self.lock_path = os.path.join(self.root, self.lock_name)
+    self.stale = stale
+    self.host = socket.gethostname()
+    self.records = {}
+    self.offset = 0
+
+  def __getstate__(self):
+    # records are re-read by each process
+    state = self.__dict__.copy()
+    state['records'] = {}
+    state['offset'] = 0
+    return state
+
+  def __repr__(self):
+    return "JobJournal(%s)" % self.path
+
+  def _lock(self):
+    lock = open(self.lock_path, 'a')
+    fcntl.lockf(lock, fcntl.LOCK_EX)
+    return lock
+
+  def _unlock(self, lock):
+    fcntl.lockf(lock, fcntl.LOCK_UN)
+    lock.close()
+
+  def _update(self):
+    if not os.path.exists(self.path):
+      return
+    with open(self.path, 'r') as jfile:
+      jfile.seek(self.offset)
+      while True:
+        line = jfile.readline()
+        # partially written line from a crashed writer
+        if not line.endswith('\n'):
+          break
+        self.offset = jfile.tell()
+        try:
+          record = json.loads(line)
+          self.records[record['name']] = record
+        except (ValueError, KeyError):
+          qtk.warning("corrupted journal line: %s" % line.strip())
+
+  def _append(self, name, state, output=None):
+    record = {
+      'name': name,
+      'state': state,
+      'output': output,
+      'host': self.host,
+      'pid': os.getpid(),
+      'time': time.time(),
+    }
+    with open(self.path, 'a') as jfile:
+      jfile.write(json.dumps(record, sort_keys=True) + '\n')
+      jfile.flush()
+      os.fsync(jfile.fileno())
+    self._update()
+    return record
+
+  def _alive(self, record):
+    if record['host'] == self.host:
+      if record['pid'] == os.getpid():
+        return True
+      try:
+        os.kill(record['pid'], 0)
+        return True
+      except OSError:
+        return False
+    elif self.stale is not None:
+      return time.time() - record['time'] < self.stale
+    else:
+      return True
+
+  def state(self, name):
+    lock = self._lock()
+    try:
+      self._update()
+    finally:
+      self._unlock(lock)
+    if name in self.records:
+      return self.records[name]
+
+  def claim(self, name):
+    """
+    claim job name for this process, return False if it is
+    finished or running elsewhere
+    """
+    lock = self._lock()
+    try:
+      self._update()
+      if name in self.records:
+        record = self.records[name]
+        if record['state'] == 'finished':
+          return False
+        if record['state'] == 'running' and self._alive(record):
+          return False
+      self._append(name, 'running')
+      return True
+    finally:
+      self._unlock(lock)
+
+  def mark(self, name, state, output=None):
+    if output is not None:
+      output = os.path.relpath(os.path.abspath(output), self.root)
+    lock = self._lock()
+    try:
+      self._update()
+      return self._append(name, state, output)
+    finally:
+      self._unlock(lock)
+
+  def finish(self, name, out):
+    """mark job by QMOutput object, failed if Et is nan"""
+    output = None
+    if hasattr(out, 'path') and hasattr(out, 'name'):
+      output = os.path.join(out.path, out.name)
+      if not os.path.exists(output):
+        # QMRun overwrites path by input name, look in job folder
+        output = os.path.join(self.root, name, out.name)
+        if not os.path.exists(output):
+          output = None
+    try:
+      failed = out is None or np.isnan(out.Et)
+    except (AttributeError, TypeError):
+      failed = True
+    if failed:
+      return self.mark(name, 'failed', output)
+    else:
+      return self.mark(name, 'finished', output)
+
+  def output(self, name):
+    """absolute output path of job name"""
+    record = self.state(name)
+    if record is not None and record['output']:
+      return os.path.join(self.root, record['output'])
+
+  def summary(self):
+    lock = self._lock()
+    try:
+      self._update()
+    finally:
+      self._unlock(lock)
+    out = {}
+    for record in self.records.itervalues():
+      state = record['state']
+      out[state] = out.get(state, 0) + 1
+    return out
@@ -7,8 +7,24 @@ import numpy as np
 import sys, os
 import shutil
 import subprocess as sp
+import traceback
+import pickle
+import Queue
+import itertools
+import tempfile
+import time
+import psutil
+from journal import JobJournal
+from qctoolkit.QM.supervisor import SupervisedTask
 
-def qmWriteAll(inp_list, root, overwrite=False, compress=False):
+def qmWriteAll(inp_list, root, overwrite=False, compress=False,
+               journal=True):
+  """
+  write list of QMInp objects under root folder
+
+  jobs already written or finished in the journal of root are
+  skipped, see JobJournal. journal=False writes all inputs
+  """
   if os.path.exists(root):
     if overwrite:
       qtk.warning("overwrite existing folder %s" % root)
@@ -19,11 +35,22 @@ def qmWriteAll(inp_list, root, overwrite=False, compress=False):
         "joining calculations with other threads")
   else:
     os.makedirs(root)
+  if journal:
+    journal = JobJournal(root)
   cwd = os.getcwd()
   os.chdir(root)
-  for inp in inp_list:
-    inp.write(inp.molecule.name)
-  os.chdir(cwd)
+  try:
+    for inp in inp_list:
+      name = inp.molecule.name
+      if journal:
+        record = journal.state(name)
+        if record is not None and record['state'] != 'failed':
+          continue
+      inp.write(name)
+      if journal:
+        journal.mark(name, 'written')
+  finally:
+    os.chdir(cwd)
   if compress:
     cmd = 'tar -zcf %s %s' % (root + '.tar.gz', root)
     run = sp.Popen(cmd, shell=True, stdin=sp.PIPE)
@@ -33,16 +60,88 @@ def qmWriteAll(inp_list, root, overwrite=False, compress=False):
     qtk.report("qmWriteAll", "compression completed")
 
 def qmRunAll(inp_list, root=None,**kwargs):
+  """
+  run list of QMInp objects in parallel, optionally under root folder
+
+  kwargs (optional):
+    pack=Boolean: pack jobs by their core width threads*omp with
+                  CoreScheduler, default True if the widths differ
+    cores=n(int): cores available for packing, default cpu_count
+    memory=x(float): memory in GB for packing, default setting.memory
+                     request of each job is read from 
+                     inp.setting['memory']
+    affinity=Boolean: pin packed jobs to their cores
+    overwrite=Boolean: overwrite existing root folder
+    journal=Boolean: record job states in root/qtk_journal.log,
+                     default True if root is given. Finished jobs
+                     are loaded from their output instead of rerun,
+                     failed jobs are retried, jobs running in other
+                     processes or hosts are skipped (None returned)
+    stale=x(float): seconds after which running jobs of other hosts
+                    are claimed again, see JobJournal
+    supervise=Boolean: run all jobs from this process with
+                       JobSupervisor, limited by cores
+    timeout=x(float): wall-clock limit of each job in seconds
+                      for supervised jobs
+    other kwargs are passed to qtk.parallelize
+  """
   if 'block_size' not in kwargs:
     kwargs['block_size'] = 1
+  if root is not None and ('journal' not in kwargs or kwargs['journal']):
+    stale = None
+    if 'stale' in kwargs:
+      stale = kwargs['stale']
+    journal = JobJournal(root, stale)
+    run_job = _journalRunJob
+  else:
+    journal = None
+    run_job = qtk.qmRunJob
+  for key in ['journal', 'stale']:
+    if key in kwargs:
+      del kwargs[key]
   job = []
   for inp in inp_list:
-    job.append([inp, inp.molecule.name])
+    if journal is not None:
+      job.append([journal, inp, inp.molecule.name])
+    else:
+      job.append([inp, inp.molecule.name])
+  widths = [_jobWidth(inp) for inp in inp_list]
+  if 'pack' in kwargs:
+    pack = kwargs['pack']
+  else:
+    pack = len(set(widths)) > 1
   inp = inp_list[0]
   if inp.setting['threads'] != 1 and 'threads' not in kwargs:
     kwargs['threads'] = setting.cpu_count / inp.setting['threads']
+
+  def run():
+    if 'supervise' in kwargs and kwargs['supervise']:
+      sup_kwargs = {}
+      for key in ['cores', 'timeout']:
+        if key in kwargs:
+          sup_kwargs[key] = kwargs[key]
+      with qtk.JobSupervisor(**sup_kwargs):
+        out = [run_job(*args) for args in job]
+      return [o.out if isinstance(o, SupervisedTask) else o
+              for o in out]
+    elif pack:
+      sch_kwargs = {}
+      for key in ['cores', 'memory', 'affinity']:
+        if key in kwargs:
+          sch_kwargs[key] = kwargs[key]
+      memory = []
+      for inp in inp_list:
+        if 'memory' in inp.setting and inp.setting['memory']:
+          memory.append(float(inp.setting['memory']))
+        else:
+          memory.append(0.)
+      scheduler = CoreScheduler(**sch_kwargs)
+      return scheduler.run(run_job, job, widths, memory)
+    else:
+      return qtk.parallelize(run_job, job, **kwargs)
+
   if root is None:
-    qtk.parallelize(qtk.qmRunJob, job, **kwargs)
+    return run()
   else:
     if os.path.exists(root):
       if 'overwrite' in kwargs and kwargs['overwrite']:
@@ -56,14 +155,661 @@ def qmRunAll(inp_list, root=None,**kwargs):
       os.makedirs(root)
     cwd = os.getcwd()
     os.chdir(root)
-    qtk.parallelize(qtk.qmRunJob, job, **kwargs)
-    os.chdir(cwd)
+    try:
+      out = run()
+    finally:
+      os.chdir(cwd)
+    return out
+
+def _jobWidth(inp):
+  """number of cores used by a QMInp, threads (MPI) * omp"""
+  width = 1
+  if 'threads' in inp.setting and inp.setting['threads']:
+    width = int(inp.setting['threads'])
+  if 'omp' in inp.setting and inp.setting['omp']:
+    width = width * int(inp.setting['omp'])
+  return width
 
 def qmRunJob(inp, name):
   qtk.report("qmRunJob", "runing qmjob:'%s'" % inp,
              'with name:', name)
   return inp.run(name)
 
+def _journalRunJob(journal, inp, name):
+  """qmRunJob with state recorded in journal"""
+  previous = journal.state(name)
+  if not journal.claim(name):
+    record = journal.state(name)
+    if record['state'] == 'finished':
+      qtk.report("qmRunJob", "'%s' finished, loading output" % name)
+      output = journal.output(name)
+      try:
+        return qtk.QMOut(output, program=inp.setting['program'])
+      except Exception as err:
+        qtk.warning("can not load output %s of '%s': %s"\
+                    % (output, name, err))
+        return qtk.QMOutput()
+    else:
+      qtk.report("qmRunJob", "'%s' running on %s, pid %d, skipped"\
+                 % (name, record['host'], record['pid']))
+      return None
+  if previous is not None and previous['state'] in ['running', 'failed']:
+    # remove folder of interrupted or failed attempt
+    inp.setting['overwrite'] = True
+  out = None
+  try:
+    out = qmRunJob(inp, name)
+  finally:
+    if isinstance(out, SupervisedTask):
+      out.onDone(lambda task: journal.finish(name, task.out))
+    else:
+      journal.finish(name, out)
+  return out
+
+class TaskFailure(object):
+  """
+  record of a failed task, returned in place of its output
+
+  attributes:
+    index(int), position of the task in input_list
+    args(list), input arguments of the task
+    error(str), error message of the last attempt
+    error_type(str), exception class name of the last attempt
+    traceback(str), formatted traceback of the last attempt
+    attempts(int), number of times the task has been tried
+    pid(int), process id of the worker running the last attempt
+
+  TaskFailure evaluates to False, failed tasks can be filtered by
+    [o for o in out if not isinstance(o, qtk.TaskFailure)]
+  """
+  def __init__(self, index, args, error, error_type='', 
+               traceback='', attempts=1, pid=None):
+    self.index = index
+    self.args = args
+    self.error = error
+    self.error_type = error_type
+    self.traceback = traceback
+    self.attempts = attempts
+    self.pid = pid
+
+  def __repr__(self):
+    return "TaskFailure(index=%s, %s: %s, attempts=%d)" % \
+      (str(self.index), self.error_type, self.error, self.attempts)
+
+  def __nonzero__(self):
+    return False
+
+class SharedArray(object):
+  """
+  descriptor of np.ndarray stored in a memory-mapped .npy file,
+  passed through queues in place of the array data
+  """
+  def __init__(self, path, shape, dtype):
+    self.path = path
+    self.shape = shape
+    self.dtype = dtype
+
+  def __repr__(self):
+    return "SharedArray(%s, %s, %s)" % \
+      (self.path, str(self.shape), str(self.dtype))
+
+  def load(self):
+    """copy-on-write ndarray view of the stored data"""
+    return np.load(self.path, mmap_mode='c')
+
+class ArrayTransport(object):
+  """
+  zero-copy transport of large np.ndarray for parallelize
+
+  Arrays in input/output entries (nested in list, tuple and dict)
+  with at least min_size bytes are written once to a .npy file
+  under /dev/shm (or the system temp directory) and replaced by 
+  SharedArray descriptors. The receiving side gets copy-on-write
+  memory-mapped views. The same array object is only stored once 
+  per transport. Files are removed by close(), existing views 
+  stay valid.
+
+  args:
+    min_size(int), minimum array size in bytes, default 64kB
+    root(str), directory for the transport files
+  """
+  def __init__(self, min_size=65536, root=None):
+    if root is None:
+      if os.access('/dev/shm', os.W_OK):
+        root = '/dev/shm'
+      else:
+        root = tempfile.gettempdir()
+    self.path = tempfile.mkdtemp(prefix='qtk_shm_', dir=root)
+    self.min_size = min_size
+    self._shared = {}
+
+  def __getstate__(self):
+    # workers only need the location, not the parent array cache
+    return {'path': self.path, 'min_size': self.min_size}
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._shared = {}
+
+  def share(self, obj):
+    """replace large arrays in obj by SharedArray descriptors"""
+    if isinstance(obj, np.ndarray):
+      if obj.nbytes < self.min_size or obj.dtype.hasobject:
+        return obj
+      key = id(obj)
+      if key not in self._shared:
+        fd, path = tempfile.mkstemp(suffix='.npy', dir=self.path)
+        with os.fdopen(fd, 'wb') as npy:
+          np.save(npy, obj)
+        # keep reference such that id(obj) is not reused
+        self._shared[key] = (obj, SharedArray(path, obj.shape, obj.dtype))
+      return self._shared[key][1]
+    elif type(obj) in (list, tuple):
+      return type(obj)([self.share(o) for o in obj])
+    elif type(obj) is dict:
+      return dict((k, self.share(v)) for k, v in obj.iteritems())
+    else:
+      return obj
+
+  def unshare(self, obj):
+    """replace SharedArray descriptors in obj by ndarray views"""
+    if isinstance(obj, SharedArray):
+      return obj.load()
+    elif type(obj) in (list, tuple):
+      return type(obj)([self.unshare(o) for o in obj])
+    elif type(obj) is dict:
+      return dict((k, self.unshare(v)) for k, v in obj.iteritems())
+    else:
+      return obj
+
+  def close(self):
+    self._shared = {}
+    shutil.rmtree(self.path, ignore_errors=True)
+
+def _getTransport(transport, min_size=65536):
+  """return (ArrayTransport or None, flag to close after use)"""
+  if transport is None or transport is False or transport == 'pickle':
+    return None, False
+  elif isinstance(transport, ArrayTransport):
+    return transport, False
+  elif transport is True or transport == 'shm':
+    return ArrayTransport(min_size), True
+  else:
+    qtk.exit("transport %s not recognized" % str(transport))
+
+def _getCost(cost, input_list):
+  """
+  return cost list and submission order of input_list.
+  Without cost every entry costs 1 and input order is kept, 
+  otherwise entries are ordered by decreasing cost
+  """
+  n = len(input_list)
+  if cost is None:
+    return [1. for _ in range(n)], range(n)
+  if callable(cost):
+    cost = [cost(*args) for args in input_list]
+  cost = [float(c) for c in cost]
+  if len(cost) != n:
+    qtk.exit("cost list length %d does not match input_list %d" \
+             % (len(cost), n))
+  order = sorted(range(n), key=lambda i: cost[i], reverse=True)
+  return cost, order
+
+def _guidedBlock(order, start, cost, remaining, threads, max_cost=None):
+  """
+  return (end, block_cost) of the next guided block order[start:end],
+  holding remaining/(2*threads) of the cost and at least one entry
+  """
+  target = remaining / (2. * threads)
+  if max_cost is not None:
+    target = min(target, max_cost)
+  end = start
+  block_cost = 0.
+  while end < len(order):
+    c = cost[order[end]]
+    if end > start and block_cost + c > target:
+      break
+    block_cost += c
+    end += 1
+  return end, block_cost
+
+def _call(target_function, args):
+  """unpack input entry with optional trailing kwargs dict"""
+  if len(args) > 0 and type(args[-1]) == dict:
+    return target_function(*args[:-1], **args[-1])
+  else:
+    return target_function(*args)
+
+def _run_task(target_function, index, args, retry=0, transport=None):
+  """run single task, retry on exception and return TaskFailure"""
+  attempt = 0
+  while True:
+    attempt += 1
+    try:
+      if transport is None:
+        return _call(target_function, args)
+      else:
+        out = _call(target_function, transport.unshare(args))
+        return transport.share(out)
+    except Exception as err:
+      if attempt > retry:
+        return TaskFailure(index, args, str(err), 
+                           err.__class__.__name__,
+                           traceback.format_exc(), attempt,
+                           os.getpid())
+
+def _pool_worker(q_in, q_out, slot):
+  """
+  worker loop of a persistent Pool process. target functions are
+  received pickled and cached, such that unpickling errors are
+  reported as TaskFailure instead of killing the worker.
+  The running block is written to the shared slot, which is
+  readable by the parent even if the worker dies
+  """
+  pid = os.getpid()
+  functions = {}
+  for task in iter(q_in.get, None):
+    job_id, block_id, f_str, block, retry, transport = task
+    slot[0], slot[1] = job_id, block_id
+    if f_str not in functions:
+      try:
+        functions[f_str] = pickle.loads(f_str)
+      except Exception as err:
+        out = [(index, TaskFailure(index, args, str(err), 
+                                   err.__class__.__name__,
+                                   traceback.format_exc(), 1, pid))
+               for index, args in block]
+        q_out.put((job_id, block_id, out, 0.))
+        continue
+    target_function = functions[f_str]
+    t0 = time.time()
+    out = [(index, _run_task(target_function, index, args, 
+                             retry, transport))
+           for index, args in block]
+    q_out.put((job_id, block_id, out, time.time() - t0))
+
+class Pool(object):
+  """
+  persistent worker pool for qtk.parallelize
+
+  Worker processes are forked on first use and kept alive across
+  calls, which avoids the fork/teardown cost of parallelize for 
+  short tasks. Target functions must be picklable, 
+  i.e. defined at module level or bound methods.
+
+  args:
+    threads(int), number of worker processes, 
+                  default setting.cpu_count
+    retry(int), number of retries for failed tasks, default 0
+    poll(float), seconds between checks for dead workers
+
+  methods:
+    imap(f, input_list) --- generator of (index, output) pairs
+                            in completion order
+    map(f, input_list) --- list of output in input order
+    close() --- stop worker processes after pending tasks
+    terminate() --- kill worker processes immediately
+
+  Example:
+    pool = qtk.Pool(threads=4, retry=1)
+    for i, out in pool.imap(f, input_list):
+      print i, out
+    out_list = qtk.parallelize(f, input_list, pool=pool)
+    pool.close()
+  """
+  def __init__(self, threads=None, retry=0, poll=1.0):
+    if threads is None:
+      threads = setting.cpu_count
+    self.threads = threads
+    self.retry = retry
+    self.poll = poll
+    self._workers = []
+    self._slots = []
+    self._q_in = None
+    self._q_out = None
+    self._job_id = itertools.count()
+
+  def __repr__(self):
+    return "Pool(threads=%d, alive=%d)" % \
+      (self.threads, len([p for p in self._workers if p.is_alive()]))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __del__(self):
+    try:
+      self.terminate()
+    except Exception:
+      pass
+
+  def __getstate__(self):
+    qtk.exit("Pool object can not be pickled")
+
+  def _spawn(self, i):
+    self._slots[i][:] = [-1, -1]
+    p = mp.Process(target=_pool_worker, 
+                   args=(self._q_in, self._q_out, self._slots[i]))
+    p.daemon = True
+    p.start()
+    return p
+
+  def start(self):
+    """start worker processes if not yet running"""
+    if self._q_in is None:
+      self._q_in = mp.Queue()
+      self._q_out = mp.Queue()
+    while len(self._slots) < self.threads:
+      self._slots.append(mp.RawArray('l', 2))
+    while len(self._workers) < self.threads:
+      self._workers.append(self._spawn(len(self._workers)))
+    return self
+
+  def _replaceDead(self):
+    """
+    restart dead workers and return list of 
+    (pid, job_id, block_id) of the blocks they were running
+    """
+    dead = []
+    for i, p in enumerate(self._workers):
+      if not p.is_alive():
+        qtk.warning("Pool worker %d died with exit code %s, restarting"
+                    % (p.pid, str(p.exitcode)))
+        dead.append((p.pid, self._slots[i][0], self._slots[i][1]))
+        self._workers[i] = self._spawn(i)
+    return dead
+
+  def imap(self, target_function, input_list, block_size=1, 
+           retry=None, transport=None, schedule='static', cost=None,
+           target_time=0.5):
+    """
+    submit input_list and yield (index, output) pairs in completion
+    order. Failed tasks yield TaskFailure objects as output. 
+    Blocks lost by dead workers are resubmitted up to retry times.
+    transport='shm' passes large np.ndarray through ArrayTransport
+
+    schedule='static' submits all blocks of block_size at once.
+    schedule='guided' keeps 2*threads blocks in flight, each holding
+    1/(2*threads) of the remaining cost, capped to target_time 
+    seconds by the measured runtime. Block size shrinks toward the
+    tail of the list such that no worker is left alone with a long
+    block. cost is a list or a function of the input entry 
+    (e.g. number of atoms), largest jobs are submitted first.
+    """
+    if retry is None:
+      retry = self.retry
+    try:
+      f_str = pickle.dumps(target_function, pickle.HIGHEST_PROTOCOL)
+    except Exception as err:
+      qtk.exit("target function can not be pickled for Pool: %s" % err)
+    if schedule not in ['static', 'guided']:
+      qtk.exit("schedule %s not recognized" % str(schedule))
+    transport, owned = _getTransport(transport)
+    self.start()
+
+    job_id = next(self._job_id)
+    if transport is None:
+      indexed = list(enumerate(input_list))
+    else:
+      indexed = [(i, transport.share(args)) 
+                 for i, args in enumerate(input_list)]
+    cost, order = _getCost(cost, input_list)
+
+    pending = {}
+    attempts = {}
+    block_cost = {}
+    block_ids = itertools.count()
+    # guided scheduling state
+    itr = [0]
+    remaining = [float(sum(cost))]
+    measured = [0., 0.] # [cost, runtime] of finished blocks
+
+    def submit(block, c):
+      block_id = next(block_ids)
+      pending[block_id] = block
+      attempts[block_id] = 0
+      block_cost[block_id] = c
+      self._q_in.put((job_id, block_id, f_str, block, retry, transport))
+
+    def refill():
+      max_cost = None
+      if measured[1] > 0:
+        max_cost = target_time * measured[0] / measured[1]
+      while len(pending) < 2 * self.threads and itr[0] < len(order):
+        end, c = _guidedBlock(order, itr[0], cost, remaining[0], 
+                              self.threads, max_cost)
+        submit([indexed[i] for i in order[itr[0]:end]], c)
+        itr[0] = end
+        remaining[0] -= c
+
+    if schedule == 'static':
+      for i in range(0, len(order), block_size):
+        block = order[i:i+block_size]
+        submit([indexed[j] for j in block], sum(cost[j] for j in block))
+    else:
+      refill()
+
+    try:
+      while pending:
+        try:
+          msg = self._q_out.get(timeout=self.poll)
+        except Queue.Empty:
+          for pid, dead_job, block_id in self._replaceDead():
+            if dead_job != job_id or block_id not in pending:
+              continue
+            attempts[block_id] += 1
+            if attempts[block_id] > retry:
+              block = pending.pop(block_id)
+              for index, _ in block:
+                yield index, TaskFailure(
+                  index, input_list[index], 
+                  "worker process %d died" % pid, 
+                  'WorkerDied', '', attempts[block_id], pid)
+            else:
+              self._q_in.put((job_id, block_id, f_str, 
+                              pending[block_id], retry, transport))
+          if schedule == 'guided':
+            refill()
+          continue
+        # results from abandoned imap calls are dropped
+        if msg[0] != job_id or msg[1] not in pending:
+          continue
+        del pending[msg[1]]
+        measured[0] += block_cost[msg[1]]
+        measured[1] += msg[3]
+        if schedule == 'guided':
+          refill()
+        for index, out in msg[2]:
+          if isinstance(out, TaskFailure):
+            out.args = input_list[index]
+          elif transport is not None:
+            out = transport.unshare(out)
+          yield index, out
+    except KeyboardInterrupt:
+      qtk.warning('jobs terminated by keyboard interrupt')
+      self.terminate()
+      raise
+    finally:
+      if owned:
+        transport.close()
+
+  def map(self, target_function, input_list, **kwargs):
+    """return list of output in the order of input_list"""
+    output = [None for _ in input_list]
+    for index, out in self.imap(target_function, input_list, **kwargs):
+      output[index] = out
+    return output
+
+  def close(self):
+    """stop workers after all queued tasks are processed"""
+    # count before sending, a worker might take the first None
+    # and exit before its own is_alive check
+    alive = [p for p in self._workers if p.is_alive()]
+    for p in alive:
+      self._q_in.put(None)
+    for p in self._workers:
+      p.join()
+    self._workers = []
+    # fresh queues on restart, None left by workers died meanwhile
+    # would stop new workers
+    self._slots = []
+    self._q_in = None
+    self._q_out = None
+
+  def terminate(self):
+    """kill worker processes without waiting for queued tasks"""
+    for p in self._workers:
+      if p.is_alive():
+        p.terminate()
+    for p in self._workers:
+      p.join()
+    self._workers = []
+    self._slots = []
+    self._q_in = None
+    self._q_out = None
+
+_default_pool = None
+
+def getPool(threads=None):
+  """return module level Pool, created lazily on first call"""
+  global _default_pool
+  if threads is None:
+    threads = setting.cpu_count
+  if _default_pool is None or _default_pool.threads != threads:
+    if _default_pool is not None:
+      _default_pool.close()
+    _default_pool = Pool(threads)
+  return _default_pool
+
+def _packedWorker(q_out, index, target_function, args, cpus):
+  """run single packed job, pinned to cpus if given"""
+  if cpus is not None:
+    try:
+      psutil.Process().cpu_affinity(cpus)
+    except Exception as err:
+      qtk.warning("setting cpu affinity %s failed: %s" % (cpus, err))
+  q_out.put((index, _run_task(target_function, index, args)))
+
+class CoreScheduler(object):
+  """
+  local resource scheduler packing jobs of different core widths
+
+  Each job requests a number of cores (e.g. MPI threads * omp) and
+  optionally memory in GB. Jobs are started largest first, and 
+  smaller jobs are back-filled whenever requested cores and memory
+  are free. A new job is started as soon as a running job finishes.
+
+  args:
+    cores(int), available cores, default setting.cpu_count or 
+                number of cpus in current affinity mask
+    memory(float), available memory in GB, default setting.memory
+    affinity(bool), pin each job to its own set of cpus
+    poll(float), seconds between checks for crashed jobs
+
+  Example:
+    sch = qtk.CoreScheduler(cores=64, affinity=True)
+    out = sch.run(qtk.qmRunJob, [[inp, name] for ...], [16, 4, ...])
+  """
+  def __init__(self, cores=None, memory=None, affinity=False, poll=1.0):
+    try:
+      cpus = sorted(psutil.Process().cpu_affinity())
+    except Exception:
+      cpus = range(setting.cpu_count)
+    if cores is None:
+      cores = len(cpus)
+    if memory is None:
+      memory = setting.memory
+    self.cores = cores
+    self.memory = memory
+    self.affinity = affinity
+    self.poll = poll
+    # cpu ids used for pinning, cycled if more cores are requested
+    self.cpus = [cpus[i % len(cpus)] for i in range(cores)]
+
+  def __repr__(self):
+    return "CoreScheduler(cores=%d, memory=%.1fGB)" % \
+      (self.cores, self.memory)
+
+  def run(self, target_function, input_list, cores, memory=None):
+    """
+    run target_function on each entry of input_list, where entry i
+    requests cores[i] cores and memory[i] GB. Return list of output 
+    in input order, TaskFailure for failed or crashed jobs
+    """
+    n = len(input_list)
+    if memory is None:
+      memory = [0. for _ in range(n)]
+    if len(cores) != n or len(memory) != n:
+      qtk.exit("cores/memory request list does not match input_list")
+    width = []
+    for i in range(n):
+      w = max(1, int(cores[i]))
+      if w > self.cores:
+        qtk.warning("job %d requests %d cores, only %d available" \
+                    % (i, w, self.cores))
+        w = self.cores
+      width.append(w)
+    mem = []
+    for i in range(n):
+      m = float(memory[i])
+      if m > self.memory:
+        qtk.warning("job %d requests %.1fGB, only %.1fGB available" \
+                    % (i, m, self.memory))
+        m = self.memory
+      mem.append(m)
+
+    waiting = sorted(range(n), key=lambda i: (width[i], mem[i]),
+                     reverse=True)
+    free_cpus = list(self.cpus)
+    free_mem = [self.memory]
+    running = {}
+    output = [None for _ in range(n)]
+    q_out = mp.Queue()
+
+    def release(i):
+      p, cpus = running.pop(i)
+      p.join()
+      free_cpus.extend(cpus)
+      free_mem[0] += mem[i]
+
+    try:
+      while waiting or running:
+        for i in list(waiting):
+          if width[i] <= len(free_cpus) and mem[i] <= free_mem[0] + 1E-8:
+            cpus = free_cpus[:width[i]]
+            del free_cpus[:width[i]]
+            free_mem[0] -= mem[i]
+            pin = cpus if self.affinity else None
+            p = mp.Process(target=_packedWorker, 
+                           args=(q_out, i, target_function, 
+                                 input_list[i], pin))
+            p.start()
+            running[i] = (p, cpus)
+            waiting.remove(i)
+            qtk.progress("CoreScheduler", 
+                         "job %d started on %d cores, " % (i, width[i])\
+                         + "%d cores free" % len(free_cpus))
+        try:
+          i, out = q_out.get(timeout=self.poll)
+          output[i] = out
+          release(i)
+        except Queue.Empty:
+          # finished jobs have their result in the queue already
+          for i, (p, cpus) in running.items():
+            if not p.is_alive() and p.exitcode != 0:
+              output[i] = TaskFailure(
+                i, input_list[i], "job process died with exit code %s"\
+                % str(p.exitcode), 'WorkerDied', '', 1, p.pid)
+              release(i)
+    except KeyboardInterrupt:
+      qtk.warning('jobs terminated by keyboard interrupt')
+      for p, _ in running.values():
+        p.terminate()
+      raise
+    return output
+
 def parallelize(target_function, 
                 input_list, 
                 n_output = 1,
@@ -76,6 +822,27 @@ def parallelize(target_function,
   input_list is a list of list. 
     Each input entry should be wrapped properly as a list 
     **kwargs can be passed py passing dictionary
+
+  kwargs (optional):
+    threads=n(int): number of processes, default setting.cpu_count
+    block_size=n(int): number of input entries per task
+    retry=n(int): number of retries for failed input entries,
+                  default 0 or Pool.retry
+    pool=Pool/True: run on a persistent qtk.Pool, 
+                    True for module level pool from qtk.getPool
+    transport='shm': pass large np.ndarray in input/output 
+                     through memory-mapped files (ArrayTransport)
+                     instead of pickling them
+    share_size=n(int): minimum array size in bytes for 'shm'
+    schedule='guided': blocks of decreasing size toward the end of
+                       input_list instead of fixed block_size. 
+                       With a Pool, block size also adapts to
+                       the measured runtime
+    cost=list/function: cost hint per input entry, e.g. number
+                        of atoms or basis functions. Entries are
+                        submitted in the order of decreasing cost
+
+  Failed input entries return qtk.TaskFailure in place of output
     
   Example:
     # a toy target function
@@ -102,38 +869,109 @@ def parallelize(target_function,
       block_size = len(input_list)/(threads*3)
     else:
       block_size = 1
+  if 'retry' in kwargs:
+    retry = kwargs['retry']
+  else:
+    retry = None
+  if 'share_size' in kwargs:
+    share_size = kwargs['share_size']
+  else:
+    share_size = 65536
+  transport = None
+  if 'transport' in kwargs:
+    transport = kwargs['transport']
+  schedule = 'static'
+  if 'schedule' in kwargs:
+    schedule = kwargs['schedule']
+  if schedule not in ['static', 'guided']:
+    qtk.exit("schedule %s not recognized" % str(schedule))
+  cost = None
+  if 'cost' in kwargs:
+    cost = kwargs['cost']
+
+  pool = None
+  if 'pool' in kwargs and kwargs['pool']:
+    pool = kwargs['pool']
+    if pool is True:
+      pool = getPool(threads)
+    try:
+      pickle.dumps(target_function, pickle.HIGHEST_PROTOCOL)
+    except Exception as err:
+      qtk.warning("%s can not be pickled for Pool, " % target_function\
+                  + "fall back to forked processes")
+      pool = None
+
+  transport, owned = _getTransport(transport, share_size)
+  try:
+    if pool is not None:
+      output = pool.map(target_function, input_list, 
+                        block_size=block_size, retry=retry,
+                        transport=transport, schedule=schedule,
+                        cost=cost)
+    else:
+      if retry is None:
+        retry = 0
+      output = _forkRun(target_function, input_list, 
+                        threads, block_size, retry, transport,
+                        schedule, cost)
+  finally:
+    if owned:
+      transport.close()
+
+  if n_output > 1:
+    # keep output stride for failed tasks
+    output = [[o] * n_output if isinstance(o, TaskFailure) else o 
+              for o in output]
+  out = list(qtk.flatten(output))
+  if n_output == 1:
+    return out
+  else:
+    out_list = []
+    for i in range(n_output):
+      out_list.append(out[i::n_output])
+    return tuple(out_list)
+
+def _forkRun(target_function, input_list, threads, block_size, retry,
+             transport=None, schedule='static', cost=None):
+  """run input_list on freshly forked processes, one call only"""
 
   #############################################
   # runing target function of a single thread #
   #############################################
   def run_jobs(q_in, q_out):
     for inps in iter(q_in.get, None):
-      ind = inps[-1]    # index of job
-      inps = inps[:-1]  # actual input sequence
       out = []
-      try:
-        for args in inps:
-          if type(args[-1]) == dict: # check known args input
-            kwargs = args[-1]
-            args = args[:-1]  
-            out.append(target_function(*args, **kwargs))
-          else:
-            out.append(target_function(*args))
-        q_out.put([out, ind]) # output result with index
-      except: 
-        qtk.warning('job failed!')
-        q_out.put([np.nan, ind])
+      for index, args in inps:
+        out.append([index, _run_task(target_function, index, args, 
+                                     retry, transport)])
+        if isinstance(out[-1][1], TaskFailure):
+          qtk.warning('job failed!')
+      q_out.put(out) # output result with index
   ###### end of single thread definition ######
 
-  # devide input_list into chunks according to block_size
-  def chunks(_list, _size):
-    for i in range(0, len(_list), _size):
-      yield _list[i:i+_size]
-  input_block = list(chunks(input_list, block_size))
+  # devide input_list into chunks according to block_size,
+  # or to guided blocks of decreasing cost
+  if transport is None:
+    indexed = list(enumerate(input_list))
+  else:
+    indexed = [(i, transport.share(args)) 
+               for i, args in enumerate(input_list)]
+  cost, order = _getCost(cost, input_list)
+  input_block = []
+  if schedule == 'guided':
+    itr = 0
+    remaining = float(sum(cost))
+    while itr < len(order):
+      end, c = _guidedBlock(order, itr, cost, remaining, threads)
+      input_block.append([indexed[i] for i in order[itr:end]])
+      itr = end
+      remaining -= c
+  else:
+    for i in range(0, len(order), block_size):
+      input_block.append([indexed[j] for j in order[i:i+block_size]])
 
   # setup empty queue
-  output_stack = []
-  output = []
+  output = [None for _ in input_list]
   qinp = mp.Queue()
   qout = mp.Queue()
 
@@ -145,9 +983,7 @@ def parallelize(target_function,
     jobs.append(p)
 
   # put I/O data into queue for parallel processing
-  index = range(len(input_block))
-  for ind, inps in zip(index, input_block):
-    inps.append(ind) # append inp index
+  for inps in input_block:
     qinp.put(inps)   # put inp to input queue
 
   for thread in jobs:
@@ -157,7 +993,8 @@ def parallelize(target_function,
   for i in range(len(input_block)):
     # collect output from each subprocess
     try:
-      output_stack.append(qout.get())
+      for index, out in qout.get():
+        output[index] = out
     # check keyboard interrupt and terminate subprocess
     except KeyboardInterrupt:
       qtk.warning('jobs terminated by keyboard interrupt')
@@ -177,18 +1014,9 @@ def parallelize(target_function,
   while not qout.empty():
     qout.get()
 
-  if len(output_stack)>0:
-    # sort/restructure output according to input order
-    output_stack = sorted(output_stack, key=operator.itemgetter(1))
-    # loop though all input for corresponding output
-    for data_out in output_stack: 
-      # if output is list of class, in-line iteration doesn't work
-      output.append(data_out[0])
-  out = list(qtk.flatten(output))
-  if n_output == 1:
-    return out
-  else:
-    out_list = []
-    for i in range(n_output):
-      out_list.append(out[i::n_output])
-    return tuple(out_list)
+  for i, out in enumerate(output):
+    if isinstance(out, TaskFailure):
+      out.args = input_list[i]
+    elif transport is not None:
+      output[i] = transport.unshare(out)
+  return output
@@ -1,6 +1,4 @@
 import qctoolkit as qtk
-import paramiko
-import pexpect
 import os
 import shutil
 import subprocess as sp
@@ -18,6 +16,10 @@ def remoteRun(cmd, status, session):
 	  qtk.report('submit-remote-error', ssherr)
 
 def submit(inp_list, root, **remote_settings):
+  # ssh modules are only loaded for remote submission
+  import paramiko
+  import pexpect
+
   necessary_list = [
     'ip',
     'submission_script',
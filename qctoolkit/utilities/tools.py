@@ -2,51 +2,25 @@ from math import pi ,sin, cos, ceil
 from qctoolkit.molecule import Molecule
 import numpy as np
 import qctoolkit as qtk
-import yaml
 import pickle
 import hashlib
 import copy
+from xyz_io import readXYZ
 
 def Molecules(file_name, **kwargs):
-  """read nested xyz file and return molecule list"""
-  xyz = open(file_name, 'r')
-  content = xyz.readlines()
-  content = [line.replace('\t', ' ') for line in content]
-  xyz.close()
-
-  itr = 0
-  more_data = True
+  """
+  read nested xyz file and return molecule list,
+  see readXYZ for kwargs
+  """
   mols = []
-
-  while more_data:
-    try:
-      N = int(content[itr])
-      prop_list = content[itr + 1]
-      try:
-          prop_list = np.array(prop_list.split(' ')).astype(float)
-      except Exception as err:
-          qtk.warning(str(err))
-          prop_list = prop_list
-      coord_list = content[itr + 2 : itr + N + 2]
-      coord = [filter(None,[a for a in entry.split(' ')])
-               for entry in coord_list]
-      type_list = list(np.array(coord)[:,0])
-      type_list = [str(elem) for elem in type_list]
-      Z = np.array([qtk.n2Z(elem) for elem in type_list])
-      R = np.array(coord)[:,1:4].astype(float)
-      mol_data = {}
-      for var in ['N', 'type_list', 'Z', 'R']:
-        mol_data[str(var)] = eval(var)
-      itr += N + 2
-      mols.append(qtk.Molecule(molecule_data = mol_data))
-    except Exception as err:
-      qtk.progress(
-        "Molecules", 
-        "%d molecules have been loaded with message %s." % (len(mols), str(err))
-      )
-      more_data = False
-      
-
+  try:
+    for mol in readXYZ(file_name, **kwargs):
+      mols.append(mol)
+  except Exception as err:
+    qtk.progress(
+      "Molecules", 
+      "%d molecules have been loaded with message %s." % (len(mols), str(err))
+    )
   return mols
 
 def primitiveCell(symmetry):
@@ -71,12 +45,8 @@ def scale2cart(cell_vec, R_scale):
   assert len(cell_vec) == 3
   assert len(cell_vec[0]) == 3
 
-  R_cart = []
-  for R_s in np.asarray(R_scale):
-    R_cart.append(
-      np.sum(R_s[:, np.newaxis] * np.asarray(cell_vec), axis=0).tolist()
-    )
-  return np.asarray(R_cart)
+  R_scale = np.asarray(R_scale, dtype=float)
+  return np.dot(R_scale.reshape(-1, 3), np.asarray(cell_vec, dtype=float))
 
 def md5sum(fname):
   def hash_bytestr_iter(bytesiter, hasher, ashexstr=True):
@@ -331,6 +301,96 @@ def xyz2fractional(R, celldm, scale=[1,1,1]):
   fm = fractionalMatrix(celldm)
   return np.dot(np.linalg.inv(fm), R.T).T
 
+def latticeShifts(lattice, cutoff=None, n_images=1):
+  """
+  integer lattice shifts (n_shift, 3), x index running fastest.
+  All shifts within -n_images..n_images along each lattice vector,
+  or the shifts needed to reach cutoff distance from the cell for
+  arbitrary (triclinic) lattice
+  """
+  lattice = np.asarray(lattice, dtype=float)
+  if cutoff is None:
+    n = [n_images] * 3
+  else:
+    # distance between opposite cell faces is volume/area
+    volume = abs(np.linalg.det(lattice))
+    n = []
+    for k in range(3):
+      area = np.linalg.norm(np.cross(lattice[(k+1) % 3],
+                                     lattice[(k+2) % 3]))
+      n.append(int(ceil(cutoff * area / volume)))
+  grid = np.mgrid[-n[2]:n[2]+1, -n[1]:n[1]+1, -n[0]:n[0]+1]
+  return grid.reshape(3, -1).T[:, ::-1].copy()
+
+def periodicImages(R, lattice, cutoff=None, n_images=1):
+  """
+  periodic images of coordinates R (N, 3) of lattice with rows of
+  lattice vectors, built by broadcasting in one allocation
+
+  without cutoff return images (n_shift, N, 3) and shifts
+  (n_shift, 3) of latticeShifts, e.g. n_images=1 gives all 27
+  images with the original cell at images[13].
+  with cutoff return image coordinates (M, 3), atom index (M,) and
+  shifts (M, 3) of image atoms, including the original cell,
+  within cutoff of any atom of R
+
+  Example:
+    lattice = qtk.celldm2lattice(mol.celldm)
+    R_img, index, shift = qtk.periodicImages(mol.R, lattice, 6.0)
+  """
+  R = np.asarray(R, dtype=float).reshape(-1, 3)
+  lattice = np.asarray(lattice, dtype=float)
+  shifts = latticeShifts(lattice, cutoff, n_images)
+  if cutoff is not None and len(R) == 0:
+    return np.zeros([0, 3]), np.zeros(0, dtype=int), np.zeros([0, 3])
+  images = R[np.newaxis, :, :] + np.dot(shifts, lattice)[:, np.newaxis, :]
+  if cutoff is None:
+    return images, shifts
+  from scipy.spatial import cKDTree
+  images = images.reshape(-1, 3)
+  d, _ = cKDTree(R).query(images, distance_upper_bound=cutoff)
+  keep = np.nonzero(d <= cutoff)[0]
+  index = keep % len(R)
+  return images[keep], index, shifts[keep // len(R)]
+
+def radialDistribution(positions, lattice, list1=None, list2=None,
+                       dr=0.005, r_max=None):
+  """
+  radial distribution function g(r) of list2 atoms around list1
+  atoms for coordinates (N, 3) or trajectory (nt, N, 3) of
+  periodic lattice with rows of lattice vectors, normalized to 1
+  for uniform density. Pairs within r_max, default half of the
+  smallest distance between cell faces, are found by cell lists
+  for arbitrary (triclinic) lattice. Returns bin centers r and g
+
+  Example:
+    lattice = qtk.celldm2lattice(mol.celldm)
+    r, g = qtk.radialDistribution(mol.R, lattice, r_max=8.0)
+  """
+  # compiled with MD extensions, imported on first use
+  from qctoolkit.MD.rdf_cell import rdf_cell
+  positions = np.asarray(positions, dtype=float)
+  if positions.ndim == 2:
+    positions = positions[np.newaxis]
+  lattice = np.asarray(lattice, dtype=float).reshape(3, 3)
+  if list1 is None:
+    list1 = np.arange(positions.shape[1])
+  if list2 is None:
+    list2 = list1
+  list1 = np.asarray(list1, dtype=int).ravel()
+  list2 = np.asarray(list2, dtype=int).ravel()
+  if r_max is None:
+    r_max = 0.5 / np.linalg.norm(np.linalg.inv(lattice), axis=0).max()
+
+  counts = rdf_cell(positions, list1, list2, lattice, dr, r_max)
+  edges = dr * np.arange(len(counts) + 1)
+  edges[-1] = r_max
+  shell = 4 * pi * np.diff(edges**3) / 3.
+  density = len(list2) / abs(np.linalg.det(lattice))
+  g = counts / (len(positions) * max(len(list1), 1) * density * shell)
+  r = dr * (np.arange(len(counts)) + 0.5)
+  return r, g
+
 def convE(source, units, separator=None):
   def returnError(ioStr, unitStr):
     msg = 'supported units are:\n'
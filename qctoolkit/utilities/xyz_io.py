@@ -0,0 +1,231 @@
+import qctoolkit as qtk
+import numpy as np
+import gzip
+import bz2
+import io
+import os
+
+def openXYZ(file_name):
+  """open plain, gzip or bz2 compressed file, detected by magic bytes"""
+  with open(file_name, 'rb') as raw:
+    magic = raw.read(3)
+  if magic[:2] == '\x1f\x8b':
+    return io.BufferedReader(gzip.open(file_name, 'rb'))
+  elif magic == 'BZh':
+    return bz2.BZ2File(file_name, 'rb')
+  else:
+    return io.open(file_name, 'rb')
+
+def _readFrame(xyz, parse=True):
+  """
+  read next frame of open xyz file,
+  return (N, comment, type_list, R), None at end of file
+  """
+  line = xyz.readline()
+  # blank lines between frames and at the end of file
+  while line and not line.strip():
+    line = xyz.readline()
+  if not line:
+    return None
+  try:
+    N = int(line)
+  except ValueError:
+    qtk.exit("xyz frame expected, got line: %s" % line.strip())
+  comment = xyz.readline()
+  lines = [xyz.readline() for _ in xrange(N)]
+  if N > 0 and not lines[-1]:
+    qtk.exit("xyz frame truncated, %d atoms expected" % N)
+  if not parse:
+    return N, comment, None, None
+
+  rows = [line.split() for line in lines]
+  n_col = len(rows[0]) if N > 0 else 4
+  if any([len(row) != n_col for row in rows]):
+    # varying number of columns
+    rows = [row[:4] for row in rows]
+    n_col = 4
+  if n_col < 4 or any([len(row) != n_col for row in rows]):
+    qtk.exit("invalid coordinate lines in xyz frame")
+  table = np.array(rows, dtype=str).reshape(N, n_col)
+  return N, comment, table[:, 0], table[:, 1:4].astype(float)
+
+def _propList(comment):
+  """comment line as float array if possible, as read_xyz"""
+  try:
+    return np.array(comment.split()).astype(float)
+  except ValueError:
+    return comment
+
+def _frameMolecule(N, comment, type_list, R):
+  mol = qtk.Molecule()
+  mol.N = N
+  mol.type_list = type_list.tolist()
+  mol.Z = qtk.n2Z_array(type_list)
+  mol.R = R
+  mol.string = ['' for _ in range(N)]
+  mol.prop_list = _propList(comment)
+  return mol
+
+def _frameBatch(frames):
+  N = [frame[0] for frame in frames]
+  type_list = np.concatenate([frame[2] for frame in frames])
+  R = np.vstack([frame[3] for frame in frames])
+  return qtk.MoleculeBatch(R=R, Z=qtk.n2Z_array(type_list), N=N)
+
+def xyzOffsets(file_name):
+  """byte offset of each frame in the uncompressed xyz file"""
+  offsets = []
+  position = 0
+  xyz = openXYZ(file_name)
+  try:
+    while True:
+      line = xyz.readline()
+      if not line:
+        break
+      if not line.strip():
+        position += len(line)
+        continue
+      offsets.append(position)
+      position += len(line)
+      for _ in xrange(int(line) + 1):
+        position += len(xyz.readline())
+  finally:
+    xyz.close()
+  return np.array(offsets, dtype=np.int64)
+
+def trajectoryOffsets(file_name):
+  """
+  byte offset of each frame in CPMD TRAJECTORY file, a frame is
+  a block of lines with the same step number
+  """
+  offsets = []
+  position = 0
+  step = None
+  trj = openXYZ(file_name)
+  try:
+    for line in iter(trj.readline, ''):
+      if 'NEW' in line:
+        # restarted run might repeat step numbers
+        step = None
+      elif line.strip():
+        line_step = line.split(None, 1)[0]
+        if line_step != step:
+          offsets.append(position)
+          step = line_step
+      position += len(line)
+  finally:
+    trj.close()
+  return np.array(offsets, dtype=np.int64)
+
+def frameIndex(file_name, kind='xyz'):
+  """
+  frame byte offsets of xyz (kind='xyz') or CPMD TRAJECTORY
+  (kind='trajectory') file. The offsets are stored in the sidecar
+  file file_name.qtk_index.npz and rebuilt when the size or mtime
+  of file_name changes
+  """
+  scanners = {'xyz': xyzOffsets, 'trajectory': trajectoryOffsets}
+  if kind not in scanners:
+    qtk.exit("frame index of kind %s not supported" % kind)
+  stat = os.stat(file_name)
+  index_name = file_name + '.qtk_index.npz'
+  if os.path.exists(index_name):
+    try:
+      index = np.load(index_name)
+      if str(index['kind']) == kind \
+      and int(index['size']) == stat.st_size \
+      and float(index['mtime']) == stat.st_mtime:
+        return index['offsets']
+    except Exception as err:
+      qtk.warning("corrupted frame index %s: %s" % (index_name, err))
+
+  offsets = scanners[kind](file_name)
+  tmp_name = '%s.%d.tmp.npz' % (file_name, os.getpid())
+  try:
+    np.savez(tmp_name, offsets=offsets, kind=kind,
+             size=stat.st_size, mtime=stat.st_mtime)
+    os.rename(tmp_name, index_name)
+  except (IOError, OSError) as err:
+    qtk.warning("frame index %s not written: %s" % (index_name, err))
+    if os.path.exists(tmp_name):
+      os.remove(tmp_name)
+  return offsets
+
+def readXYZ(file_name, start=0, stop=None, step=1, **kwargs):
+  """
+  generator of frames of a multi-frame xyz file, which is read
+  frame by frame with coordinate blocks parsed by numpy.
+  gzip and bz2 compressed files are detected automatically
+
+  args:
+    start, stop, step, frame range as for slicing, negative start
+                       or stop scans the file for frame offsets
+  kwargs:
+    offsets(list), frame byte offsets of xyzOffsets, frames are
+                   read by seeking without scanning the file
+    index(bool), use offsets of frameIndex, i.e. from the sidecar
+                 index file, which is built on first use
+    frames(list), indices of frames to read instead of a range,
+                  implies index=True if no offsets are given
+    batch_size(int), yield MoleculeBatch of batch_size frames
+                     instead of Molecule
+
+  Example:
+    for mol in qtk.readXYZ('traj.xyz.gz', step=10):
+      print mol.N, mol.prop_list
+    for batch in qtk.readXYZ('conformers.xyz', batch_size=10000):
+      E_nn = batch.nuclear_repulsion()
+    mol = next(qtk.readXYZ('dump.xyz', frames=[812345]))
+  """
+  batch_size = None
+  if 'batch_size' in kwargs and kwargs['batch_size']:
+    batch_size = int(kwargs['batch_size'])
+  offsets = None
+  if 'offsets' in kwargs and kwargs['offsets'] is not None:
+    offsets = kwargs['offsets']
+  if step < 1:
+    qtk.exit("readXYZ step must be positive")
+  frames = None
+  if 'frames' in kwargs and kwargs['frames'] is not None:
+    frames = list(kwargs['frames'])
+  if offsets is None:
+    if ('index' in kwargs and kwargs['index']) or frames is not None:
+      offsets = frameIndex(file_name)
+    elif start < 0 or (stop is not None and stop < 0):
+      # counting from the end requires number of frames
+      offsets = xyzOffsets(file_name)
+
+  xyz = openXYZ(file_name)
+  try:
+    if offsets is not None:
+      if frames is None:
+        frames = range(*slice(start, stop, step).indices(len(offsets)))
+      def selected():
+        for i in frames:
+          xyz.seek(offsets[i])
+          yield _readFrame(xyz)
+    else:
+      def selected():
+        i = 0
+        while stop is None or i < stop:
+          use = i >= start and (i - start) % step == 0
+          frame = _readFrame(xyz, parse=use)
+          if frame is None:
+            break
+          if use:
+            yield frame
+          i += 1
+
+    chunk = []
+    for frame in selected():
+      if batch_size is None:
+        yield _frameMolecule(*frame)
+      else:
+        chunk.append(frame)
+        if len(chunk) == batch_size:
+          yield _frameBatch(chunk)
+          chunk = []
+    if chunk:
+      yield _frameBatch(chunk)
+  finally:
+    xyz.close()
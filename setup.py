@@ -88,6 +88,13 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared'],
             ),
+            Extension(name = "qctoolkit.MD.rdf_cell", 
+              sources = ['qctoolkit/MD/c_extension/'+\
+                         'rdf_cell.c'],
+              extra_compile_args=['-fopenmp', '-fpic', '-lm',
+                                  '-Wno-write-strings'],
+              extra_link_args=['-lgomp', '-shared'],
+            ),
             Extension(name = "qctoolkit.MD.vacf", 
               sources = ['qctoolkit/MD/c_extension/'+\
                          'vacf.c'],
@@ -97,7 +104,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.veint", 
               sources = ['qctoolkit/QM/c_extension/veint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -105,7 +113,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.eeint", 
               sources = ['qctoolkit/QM/c_extension/eeint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -113,7 +122,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.eekernel", 
               sources = ['qctoolkit/QM/c_extension/eekernel.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -121,7 +131,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.neint", 
               sources = ['qctoolkit/QM/c_extension/neint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -129,7 +140,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.nnint", 
               sources = ['qctoolkit/QM/c_extension/nnint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -137,7 +149,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.vnint", 
               sources = ['qctoolkit/QM/c_extension/vnint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -145,7 +158,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.keint", 
               sources = ['qctoolkit/QM/c_extension/keint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',
@@ -153,7 +167,8 @@ c_module = [Extension(name = "qctoolkit.ML.kernel_matrix",
             ),
             Extension(name = "qctoolkit.QM.knint", 
               sources = ['qctoolkit/QM/c_extension/knint.c',
-                         'qctoolkit/QM/c_extension/gaussian.c'],
+                         'qctoolkit/QM/c_extension/gaussian.c',
+                         'qctoolkit/QM/c_extension/boys.c'],
               extra_compile_args=['-fopenmp', '-fpic', '-lm',
                                   '-Wno-write-strings'],
               extra_link_args=['-lgomp', '-shared',